@@ -3,9 +3,6 @@ import os
 
 from package_utils import ROOT_DIR
 from azure_utilities import logger
-from azure_utilities.identity import Identity
-from azure_utilities.azure_sql.sql_send_data import SQLSendData
-from azure_utilities.azure_sql.sql_get_data import SQLGetData
 
 
 def az_cli(args_str, return_result=True):
@@ -184,6 +181,10 @@ def create_storage_account(id_, **options):
 
 # # SQL class Example
 if __name__ == "__main__":
+    from azure_utilities.identity import Identity
+    from azure_utilities.azure_sql.sql_send_data import SQLSendData
+    from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
     app = {
        'appId'       : 'a9b31f0c-3c8c-440e-bffa-1852d62535d3',
        'displayName' : 'Hannah-App',
@@ -1,18 +1,48 @@
+import importlib
 import logging
 import os
 import shutil
 ROOT_DIR = os.path.abspath(os.curdir)
+LOG_DIR  = f"{ROOT_DIR}/logs/azure_logs"
+
+# subpackages imported on first access, eg. azure_utilities.azure_sql
+SUBPACKAGES = ['Utils', 'identity', 'azure_sql', 'azure_nosql', 'azure_file_storage', 'azure_hub']
+
+_log_dir_ready = False
+
+
+def _prepare_log_dir():
+    """
+    Clear the logs of the previous run and create the log directory, once per process, when the first record is written
+    :return:
+    """
+    global _log_dir_ready
+    if not _log_dir_ready:
+        shutil.rmtree(LOG_DIR, ignore_errors=True)
+        os.makedirs(LOG_DIR, exist_ok=True)
+        _log_dir_ready = True
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    File handler which creates the log directory and opens its file only when the first record is written to it,
+    so importing the package does not touch the file system
+    """
+    def __init__(self, file_name, level):
+        super().__init__(f"{LOG_DIR}/{file_name}", delay=True)
+        self.setLevel(level)
+
+    def _open(self):
+        _prepare_log_dir()
+        return super()._open()
+
 
 # custom logger
 logger = logging.getLogger(__name__)
 
 # Create handlers
-shutil.rmtree(f"{ROOT_DIR}/logs/azure_logs", ignore_errors=True)
-os.makedirs(f"{ROOT_DIR}/logs/azure_logs/")
-debug_handler = logging.FileHandler(f'{ROOT_DIR}/logs/azure_logs/azure_debug.log')
-error_handler = logging.FileHandler(f'{ROOT_DIR}/logs/azure_logs/azure_error.log')
-debug_handler.setLevel(logging.DEBUG)
-error_handler.setLevel(logging.ERROR)
+debug_handler = LazyFileHandler('azure_debug.log', logging.DEBUG)
+error_handler = LazyFileHandler('azure_error.log', logging.ERROR)
 
 
 # Create formatters and add it to handlers
@@ -24,3 +54,8 @@ debug_handler.setFormatter(handler_format)
 logger.addHandler(error_handler)
 logger.addHandler(debug_handler)
 
+
+def __getattr__(name):
+    if name in SUBPACKAGES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__} has no attribute {name}")
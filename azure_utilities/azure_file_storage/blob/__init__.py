@@ -1,8 +1,22 @@
-from azure_utilities.azure_file_storage.blob.blob_send_data import BlobSendData
-from azure_utilities.azure_file_storage.blob.blob_get_data import BlobGetData
+import importlib
+
+# classes imported on first access, so importing the package does not load the storage SDK
+LAZY_ATTRIBUTES = {
+    'BlobSendData': 'azure_utilities.azure_file_storage.blob.blob_send_data',
+    'BlobGetData' : 'azure_utilities.azure_file_storage.blob.blob_get_data',
+}
+
+
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__} has no attribute {name}")
 
 
 if __name__ == '__main__':
+    from azure_utilities.azure_file_storage.blob.blob_send_data import BlobSendData
+    from azure_utilities.azure_file_storage.blob.blob_get_data import BlobGetData
+
     blob = BlobSendData(
         connection_string="DefaultEndpointsProtocol=https;AccountName=sajalsirohi;AccountKey=XzfX8bC04B7CMwrBFLNP"
                           "/ub3uv1Pwaag8l3CNmh++GnHf4tGU9yy7EiSxbSkw73g3HzJluAyKKvorMpwJlHFlw==;EndpointSuffix=core"
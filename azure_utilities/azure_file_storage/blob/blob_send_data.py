@@ -89,11 +89,12 @@ class BlobSendData(SendToFileStorage):
     def provide_storage_credentials(self):
         pass
 
-    def upload_data(self, upload_file_path = None, file_name = None):
+    def upload_data(self, upload_file_path = None, file_name = None, overwrite = False):
         """
-        Upload the file to the blob
+        Upload the file to the blob, the file is streamed from the disk in blocks
         :param upload_file_path:
         :param file_name:
+        :param overwrite: replace the blob if it already exists
         :return:
         """
         if not file_name:
@@ -109,6 +110,6 @@ class BlobSendData(SendToFileStorage):
         # Upload the created file
         try:
             with open(upload_file_path, "rb") as data:
-                blob_client.upload_blob(data)
+                blob_client.upload_blob(data, overwrite=overwrite)
         except Exception as e:
             print(f"Error uploading blob, err -> {e.args}")
\ No newline at end of file
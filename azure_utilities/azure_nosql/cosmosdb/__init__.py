@@ -1,8 +1,5 @@
-from common.plot_live_data import PlotLiveData
-from azure.iot.device import IoTHubDeviceClient
-
-
 if __name__ == "__main__":
+    from common.plot_live_data import PlotLiveData
     from azure_utilities.azure_nosql.cosmosdb.send_cosmos_data import SendCosmosData
     from azure_utilities.azure_nosql.cosmosdb.get_cosmos_data import GetCosmosData
     import time
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import weakref
+
+# one azure.cosmos.aio client per event loop and account, shared by every async object of the loop
+_CLIENTS = weakref.WeakKeyDictionary()
+
+
+def get_async_client(uri, key):
+    """
+    Returns the client of the account for the running event loop, creating it on the first call. The clients hold
+    the connection pool of the loop, so every object of the loop talks to the account over the same connections.
+    :param uri: account URI
+    :param key: account key
+    :return: azure.cosmos.aio.CosmosClient
+    """
+    try:
+        from azure.cosmos.aio import CosmosClient
+    except ImportError:
+        raise ImportError("azure-cosmos not present, install it first using pip install azure-cosmos aiohttp")
+    clients = _CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    if (uri, key) not in clients:
+        clients[(uri, key)] = CosmosClient(uri, credential=key)
+    return clients[(uri, key)]
+
+
+async def close_async_clients():
+    """
+    Close the clients of the running event loop, call it before the loop is closed
+    :return:
+    """
+    clients = _CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+class AsyncCreateCosmosdbInstance:
+    """
+    CreateCosmosdbInstance on azure.cosmos.aio. The database and the container are created on the first await of
+    connect(), which the async send / get classes do before their first operation.
+    """
+    def __init__(self,
+                 uri = None,
+                 key = None,
+                 database_name  = "defaultpythondb",
+                 container_name = "defaultpythoncontainer",
+                 **options):
+        self.uri              = uri or os.environ.get('ACCOUNT_URI')
+        self.key              = key or os.environ.get('ACCOUNT_KEY')
+        self.database_name    = database_name
+        self.container_name   = container_name
+        self.database_client  = None
+        self.container_client = None
+        self.options_         = options
+        self._connect_lock    = None
+
+    @property
+    def client(self):
+        return get_async_client(self.uri, self.key)
+
+    async def connect(self):
+        """
+        Create the database and the container if they do not exist, once
+        :return: container client
+        """
+        if self.container_client is None:
+            self._connect_lock = self._connect_lock or asyncio.Lock()
+            async with self._connect_lock:
+                if self.container_client is None:
+                    await self.create_db_if_doest_not_exists()
+                    await self.create_container_if_does_not_exists()
+        return self.container_client
+
+    async def create_db_if_doest_not_exists(self, database_name = None, **options):
+        """
+        Create a DB instance
+        :param database_name:
+        :return:
+        """
+        self.database_name   = database_name if database_name else self.database_name
+        self.database_client = await self.client.create_database_if_not_exists(id=self.database_name, **options)
+
+    async def create_container_if_does_not_exists(self, container_name = None, partition_key_path = None, **options):
+        """
+        Create a container if it does not exists already
+        :param container_name: name of the container
+        :param partition_key_path: path of partition key in the data that you will commit, eg. "/name" or "name"
+        :param options:
+        :return:
+        """
+        from azure.cosmos import PartitionKey
+        partition_key_path = partition_key_path or self.options_.get('partition_key_path') \
+                             or options.get('partition_key_path')
+        if isinstance(partition_key_path, str) and partition_key_path[0] != "/":
+            partition_key_path = "/" + partition_key_path
+        if self.database_client is None:
+            await self.create_db_if_doest_not_exists()
+        self.container_name   = container_name if container_name else self.container_name
+        self.container_client = await self.database_client.create_container_if_not_exists(
+            id=self.container_name, partition_key=PartitionKey(path=partition_key_path), **options
+        )
+        return self.container_client
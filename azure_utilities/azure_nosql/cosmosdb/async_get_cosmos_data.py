@@ -0,0 +1,111 @@
+import asyncio
+import calendar
+import time
+
+from azure_utilities.azure_nosql.cosmosdb.async_create_cosmosdb_instance import AsyncCreateCosmosdbInstance
+from azure_utilities.azure_nosql.cosmosdb.get_cosmos_data import with_ts_order
+from common.checkpoint_store import Checkpoint, get_checkpoint_store
+
+
+class AsyncGetCosmosData:
+    """
+    GetCosmosData for asyncio applications, every method reading the container is a coroutine
+    """
+    def __init__(self, uri, key,
+                 database_name="defaultpythondb",
+                 container_name="defaultpythoncontainer",
+                 **options):
+        self.database_name  = database_name
+        self.uri            = uri
+        self.key            = key
+        self.container_name = container_name
+        self.create_db_instance = AsyncCreateCosmosdbInstance(
+            uri=uri, key=key, database_name=database_name, container_name=container_name, **options
+        )
+        self.checkpoint_store = get_checkpoint_store(options.get('checkpoint_store'))
+        self.checkpoint_id    = options.get('checkpoint_id')
+        self.checkpoint       = None
+        self.page_size        = options.get('page_size', 1000)
+        self.previous_diff_val = options.get('initially_fetch_value_greater_than_this') or calendar.timegm(time.gmtime())
+        # the checkpoint is loaded by the first return_differential_data(), its store may do blocking I/O
+        self.checkpoint_loaded = False
+
+    async def get_data_with_query(self, sql_query, **options):
+        """
+        Get data using SQL Query, ordered on _ts by the server
+        :param sql_query:
+        :param options: see iterate_pages()
+        :return: list of documents
+        """
+        data_ = []
+        async for page, _ in self.iterate_pages(sql_query, **options):
+            data_.extend(page)
+        return data_
+
+    async def iterate_pages(self, sql_query, page_size = None, continuation_token = None, **options):
+        """
+        Run the query page by page, see GetCosmosData.iterate_pages()
+        :return: async generator of tuples of (list of documents, continuation token of the next page)
+        """
+        if options.pop('order_by_ts', True):
+            sql_query = with_ts_order(sql_query)
+        container_client = await self.create_db_instance.connect()
+        data  = container_client.query_items(query = sql_query, max_item_count = page_size or self.page_size,
+                                             **options)
+        pages = data.by_page(continuation_token)
+        async for page in pages:
+            yield [datum async for datum in page], pages.continuation_token
+
+    async def get_all_data(self):
+        """
+        Get all the data from the container
+        :return:
+        """
+        return await self.get_data_with_query(sql_query=f"select * from {self.container_name}")
+
+    def get_checkpoint(self):
+        """
+        Checkpoint of the differential reads, None without a checkpoint_store. Shares the checkpoint of a
+        GetCosmosData reading the same container.
+        :return: Checkpoint object
+        """
+        if not self.checkpoint_store:
+            return None
+        reader_id = self.checkpoint_id or "|".join(['cosmos', self.uri, self.database_name, self.container_name,
+                                                    '_ts'])
+        if self.checkpoint is None or self.checkpoint.reader_id != reader_id:
+            self.checkpoint = Checkpoint(self.checkpoint_store, reader_id)
+        return self.checkpoint
+
+    def commit_checkpoint(self):
+        """
+        Commit the watermark of the last batch returned by return_differential_data()
+        :return:
+        """
+        if self.checkpoint:
+            self.checkpoint.commit()
+
+    async def return_differential_data(self, **options):
+        """
+        Get differential data, see GetCosmosData.return_differential_data()
+        :return: pandas df, or [] when there is no new data
+        """
+        checkpoint = self.get_checkpoint()
+        if checkpoint and not self.checkpoint_loaded:
+            self.previous_diff_val = await asyncio.to_thread(checkpoint.load, self.previous_diff_val)
+            self.checkpoint_loaded = True
+        if checkpoint:
+            # asking for the next batch means the previous one has been processed
+            await asyncio.to_thread(checkpoint.commit)
+        data = await self.get_data_with_query(sql_query=f"select * from {self.container_name} "
+                                                        f"where {self.container_name}._ts > {self.previous_diff_val}")
+        if data:
+            import pandas as pd
+            pandas_df = pd.DataFrame(data)
+            pandas_df.sort_values('_ts', inplace=True)
+            self.previous_diff_val = pandas_df['_ts'].iloc[-1]
+            if checkpoint:
+                checkpoint.stage(self.previous_diff_val)
+        else:
+            pandas_df = []
+        return pandas_df
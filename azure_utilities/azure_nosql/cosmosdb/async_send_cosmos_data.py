@@ -0,0 +1,73 @@
+from azure_utilities.azure_nosql.cosmosdb.async_create_cosmosdb_instance import AsyncCreateCosmosdbInstance
+from azure_utilities.azure_nosql.cosmosdb.bulk_upsert import AsyncCosmosBulkWriter
+
+
+class AsyncSendCosmosData:
+    """
+    SendCosmosData for asyncio applications, every method is a coroutine
+    """
+    def __init__(self, uri, key,
+                 database_name  = "defaultpythondb",
+                 container_name = "defaultpythoncontainer",
+                 **options):
+        self.database_name   = database_name
+        self.uri             = uri
+        self.key             = key
+        self.container_name  = container_name
+        self.create_db_instance = AsyncCreateCosmosdbInstance(
+            uri=uri, key=key, database_name=database_name, container_name=container_name, **options
+        )
+        self.partition_key_path_ = None
+
+    async def create_container_if_does_not_exist(self, partition_key_path):
+        """
+        Create a container if it does not exist.
+        :return:
+        """
+        await self.create_db_instance.create_container_if_does_not_exists(partition_key_path = partition_key_path)
+        self.partition_key_path_ = None
+
+    async def create_database_if_doest_not_exists(self, **options):
+        """
+        Create a database if it does not exists
+        :return:
+        """
+        await self.create_db_instance.create_db_if_doest_not_exists(**options)
+
+    async def partition_key_path(self):
+        """
+        Path of the partition key of the container, eg. '/name'. Read from the container once when it was not given
+        while initializing.
+        :return:
+        """
+        if self.partition_key_path_ is None:
+            partition_key_path = self.create_db_instance.options_.get('partition_key_path')
+            if isinstance(partition_key_path, str) and partition_key_path[0] != "/":
+                partition_key_path = "/" + partition_key_path
+            if not partition_key_path:
+                container_client   = await self.create_db_instance.connect()
+                partition_key_path = (await container_client.read())['partitionKey']['paths'][0]
+            self.partition_key_path_ = partition_key_path
+        return self.partition_key_path_
+
+    async def commit_batch_data(self, data, **options):
+        """
+        Commit the data, see SendCosmosData.commit_batch_data()
+        :param data: dict or list of dicts
+        :param options:
+                workers : number of requests in flight at the same time, default 100
+                see SendCosmosData.commit_batch_data() for the others
+        :return: dict like {'documents': 1000, 'succeeded': 1000, 'failed': 0, 'request_charge': 10240.5,
+                            'seconds': 3.2, 'results': [...]}
+        """
+        assert isinstance(data, (dict, list)), "data should be a dict or a list of dicts"
+        if isinstance(data, dict):
+            data = [data]
+        writer = AsyncCosmosBulkWriter(
+            await self.create_db_instance.connect(),
+            partition_key_path=await self.partition_key_path(),
+            workers=options.pop('workers', 100),
+            max_retries=options.pop('max_retries', 5),
+            **options
+        )
+        return await writer.upsert(data)
@@ -0,0 +1,307 @@
+import time
+
+# most operations allowed in one transactional batch
+MAX_BATCH_OPERATIONS = 100
+
+
+def get_partition_key(document, partition_key_path):
+    """
+    Value of the partition key of a document
+    eg. ({'address': {'city': 'Pune'}}, '/address/city') -> 'Pune'
+    :param document: dict
+    :param partition_key_path: path of the partition key, eg. '/name'
+    :return: value, None if the document does not have it
+    """
+    value = document
+    for part in partition_key_path.strip('/').split('/'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def retry_after_seconds(err, default):
+    """
+    Seconds to wait before retrying a throttled (429) request, as asked by the service
+    :param err: CosmosHttpResponseError
+    :param default: seconds used when the service does not say
+    :return: float
+    """
+    headers = getattr(err, 'headers', None) or {}
+    if headers.get('x-ms-retry-after-ms'):
+        return float(headers['x-ms-retry-after-ms']) / 1000
+    if headers.get('Retry-After'):
+        return float(headers['Retry-After'])
+    return default
+
+
+class CosmosBulkWriter:
+    """
+    Upsert documents concurrently. The documents are grouped on their partition key, groups of more than one
+    document are sent as transactional batches of up to 100 upserts (one round trip for the whole batch), the other
+    documents one by one, on a pool of 'workers' threads. Throttled requests (429) are retried after the time the
+    service asks for, with exponential backoff when it does not say. The request charge of every document is
+    collected from the response headers.
+    """
+    def __init__(self,
+                 container_client,
+                 partition_key_path = None,
+                 workers            = 8,
+                 max_retries        = 5,
+                 **options):
+        """
+        :param container_client: ContainerProxy of the container
+        :param partition_key_path: eg. '/name', default the partition key of the container
+        :param workers: number of requests in flight at the same time
+        :param max_retries: number of times a throttled request is retried, on top of the retries of the SDK
+        :param options:
+                batch_size        : upserts per transactional batch, at most 100
+                use_batch         : send same partition groups as transactional batches, default True
+                retry_backoff     : seconds to wait before the first retry when the service does not say, default 1
+                max_retry_backoff : maximum seconds to wait before a retry, default 30
+                raise_on_failure  : raise when documents fail after all retries, default True
+        """
+        self.container_client   = container_client
+        self.partition_key_path = partition_key_path or container_client.read()['partitionKey']['paths'][0]
+        self.workers            = workers
+        self.max_retries        = max_retries
+        self.batch_size         = min(options.get('batch_size') or MAX_BATCH_OPERATIONS, MAX_BATCH_OPERATIONS)
+        self.use_batch          = options.get('use_batch', True) and hasattr(container_client, 'execute_item_batch')
+        self.retry_backoff      = options.get('retry_backoff', 1)
+        self.max_retry_backoff  = options.get('max_retry_backoff', 30)
+        self.raise_on_failure   = options.get('raise_on_failure', True)
+
+    def _with_retries(self, request):
+        """
+        Run the request, retrying it while it is throttled
+        :param request: function taking the response_hook, returning the result of the SDK call
+        :return: tuple of (result, request charge, attempts)
+        """
+        from azure.cosmos.exceptions import CosmosHttpResponseError
+        charge = 0.0
+
+        def _response_hook(headers, result):
+            nonlocal charge
+            charge += float(headers.get('x-ms-request-charge') or 0)
+
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                return request(_response_hook), charge, attempt
+            except CosmosHttpResponseError as err:
+                charge += float((getattr(err, 'headers', None) or {}).get('x-ms-request-charge') or 0)
+                if err.status_code != 429 or attempt > self.max_retries:
+                    err.request_charge, err.attempts = charge, attempt
+                    raise
+                default = min(self.retry_backoff * 2 ** (attempt - 1), self.max_retry_backoff)
+                time.sleep(min(retry_after_seconds(err, default), self.max_retry_backoff))
+
+    def upsert_one(self, index, document):
+        """
+        :param index: index of the document in the data
+        :param document: dict
+        :return: list with the result of the document
+        """
+        result = {'index': index, 'id': document.get('id'), 'status_code': 200, 'request_charge': 0.0,
+                  'attempts': 1, 'error': None}
+        try:
+            _, result['request_charge'], result['attempts'] = self._with_retries(
+                lambda hook: self.container_client.upsert_item(document, response_hook=hook)
+            )
+        except Exception as err:
+            result.update(status_code=getattr(err, 'status_code', None), error=err,
+                          request_charge=getattr(err, 'request_charge', 0.0), attempts=getattr(err, 'attempts', 1))
+        return [result]
+
+    def upsert_batch(self, partition_key, indexed_documents):
+        """
+        Upsert documents of one partition in a transactional batch. If the batch fails for a reason other than
+        throttling, eg. one document is too large, its documents are upserted one by one so the others are written.
+        :param partition_key: value of the partition key of the documents
+        :param indexed_documents: list of tuples of (index, document)
+        :return: list of results, one per document
+        """
+        from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError
+        operations = [("upsert", (document,)) for _, document in indexed_documents]
+        try:
+            responses, charge, attempts = self._with_retries(
+                lambda hook: self.container_client.execute_item_batch(
+                    batch_operations=operations, partition_key=partition_key, response_hook=hook)
+            )
+        except (CosmosBatchOperationError, CosmosHttpResponseError) as err:
+            if getattr(err, 'status_code', None) == 429:
+                return self.throttled_results(indexed_documents, err)
+            results = []
+            for index, document in indexed_documents:
+                results.extend(self.upsert_one(index, document))
+            return results
+        return self.batch_results(indexed_documents, responses, charge, attempts)
+
+    @staticmethod
+    def throttled_results(indexed_documents, err):
+        # the charge of the throttled attempts is shared by the documents of the batch
+        request_charge = getattr(err, 'request_charge', 0.0) / len(indexed_documents)
+        return [{'index': index, 'id': document.get('id'), 'status_code': 429, 'request_charge': request_charge,
+                 'attempts': getattr(err, 'attempts', 1), 'error': err}
+                for index, document in indexed_documents]
+
+    @staticmethod
+    def batch_results(indexed_documents, responses, charge, attempts):
+        results = []
+        for (index, document), response in zip(indexed_documents, responses):
+            results.append({
+                'index'         : index,
+                'id'            : document.get('id'),
+                'status_code'   : response.get('statusCode', 200),
+                'request_charge': float(response.get('requestCharge') or charge / len(indexed_documents)),
+                'attempts'      : attempts,
+                'error'         : None
+            })
+        return results
+
+    def tasks(self, documents):
+        """
+        Group the documents on their partition key and split them in requests
+        :param documents: list of dicts
+        :return: list of tuples of (function, args)
+        """
+        groups = {}
+        for index, document in enumerate(documents):
+            partition_key = get_partition_key(document, self.partition_key_path)
+            groups.setdefault(repr(partition_key), (partition_key, []))[1].append((index, document))
+
+        tasks = []
+        for partition_key, indexed_documents in groups.values():
+            if not self.use_batch or len(indexed_documents) == 1:
+                tasks.extend((self.upsert_one, indexed_document) for indexed_document in indexed_documents)
+                continue
+            for start in range(0, len(indexed_documents), self.batch_size):
+                tasks.append((self.upsert_batch, (partition_key, indexed_documents[start: start + self.batch_size])))
+        return tasks
+
+    def upsert(self, documents):
+        """
+        Upsert the documents
+        :param documents: list of dicts
+        :return: dict like {'documents': 1000, 'succeeded': 1000, 'failed': 0, 'request_charge': 10240.5,
+                            'seconds': 3.2, 'results': [...]}, one result per document in the order of the documents,
+                            like {'index': 0, 'id': '1', 'status_code': 200, 'request_charge': 10.3, 'attempts': 1,
+                            'error': None}
+        """
+        from multiprocessing.pool import ThreadPool
+        started_at = time.perf_counter()
+        tasks      = self.tasks(documents)
+        results    = []
+        if tasks:
+            with ThreadPool(processes=min(self.workers, len(tasks))) as pool:
+                for task_results in pool.starmap(lambda func, args: func(*args), tasks):
+                    results.extend(task_results)
+        return self.summarize(results, started_at)
+
+    def summarize(self, results, started_at):
+        """
+        :param results: results of the documents, in any order
+        :param started_at: time.perf_counter() at the start of the upsert
+        :return: summary of the upsert, see upsert()
+        """
+        results.sort(key=lambda result: result['index'])
+        failed  = sum(1 for result in results if result['error'] is not None)
+        seconds = time.perf_counter() - started_at
+        summary = {
+            'documents'     : len(results),
+            'succeeded'     : len(results) - failed,
+            'failed'        : failed,
+            'request_charge': sum(result['request_charge'] for result in results),
+            'seconds'       : seconds,
+            'results'       : results,
+        }
+        print(f"Upserted {summary['succeeded']} of {len(results)} documents in {seconds:.2f} seconds, "
+              f"{summary['request_charge']:.1f} RUs")
+        if failed and self.raise_on_failure:
+            errors = [(result['id'], result['error']) for result in results if result['error'] is not None]
+            raise Exception(f"{failed} documents failed after {self.max_retries} retries, info -> {errors[:10]}")
+        return summary
+
+
+class AsyncCosmosBulkWriter(CosmosBulkWriter):
+    """
+    CosmosBulkWriter for the azure.cosmos.aio container clients, the requests run as coroutines on the event loop,
+    at most 'workers' of them in flight at the same time
+    """
+    def __init__(self, container_client, partition_key_path, workers = 100, max_retries = 5, **options):
+        """
+        :param container_client: azure.cosmos.aio ContainerProxy of the container
+        :param partition_key_path: eg. '/name', await container_client.read() to get it from the container
+        :param workers: number of requests in flight at the same time
+        :param max_retries: number of times a throttled request is retried, on top of the retries of the SDK
+        :param options: see CosmosBulkWriter
+        """
+        assert partition_key_path, "Provide the partition_key_path of the container"
+        super().__init__(container_client, partition_key_path, workers, max_retries, **options)
+
+    async def _with_retries(self, request):
+        import asyncio
+        from azure.cosmos.exceptions import CosmosHttpResponseError
+        charge = 0.0
+
+        def _response_hook(headers, result):
+            nonlocal charge
+            charge += float(headers.get('x-ms-request-charge') or 0)
+
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                return await request(_response_hook), charge, attempt
+            except CosmosHttpResponseError as err:
+                charge += float((getattr(err, 'headers', None) or {}).get('x-ms-request-charge') or 0)
+                if err.status_code != 429 or attempt > self.max_retries:
+                    err.request_charge, err.attempts = charge, attempt
+                    raise
+                default = min(self.retry_backoff * 2 ** (attempt - 1), self.max_retry_backoff)
+                await asyncio.sleep(min(retry_after_seconds(err, default), self.max_retry_backoff))
+
+    async def upsert_one(self, index, document):
+        result = {'index': index, 'id': document.get('id'), 'status_code': 200, 'request_charge': 0.0,
+                  'attempts': 1, 'error': None}
+        try:
+            _, result['request_charge'], result['attempts'] = await self._with_retries(
+                lambda hook: self.container_client.upsert_item(document, response_hook=hook)
+            )
+        except Exception as err:
+            result.update(status_code=getattr(err, 'status_code', None), error=err,
+                          request_charge=getattr(err, 'request_charge', 0.0), attempts=getattr(err, 'attempts', 1))
+        return [result]
+
+    async def upsert_batch(self, partition_key, indexed_documents):
+        from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError
+        operations = [("upsert", (document,)) for _, document in indexed_documents]
+        try:
+            responses, charge, attempts = await self._with_retries(
+                lambda hook: self.container_client.execute_item_batch(
+                    batch_operations=operations, partition_key=partition_key, response_hook=hook)
+            )
+        except (CosmosBatchOperationError, CosmosHttpResponseError) as err:
+            if getattr(err, 'status_code', None) == 429:
+                return self.throttled_results(indexed_documents, err)
+            results = []
+            for index, document in indexed_documents:
+                results.extend(await self.upsert_one(index, document))
+            return results
+        return self.batch_results(indexed_documents, responses, charge, attempts)
+
+    async def upsert(self, documents):
+        """
+        Upsert the documents
+        :param documents: list of dicts
+        :return: summary of the upsert, see CosmosBulkWriter.upsert()
+        """
+        import asyncio
+        started_at = time.perf_counter()
+        semaphore  = asyncio.Semaphore(self.workers)
+
+        async def _run(func, args):
+            async with semaphore:
+                return await func(*args)
+
+        results = []
+        for task_results in await asyncio.gather(*(_run(func, args) for func, args in self.tasks(documents))):
+            results.extend(task_results)
+        return self.summarize(results, started_at)
@@ -0,0 +1,170 @@
+import datetime
+import json
+import time
+
+
+class CosmosChangeFeedReader:
+    """
+    Incremental reads of a container through its change feed. Every feed range (partition key range) is read on its
+    own from the continuation token (etag) of its last read, so a poll costs a request per range and page and returns
+    only the documents changed since, in the latest version of each. A poll reads at most max_pages_per_poll pages of
+    a range, the next poll goes on from there. The tokens can be kept in a checkpoint to resume after a restart.
+    Ranges appearing after a split are read from the newest _ts seen, so no change is lost.
+    """
+    def __init__(self, container_client, **options):
+        """
+        :param container_client: ContainerProxy of the container
+        :param options:
+                start_from_beginning : read the whole container on the first poll, default False, ie. from now
+                start_time           : datetime or epoch seconds to read the changes from on the first poll
+                max_item_count       : documents per change feed page, default 1000
+                max_pages_per_poll   : pages read per range and poll, default 10, None to read every change
+                workers              : ranges read at the same time, default 4
+                checkpoint           : common.checkpoint_store.Checkpoint keeping the tokens, the tokens of a poll are
+                                       staged after it and committed when the next poll starts
+        """
+        self.container_client     = container_client
+        self.start_from_beginning = options.get('start_from_beginning', False)
+        self.start_time           = options.get('start_time')
+        self.max_item_count       = options.get('max_item_count', 1000)
+        self.max_pages_per_poll   = options.get('max_pages_per_poll', 10)
+        self.workers              = options.get('workers', 4)
+        self.checkpoint           = options.get('checkpoint')
+        self.tokens               = {}
+        self.last_ts              = None
+        self.ranges               = {}
+        if self.checkpoint:
+            state        = self.checkpoint.load({}) or {}
+            self.tokens  = state.get('tokens', {})
+            self.last_ts = state.get('last_ts')
+        if isinstance(self.start_time, (int, float)):
+            self.start_time = datetime.datetime.fromtimestamp(self.start_time, tz=datetime.timezone.utc)
+        elif self.start_time is None and not self.start_from_beginning:
+            # from now, the first poll only returns what changes after the reader is created
+            self.start_time = datetime.datetime.now(datetime.timezone.utc)
+
+    def partition_key_ranges(self):
+        """
+        Ids of the feed ranges of the container, read with the public read_feed_ranges() of the SDK, or with the
+        private _ReadPartitionKeyRanges() of its client connection on versions older than 4.7
+        :return: list of Strings
+        """
+        if hasattr(self.container_client, 'read_feed_ranges'):
+            # feed ranges are opaque to the reader, they are told apart by their JSON
+            self.ranges = {json.dumps(feed_range, sort_keys=True, default=str): {'feed_range': feed_range}
+                           for feed_range in self.container_client.read_feed_ranges()}
+            return list(self.ranges)
+        client_connection = getattr(self.container_client, 'client_connection', None)
+        read_ranges       = getattr(client_connection, '_ReadPartitionKeyRanges', None)
+        if read_ranges is None:
+            raise NotImplementedError("This version of azure-cosmos has neither read_feed_ranges() nor "
+                                      "_ReadPartitionKeyRanges(), the ranges of the container can not be listed "
+                                      "for the change feed")
+        self.ranges = {partition_key_range['id']: {'partition_key_range_id': partition_key_range['id']}
+                       for partition_key_range in read_ranges(self.container_client.container_link)}
+        return list(self.ranges)
+
+    def _start_options(self, range_id):
+        range_options = self.ranges.get(range_id, {'partition_key_range_id': range_id})
+        if range_id in self.tokens:
+            if 'feed_range' in range_options:
+                # the token of a feed range carries its range
+                return {'continuation': self.tokens[range_id]}
+            return dict(range_options, continuation=self.tokens[range_id])
+        options = dict(range_options)
+        if self.last_ts is not None:
+            # new range after a split, read it from the last change seen on its parent
+            options['start_time'] = datetime.datetime.fromtimestamp(self.last_ts, tz=datetime.timezone.utc)
+        elif self.start_from_beginning:
+            options['is_start_from_beginning'] = True
+        else:
+            options['start_time'] = self.start_time
+        return options
+
+    def read_range(self, range_id):
+        """
+        Read the changes of one range since its token, page by page, at most max_pages_per_poll pages. The token is
+        the etag of the last response to this range, read from the headers of each of its own requests. The SDK also
+        calls the response hook when the feed is created, with the last response headers of the shared client
+        connection, which can be those of another range read at the same time, that call is ignored.
+        :param range_id: id of the range, see partition_key_ranges()
+        :return: tuple of (list of documents, token to read the next changes from, True if pages were left unread)
+        """
+        etags, reading = [], False
+
+        def _response_hook(headers, result):
+            if reading and headers.get('etag'):
+                etags.append(headers['etag'])
+
+        feed = self.container_client.query_items_change_feed(
+            max_item_count=self.max_item_count, response_hook=_response_hook, **self._start_options(range_id)
+        )
+        reading   = True
+        documents = []
+        capped    = False
+        for pages_read, page in enumerate(feed.by_page(), start=1):
+            documents.extend(page)
+            if self.max_pages_per_poll and pages_read >= self.max_pages_per_poll:
+                capped = True
+                break
+        return documents, etags[-1] if etags else self.tokens.get(range_id), capped
+
+    def read_changes(self):
+        """
+        Poll every range once
+        :return: list of changed documents, sorted on _ts
+        """
+        from multiprocessing.pool import ThreadPool
+        if self.checkpoint:
+            # asking for the next changes means the previous ones have been processed
+            self.checkpoint.commit()
+        range_ids = self.partition_key_ranges()
+        with ThreadPool(processes=max(1, min(self.workers, len(range_ids)))) as pool:
+            results = pool.map(self.read_range, range_ids)
+
+        documents = []
+        tokens    = {}
+        capped_ts = []
+        for range_id, (range_documents, token, capped) in zip(range_ids, results):
+            documents.extend(range_documents)
+            if token:
+                tokens[range_id] = token
+            if capped and range_documents:
+                capped_ts.append(range_documents[-1].get('_ts', 0))
+        # ranges gone after a split are dropped, their children were read from last_ts
+        self.tokens = tokens
+        documents.sort(key=lambda document: document.get('_ts', 0))
+        if documents:
+            # the unread pages of a capped range are newer than its last document, not than the other ranges
+            newest_ts    = min(capped_ts) if capped_ts else documents[-1].get('_ts', 0)
+            self.last_ts = max(self.last_ts or 0, newest_ts)
+        if self.checkpoint:
+            self.checkpoint.stage({'tokens': self.tokens, 'last_ts': self.last_ts})
+        return documents
+
+    def read_changes_as_df(self):
+        """
+        Poll every range once, same output as GetCosmosData.return_differential_data()
+        :return: pandas df sorted on _ts, or [] when nothing changed
+        """
+        documents = self.read_changes()
+        if not documents:
+            return []
+        import pandas as pd
+        return pd.DataFrame(documents)
+
+    def watch(self, poll_interval = 1, max_polls = None):
+        """
+        Long running reads, poll the change feed every poll_interval seconds and yield the changes
+        :param poll_interval: seconds between two polls returning no change
+        :param max_polls: stop after this many polls, default never
+        :return: generator of pandas dfs, one per poll with changes
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            pandas_df = self.read_changes_as_df()
+            if len(pandas_df):
+                yield pandas_df
+            else:
+                time.sleep(poll_interval)
@@ -1,11 +1,42 @@
 import calendar
+import heapq
+import re
 import time
 
-import pandas as pd
 from beartype import beartype
 
+from azure_utilities.azure_nosql.cosmosdb.change_feed_reader import CosmosChangeFeedReader
 from azure_utilities.azure_nosql.cosmosdb.create_cosmosdb_instance import CreateCosmosdbInstance
 from common.alert import Alert
+from common.checkpoint_store import Checkpoint, get_checkpoint_store
+
+FROM_CLAUSE = re.compile(r"\bfrom\s+(\w+)(?:\s+(?:as\s+)?(\w+))?", re.IGNORECASE)
+KEYWORDS    = {'where', 'order', 'group', 'join', 'offset', 'in'}
+AGGREGATES  = re.compile(r"\b(?:count|sum|avg|min|max)\s*\(|\bdistinct\b", re.IGNORECASE)
+TOP         = re.compile(r"^\s*select\s+top\b", re.IGNORECASE)
+# string literals, and the comments the query language allows
+LITERALS    = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|--[^\n]*")
+
+
+def with_ts_order(sql_query):
+    """
+    Order the query on _ts on the server. Queries already ordered, grouped, aggregated, selecting DISTINCT rows, a
+    VALUE or the TOP rows, or paged with OFFSET are left as they are, Cosmos rejects an ORDER BY on most of them,
+    and TOP would return other rows once ordered. String literals and comments are not looked at, the comments are
+    removed from the ordered query so none of them comments the ORDER BY out.
+    eg. "select * from c where c.val > 2" -> "select * from c where c.val > 2 ORDER BY c._ts"
+    :param sql_query: String
+    :return: String
+    """
+    query   = LITERALS.sub(lambda match: " " if match.group().startswith('--') else match.group(), sql_query)
+    masked  = LITERALS.sub(lambda match: " " if match.group().startswith('--') else "''", sql_query)
+    lowered = " ".join(masked.lower().split())
+    match   = FROM_CLAUSE.search(masked)
+    if not match or 'order by' in lowered or 'group by' in lowered or lowered.startswith('select value') \
+            or ' offset ' in lowered or AGGREGATES.search(masked) or TOP.search(masked):
+        return sql_query
+    alias = match.group(2) if match.group(2) and match.group(2).lower() not in KEYWORDS else match.group(1)
+    return f"{query.rstrip().rstrip(';').rstrip()} ORDER BY {alias}._ts"
 
 
 class GetCosmosData:
@@ -21,24 +52,90 @@ class GetCosmosData:
         self.create_db_instance = CreateCosmosdbInstance(
             uri=uri, key=key, database_name=database_name, container_name=container_name, **options
         )
+        self.checkpoint_store = get_checkpoint_store(options.get('checkpoint_store'))
+        self.checkpoint_id    = options.get('checkpoint_id')
+        self.checkpoint       = None
+        self.page_size        = options.get('page_size', 1000)
+        self.partition_keys   = options.get('partition_keys')
+        self.use_change_feed  = options.get('use_change_feed', False)
+        self.change_feed      = None
         self.previous_diff_val = options.get('initially_fetch_value_greater_than_this') or calendar.timegm(time.gmtime())
+        if self.get_checkpoint() and not self.use_change_feed:
+            self.previous_diff_val = self.checkpoint.load(self.previous_diff_val)
 
     def get_data_with_query(self, sql_query, **options):
         """
-        Get data using SQL Query
+        Get data using SQL Query, ordered on _ts by the server. Queries are routed to the partitions of the
+        partition_key / partition_keys options, default the partition_keys given while initializing, or run across
+        all the partitions without them.
         :param sql_query:
-        :return:
+        :param options: partition_keys, workers, see query_partitions(), and the options of iterate_pages()
+        :return: list of documents
+        """
+        partition_keys = options.pop('partition_keys', None)
+        workers        = options.pop('workers', 8)
+        if partition_keys is None and 'partition_key' not in options:
+            partition_keys = self.partition_keys
+        if partition_keys is not None:
+            return self.query_partitions(sql_query, partition_keys, workers, **options)
+        data_ = []
+        for page, _ in self.iterate_pages(sql_query, **options):
+            data_.extend(page)
+        return data_
+
+    def query_partitions(self, sql_query, partition_keys, workers = 8, **options):
+        """
+        Run the query only on the partitions of the keys, without fanning out to the other partitions. With several
+        keys every partition is queried on its own, concurrently, and the results are merged in _ts order.
+        eg. get_data.query_partitions("select * from c where c._ts > 1610000000", ['device-1', 'device-2'])
+        :param sql_query:
+        :param partition_keys: value of the partition key, or list of values
+        :param workers: number of partitions queried at the same time
+        :param options: see iterate_pages()
+        :return: list of documents, sorted on _ts unless the query has its own ORDER BY or does not select _ts, the
+                 partitions are then concatenated in the order of the keys
+        """
+        from multiprocessing.pool import ThreadPool
+        if not isinstance(partition_keys, (list, tuple, set)):
+            partition_keys = [partition_keys]
+        partition_keys = list(partition_keys)
+        if not partition_keys:
+            return []
+
+        def _query(partition_key):
+            return self.get_data_with_query(sql_query, partition_key=partition_key, **options)
+
+        if len(partition_keys) == 1:
+            return _query(partition_keys[0])
+        with ThreadPool(processes=min(workers, len(partition_keys))) as pool:
+            results = pool.map(_query, partition_keys)
+        if options.get('order_by_ts', True) and with_ts_order(sql_query) != sql_query \
+                and all('_ts' in datum for result in results for datum in result):
+            # every partition is already ordered on _ts by the server
+            return list(heapq.merge(*results, key=lambda datum: datum['_ts']))
+        return [datum for result in results for datum in result]
+
+    def iterate_pages(self, sql_query, page_size = None, continuation_token = None, **options):
+        """
+        Run the query page by page, only one page is held in memory. The query is ordered on _ts by the server,
+        unless it has its own ORDER BY. Pass the continuation token of the last processed page to resume after it.
+        :param sql_query:
+        :param page_size: maximum documents per page (max_item_count), default the page_size option, 1000
+        :param continuation_token: token returned with a page, the query resumes after that page
+        :param options:
+                order_by_ts : order the query on _ts, default True
+                other options are passed to query_items(), eg. partition_key or parameters
+        :return: generator of tuples of (list of documents, continuation token of the next page, None after the last)
         """
+        if options.pop('order_by_ts', True):
+            sql_query = with_ts_order(sql_query)
+        options.setdefault('enable_cross_partition_query', 'partition_key' not in options)
         data = self.create_db_instance.container_client.query_items(
-            query = sql_query, enable_cross_partition_query=True, **options
+            query = sql_query, max_item_count = page_size or self.page_size, **options
         )
-        data_ = [datum for datum in data]
-        try:
-            data_.sort(key = lambda datum: datum['_ts'])
-        except Exception as e:
-            print(e.args[0])
-            return data_
-        return data_
+        pages = data.by_page(continuation_token)
+        for page in pages:
+            yield list(page), pages.continuation_token
 
     def get_all_data(self):
         """
@@ -47,17 +144,67 @@ class GetCosmosData:
         """
         return self.get_data_with_query(sql_query=f"select * from {self.container_name}")
 
+    def get_checkpoint(self):
+        """
+        Checkpoint of the differential reads, None without a checkpoint_store. With use_change_feed it keeps the
+        change feed tokens instead of the _ts watermark.
+        :return: Checkpoint object
+        """
+        if not self.checkpoint_store:
+            return None
+        reader_id = self.checkpoint_id or "|".join(['cosmos', self.uri, self.database_name, self.container_name,
+                                                    'change_feed' if self.use_change_feed else '_ts'])
+        if self.checkpoint is None or self.checkpoint.reader_id != reader_id:
+            self.checkpoint = Checkpoint(self.checkpoint_store, reader_id)
+        return self.checkpoint
+
+    def commit_checkpoint(self):
+        """
+        Commit the watermark of the last batch returned by return_differential_data(), call it once the batch is
+        processed. Otherwise it is committed when the next batch is asked for.
+        :return:
+        """
+        if self.checkpoint:
+            self.checkpoint.commit()
+
+    def change_feed_reader(self, **options):
+        """
+        Reader of the change feed of the container, starting from initially_fetch_value_greater_than_this (default
+        now) unless its checkpoint has tokens. return_differential_data() uses it when use_change_feed is set.
+        :param options: see CosmosChangeFeedReader, eg. start_from_beginning, max_item_count, workers
+        :return: CosmosChangeFeedReader object
+        """
+        options.setdefault('start_time', self.previous_diff_val)
+        self.change_feed = CosmosChangeFeedReader(
+            self.create_db_instance.container_client, checkpoint=self.get_checkpoint(), **options
+        )
+        return self.change_feed
+
     def return_differential_data(self, **options):
         """
         Get differential data, currently supports only _ts column name, if not, then use table storage instead.
-        :return:
+        With use_change_feed the changes are read from the change feed instead of a cross partition query on _ts.
+        With a checkpoint_store the watermark is committed to it once the batch is processed, see commit_checkpoint().
+        :return: pandas df sorted on _ts, or [] when there is no new data
         """
+        if self.use_change_feed:
+            pandas_df = (self.change_feed or self.change_feed_reader()).read_changes_as_df()
+            if len(pandas_df):
+                self.previous_diff_val = pandas_df['_ts'].iloc[-1]
+            return pandas_df
+        checkpoint = self.get_checkpoint()
+        if checkpoint:
+            # asking for the next batch means the previous one has been processed
+            checkpoint.commit()
         data = self.get_data_with_query(sql_query=f"select * from {self.container_name} "
                                                   f"where {self.container_name}._ts > {self.previous_diff_val}")
         if data:
+            import pandas as pd
             pandas_df = pd.DataFrame(data)
             pandas_df.sort_values('_ts', inplace=True)
             self.previous_diff_val = pandas_df['_ts'].iloc[-1]
+            if checkpoint:
+                checkpoint.stage(self.previous_diff_val)
         else:
             pandas_df = []
         return pandas_df
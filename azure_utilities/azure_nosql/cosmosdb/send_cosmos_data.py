@@ -1,3 +1,4 @@
+from azure_utilities.azure_nosql.cosmosdb.bulk_upsert import CosmosBulkWriter
 from azure_utilities.azure_nosql.cosmosdb.create_cosmosdb_instance import CreateCosmosdbInstance
 from beartype import beartype
 
@@ -15,6 +16,7 @@ class SendCosmosData:
         self.create_db_instance = CreateCosmosdbInstance(
             uri=uri, key=key, database_name=database_name, container_name=container_name, **options
         )
+        self.partition_key_path_ = None
 
     def create_container_if_does_not_exist(self, partition_key_path):
         """
@@ -22,6 +24,7 @@ class SendCosmosData:
         :return:
         """
         self.create_db_instance.create_container_if_does_not_exists(partition_key_path = partition_key_path)
+        self.partition_key_path_ = None
 
     def create_database_if_doest_not_exists(self, **options):
         """
@@ -31,13 +34,41 @@ class SendCosmosData:
         self.create_db_instance.create_db_if_doest_not_exists(**options)
 
     @beartype
-    def commit_batch_data(self, data: (dict, list)):
+    def commit_batch_data(self, data: (dict, list), **options):
         """
-        Commit the data
-        :param data:
-        :return:
+        Commit the data. The documents are upserted concurrently, the ones sharing a partition key in transactional
+        batches, and throttled requests are retried, see CosmosBulkWriter.
+        :param data: dict or list of dicts
+        :param options:
+                workers          : number of requests in flight at the same time, default 8
+                max_retries      : number of times a throttled request is retried, default 5
+                batch_size       : upserts per transactional batch, at most 100
+                use_batch        : send same partition documents as transactional batches, default True
+                raise_on_failure : raise when documents fail after all retries, default True
+        :return: dict like {'documents': 1000, 'succeeded': 1000, 'failed': 0, 'request_charge': 10240.5,
+                            'seconds': 3.2, 'results': [...]}
         """
         if isinstance(data, dict):
             data = [data]
-        for datum in data:
-            self.create_db_instance.container_client.upsert_item(datum)
\ No newline at end of file
+        writer = CosmosBulkWriter(
+            self.create_db_instance.container_client,
+            partition_key_path=self.partition_key_path(),
+            workers=options.pop('workers', 8),
+            max_retries=options.pop('max_retries', 5),
+            **options
+        )
+        return writer.upsert(data)
+
+    def partition_key_path(self):
+        """
+        Path of the partition key of the container, eg. '/name'. Read from the container once when it was not given
+        while initializing.
+        :return:
+        """
+        if self.partition_key_path_ is None:
+            partition_key_path = self.create_db_instance.options_.get('partition_key_path')
+            if isinstance(partition_key_path, str) and partition_key_path[0] != "/":
+                partition_key_path = "/" + partition_key_path
+            self.partition_key_path_ = partition_key_path or \
+                self.create_db_instance.container_client.read()['partitionKey']['paths'][0]
+        return self.partition_key_path_
\ No newline at end of file
@@ -1,6 +1,5 @@
-from azure_utilities.identity import Identity
-
 if __name__ == "__main__":
+    from azure_utilities.identity import Identity
     from azure_utilities.azure_nosql.table_storage.send_table_data import SendTableData
     from azure_utilities.azure_nosql.table_storage.get_table_data import GetTableData
 
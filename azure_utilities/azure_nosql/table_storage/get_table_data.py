@@ -1,10 +1,10 @@
 from datetime import datetime as dt, timedelta
 
-import pandas as pd
 from azure.cosmosdb.table.tableservice import TableService
 from beartype import beartype
 
 from common.alert import Alert
+from common.checkpoint_store import Checkpoint, get_checkpoint_store
 
 
 def sanitize_str(val):
@@ -36,6 +36,9 @@ class GetTableData:
         self.differential_column = options.get('differential_column') or "Timestamp"
         self.previous_diff_val   = None
         self.executed_at         = dt.utcnow()
+        self.checkpoint_store    = get_checkpoint_store(options.get('checkpoint_store'))
+        self.checkpoint_id       = options.get('checkpoint_id')
+        self.checkpoint          = None
 
     def get_data_on_partition_and_row_key(self, partition_key, row_key):
         """
@@ -94,6 +97,28 @@ class GetTableData:
 
         return self.get_data_with_raw_filter(raw_query=filter_, select = select_)
 
+    def get_checkpoint(self):
+        """
+        Checkpoint of the differential reads, None without a checkpoint_store
+        :return: Checkpoint object
+        """
+        if not self.checkpoint_store:
+            return None
+        reader_id = self.checkpoint_id or "|".join(['table', self.table_service.account_name, self.table_name,
+                                                             self.differential_column])
+        if self.checkpoint is None or self.checkpoint.reader_id != reader_id:
+            self.checkpoint = Checkpoint(self.checkpoint_store, reader_id)
+        return self.checkpoint
+
+    def commit_checkpoint(self):
+        """
+        Commit the watermark of the last batch returned by return_differential_data(), call it once the batch is
+        processed. Otherwise it is committed when the next batch is asked for.
+        :return:
+        """
+        if self.checkpoint:
+            self.checkpoint.commit()
+
     def return_differential_data(self,
                                  differential_column = None,
                                  initially_fetch_data_greater_than_this = None,
@@ -102,12 +127,21 @@ class GetTableData:
         Get incremental data on the specified column. This function will fetch data which inserted after
         the self.previous_diff_val when the function was previously called.
 
+        With a checkpoint_store the watermark is loaded from it on the first call, and committed to it once the batch
+        is processed, see commit_checkpoint().
+
         :param differential_column: column on which the differential parameter will be implemented
-        :param initially_fetch_data_greater_than_this: initial value to be fetched
+        :param initially_fetch_data_greater_than_this: initial value to be fetched, when there is no checkpoint
         :param options:
         :return:
         """
         self.differential_column = differential_column if differential_column else self.differential_column
+        checkpoint = self.get_checkpoint()
+        if checkpoint:
+            # asking for the next batch means the previous one has been processed
+            checkpoint.commit()
+            if not self.previous_diff_val:
+                self.previous_diff_val = checkpoint.load()
 
         if initially_fetch_data_greater_than_this and (self.previous_diff_val != initially_fetch_data_greater_than_this)\
                 and (not self.previous_diff_val):
@@ -125,6 +159,7 @@ class GetTableData:
         if len(data) == 0:
             return []
 
+        import pandas as pd
         pd.set_option("display.max_rows", None, "display.max_columns", None)
         pandas_df = pd.DataFrame(data)
         pandas_df.sort_values(by = self.differential_column, inplace=True)
@@ -133,6 +168,8 @@ class GetTableData:
             self.previous_diff_val = pandas_df[self.differential_column].iloc[-1].isoformat()[:-9] + 'Z'
         else:
             self.previous_diff_val = pandas_df[self.differential_column].iloc[-1]
+        if checkpoint:
+            checkpoint.stage(self.previous_diff_val)
         return pandas_df
 
     @beartype
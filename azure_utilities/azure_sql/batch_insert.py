@@ -0,0 +1,77 @@
+import time
+
+
+class BatchInsert:
+    """
+    Batch insert engine used by SQLSendData. It builds one parameterized INSERT statement per column set and binds the
+    rows through cursor.executemany() in chunks, so SQL Server compiles a single plan per column set and the 1000 rows
+    limit of a VALUES list does not apply.
+    """
+    def __init__(self, chunk_size = 1000, **options):
+        assert isinstance(chunk_size, int) and chunk_size > 0, "chunk_size should be a positive integer"
+        self.chunk_size       = chunk_size
+        self.print_results    = options.get('print_results', True)
+        # only used by cursors that support it, ie. pyodbc
+        self.fast_executemany = options.get('fast_executemany', True)
+        self._query_cache     = {}
+
+    def build_insert_query(self, table_name, columns):
+        """
+        Returns the prepared INSERT statement for the table and column set, the statement is built once and cached
+        :param table_name: name of the table
+        :param columns: list of column names, in the same order as the values of each row
+        :return: String
+        """
+        key = (table_name, tuple(columns))
+        if key not in self._query_cache:
+            self._query_cache[key] = f"INSERT INTO {table_name} ({', '.join(columns)}) " \
+                                     f"VALUES ({', '.join(['?'] * len(columns))})"
+        return self._query_cache[key]
+
+    def insert(self, cursor, table_name, columns, rows, chunk_size = None):
+        """
+        Insert the rows in chunks of chunk_size using cursor.executemany()
+        :param cursor: cursor object of the connection
+        :param table_name: name of the table
+        :param columns: list of column names
+        :param rows: list of tuples / lists, each one having a value for every column in 'columns'
+        :param chunk_size: number of rows bound per executemany() call, defaults to self.chunk_size
+        :return: list of dicts, one per chunk, like {'chunk': 0, 'rows': 1000, 'seconds': 0.21}
+        """
+        chunk_size = chunk_size or self.chunk_size
+        query      = self.build_insert_query(table_name, columns)
+        if self.print_results:
+            print(f"Executing query : {query}, rows -> {len(rows)}, chunk size -> {chunk_size}")
+
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = self.fast_executemany
+
+        chunk_stats = []
+        for chunk_no, start in enumerate(range(0, len(rows), chunk_size)):
+            chunk = [tuple(row) for row in rows[start: start + chunk_size]]
+            assert all(len(row) == len(columns) for row in chunk), \
+                f"Every row should have {len(columns)} values, one for each of the columns {columns}"
+            started_at = time.perf_counter()
+            cursor.executemany(query, chunk)
+            chunk_stats.append({
+                'chunk'  : chunk_no,
+                'rows'   : len(chunk),
+                'seconds': time.perf_counter() - started_at
+            })
+        return chunk_stats
+
+
+def summarize_chunk_stats(chunk_stats):
+    """
+    Sum up the stats returned by BatchInsert.insert()
+    :param chunk_stats: list of per chunk stats
+    :return: dict like {'chunks': 3, 'rows': 2500, 'seconds': 0.6, 'rows_per_sec': 4166.6}
+    """
+    rows    = sum(stat['rows'] for stat in chunk_stats)
+    seconds = sum(stat['seconds'] for stat in chunk_stats)
+    return {
+        'chunks'      : len(chunk_stats),
+        'rows'        : rows,
+        'seconds'     : seconds,
+        'rows_per_sec': rows / seconds if seconds else 0.0
+    }
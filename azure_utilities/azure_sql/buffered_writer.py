@@ -0,0 +1,192 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+
+class BufferedSQLWriter:
+    """
+    Write-behind buffer around SQLSendData. Rows given to commit_data() are queued in memory and sent through the
+    batch insert path by a background thread, whenever max_rows rows or max_bytes bytes are buffered, or
+    flush_interval seconds have passed. When max_buffered_rows rows are waiting, commit_data() blocks until the
+    buffer is flushed. flush() and close() send whatever is buffered, close() also runs at interpreter exit.
+    """
+    def __init__(self,
+                 sql_send_data,
+                 max_rows          = 1000,
+                 max_bytes         = 1024 * 1024,
+                 flush_interval    = 5,
+                 max_buffered_rows = 100000,
+                 **options):
+        """
+        :param sql_send_data: SQLSendData object, connected to a table
+        :param max_rows: flush when these many rows are buffered
+        :param max_bytes: flush when the buffered rows take approximately these many bytes
+        :param flush_interval: flush at least once every these many seconds, if anything is buffered
+        :param max_buffered_rows: commit_data() blocks when these many rows are waiting to be flushed
+        :param options:
+                put_timeout : seconds commit_data() waits for space in the buffer before raising TimeoutError,
+                              default waits forever
+        """
+        assert sql_send_data.schema, "Please provide a schema by using create_table_schema() method"
+        assert max_rows <= max_buffered_rows, "max_rows should not be greater than max_buffered_rows"
+        self.sql_send_data     = sql_send_data
+        self.max_rows          = max_rows
+        self.max_bytes         = max_bytes
+        self.flush_interval    = flush_interval
+        self.max_buffered_rows = max_buffered_rows
+        self.put_timeout       = options.get('put_timeout')
+        self.last_error        = None
+        self.stats             = {'rows_flushed': 0, 'flushes': 0, 'failed_flushes': 0}
+        self._buffer           = deque()
+        self._buffered_bytes   = 0
+        self._closed           = False
+        self._condition        = threading.Condition()
+        self._flush_lock       = threading.Lock()
+        self._flush_thread     = threading.Thread(target=self._run, name="sql-write-behind", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def _normalize(self, data):
+        """
+        Convert a row given to commit_data() to a tuple of (columns, values)
+        :param data: same as SQLSendData.commit_data()
+        :return: tuple
+        """
+        if isinstance(data, dict):
+            return tuple(data.keys()), tuple(data.values())
+        if isinstance(data[0], dict):
+            return tuple(col['col_name'] for col in data), tuple(col['value'] for col in data)
+        columns = tuple(col['col_name'] for col in self.sql_send_data.schema)
+        if len(data) != len(columns):
+            columns = tuple(col for col in columns if col != 'create_dttm')
+        assert len(data) == len(columns), "All columns values are not given, as number of elements in 'data' is not " \
+                                          "equal to number of cols defined in schema"
+        return columns, tuple(data)
+
+    def commit_data(self, data):
+        """
+        Queue a single row to be sent to the table
+        :param data: dict, or a list, same as SQLSendData.commit_data()
+        :return:
+        """
+        columns, values = self._normalize(data)
+        size = sum(len(str(val)) for val in values) + 8 * len(values)
+        deadline = None if self.put_timeout is None else time.monotonic() + self.put_timeout
+        with self._condition:
+            assert not self._closed, "Writer is closed"
+            while len(self._buffer) >= self.max_buffered_rows:
+                self._condition.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Buffer is full with {len(self._buffer)} rows, last flush error -> "
+                                       f"{self.last_error}")
+                self._condition.wait(remaining)
+            self._buffer.append((columns, values, size))
+            self._buffered_bytes += size
+            if len(self._buffer) >= self.max_rows or self._buffered_bytes >= self.max_bytes:
+                self._condition.notify_all()
+
+    def _take(self):
+        """
+        Take everything out of the buffer
+        :return: list of (columns, values, size)
+        """
+        with self._condition:
+            rows = list(self._buffer)
+            self._buffer.clear()
+            self._buffered_bytes = 0
+            return rows
+
+    def _put_back(self, rows):
+        """
+        Put the rows of a failed flush back at the front of the buffer
+        :return:
+        """
+        with self._condition:
+            self._buffer.extendleft(reversed(rows))
+            self._buffered_bytes += sum(row[2] for row in rows)
+
+    def flush(self):
+        """
+        Send all buffered rows to the table, rows with the same columns are sent together in one batch
+        :return: number of rows sent
+        """
+        with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return 0
+            sent = 0
+            try:
+                start = 0
+                while start < len(rows):
+                    columns = rows[start][0]
+                    end     = start
+                    while end < len(rows) and rows[end][0] == columns:
+                        end += 1
+                    self.sql_send_data.batch_insert.insert(
+                        self.sql_send_data.cursor, self.sql_send_data.table_name, list(columns),
+                        [row[1] for row in rows[start: end]]
+                    )
+                    sent += end - start
+                    start = end
+            except Exception as err:
+                self.last_error = err
+                self.stats['failed_flushes'] += 1
+                self._put_back(rows[sent:])
+                raise
+            finally:
+                self.stats['rows_flushed'] += sent
+                if sent:
+                    self.sql_send_data.invalidate_query_cache()
+                with self._condition:
+                    self._condition.notify_all()
+            self.stats['flushes'] += 1
+            self.last_error = None
+            return sent
+
+    def _should_flush(self):
+        return len(self._buffer) >= self.max_rows or self._buffered_bytes >= self.max_bytes
+
+    def _run(self):
+        """
+        Background thread, flushes the buffer when a limit is hit or flush_interval has passed
+        :return:
+        """
+        last_flush = time.monotonic()
+        while True:
+            with self._condition:
+                while not self._closed and not self._should_flush():
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0 and self._buffer:
+                        break
+                    self._condition.wait(remaining if remaining > 0 else self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as err:
+                print(f"Error while flushing buffered rows to {self.sql_send_data.table_name}, "
+                      f"will retry, info -> {err.args}")
+                time.sleep(min(self.flush_interval, 1))
+            last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Stop the background thread and send whatever is still buffered
+        :return:
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._flush_thread.join()
+        atexit.unregister(self.close)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,201 @@
+import os
+import re
+import tempfile
+import time
+
+# java.sql.Types constants used to describe the columns of the bulk copy source
+JDBC_TYPES = {
+    'bit'             : -7,
+    'tinyint'         : -6,
+    'smallint'        : 5,
+    'int'             : 4,
+    'integer'         : 4,
+    'bigint'          : -5,
+    'float'           : 8,
+    'real'            : 7,
+    'decimal'         : 3,
+    'numeric'         : 2,
+    'money'           : 3,
+    'smallmoney'      : 3,
+    'char'            : 1,
+    'varchar'         : 12,
+    'text'            : -1,
+    'nchar'           : -15,
+    'nvarchar'        : -9,
+    'ntext'           : -16,
+    'date'            : 91,
+    'time'            : 92,
+    'datetime'        : 93,
+    'datetime2'       : 93,
+    'smalldatetime'   : 93,
+    'uniqueidentifier': 1,
+}
+
+# datatypes whose values are written without a fractional part
+INTEGER_TYPES = {'bit', 'tinyint', 'smallint', 'int', 'integer', 'bigint'}
+
+# precision and scale used when the datatype of the schema does not mention them, eg. INFORMATION_SCHEMA.DATA_TYPE
+DEFAULT_PRECISION = {
+    'char'            : 8000,
+    'varchar'         : 8000,
+    'text'            : 8000,
+    'nchar'           : 4000,
+    'nvarchar'        : 4000,
+    'ntext'           : 4000,
+    'decimal'         : 38,
+    'numeric'         : 38,
+    'money'           : 19,
+    'smallmoney'      : 10,
+    'uniqueidentifier': 36,
+    'datetime'        : 23,
+    'datetime2'       : 27,
+    'smalldatetime'   : 16,
+}
+DEFAULT_SCALE = {
+    'decimal'   : 18,
+    'numeric'   : 18,
+    'money'     : 4,
+    'smallmoney': 4,
+    'datetime'  : 3,
+    'datetime2' : 7,
+}
+
+
+def parse_sql_datatype(datatype):
+    """
+    Split a datatype of the schema in its name, precision and scale
+    eg. 'VARCHAR(50)' -> ('varchar', 50, 0), 'decimal(10, 2)' -> ('decimal', 10, 2), 'int' -> ('int', 0, 0)
+    :param datatype: datatype as stored in self.schema
+    :return: tuple
+    """
+    match = re.match(r"\s*(\w+)\s*(?:\(\s*(\w+)\s*(?:,\s*(\d+)\s*)?\))?", datatype)
+    assert match, f"Unable to parse the datatype {datatype}"
+    name      = match.group(1).lower()
+    precision = match.group(2)
+    scale     = match.group(3)
+    if precision is None or not precision.isdigit():
+        # either not given or 'max'
+        precision = DEFAULT_PRECISION.get(name, 0)
+    return name, int(precision), int(scale) if scale else DEFAULT_SCALE.get(name, 0)
+
+
+class BulkCopy:
+    """
+    Load a pandas DataFrame into a table through the SQLServerBulkCopy API of the mssql-jdbc driver shipped under
+    common/sql_driver_jars. The frame is spooled chunk by chunk to a temporary CSV file, which the driver reads with
+    SQLServerBulkCSVFileRecord and streams to the server as a bulk insert.
+    """
+    def __init__(self, conn, table_name, schema, **options):
+        """
+        :param conn: jaydebeapi connection object
+        :param table_name: name of the destination table
+        :param schema: schema of the table, like self.schema of SQLSendData
+        :param options:
+                batch_size   : number of rows sent to the server per batch, default 10000
+                chunk_size   : number of rows of the DataFrame written to the spool file at a time, default 100000
+                timeout      : bulk copy timeout in seconds, 0 means no timeout
+                table_lock   : take a table lock for the duration of the bulk copy, default True
+                print_results: print what is being done, default True
+        """
+        assert hasattr(conn, 'jconn'), "Bulk copy needs a JDBC connection made through jaydebeapi"
+        self.conn          = conn
+        self.table_name    = table_name
+        self.schema        = {col['col_name']: col['datatype'] for col in schema}
+        self.batch_size    = options.get('batch_size') or 10000
+        self.chunk_size    = options.get('chunk_size') or 100000
+        self.timeout       = options.get('timeout') or 0
+        self.table_lock    = options.get('table_lock', True)
+        self.print_results = options.get('print_results', True)
+
+    def map_columns(self, data, column_mapping = None):
+        """
+        Map the columns of the DataFrame to the columns of the table using the schema
+        :param data: pandas DataFrame
+        :param column_mapping: dict like {'<df-column>': '<table-column>'} for the columns which are named differently
+        :return: list of tuples like (<df-column>, <table-column>, <datatype>)
+        """
+        column_mapping = {key: val.lower() for key, val in (column_mapping or {}).items()}
+        mapped = []
+        for df_col in data.columns:
+            table_col = column_mapping.get(df_col) or str(df_col).lower()
+            assert table_col in self.schema, f"Column {df_col} of the DataFrame is not present in the schema of " \
+                                             f"{self.table_name}, pass column_mapping to map it."
+            mapped.append((df_col, table_col, self.schema[table_col]))
+        return mapped
+
+    def write_csv(self, data, file_path, columns = None):
+        """
+        Write the DataFrame to a CSV file, chunk by chunk, so only one chunk is rendered in memory at a time.
+        Float columns loaded into integer columns (pandas makes an int column with NaN a float one) are written as
+        integers, the driver does not parse '1.0' as an INT.
+        :param data: pandas DataFrame
+        :param file_path: path of the file
+        :param columns: mapped columns, see map_columns(), default map_columns(data)
+        :return:
+        """
+        columns     = columns if columns is not None else self.map_columns(data)
+        int_columns = [df_col for df_col, _, datatype in columns
+                       if parse_sql_datatype(datatype)[0] in INTEGER_TYPES and data[df_col].dtype.kind == 'f']
+        with open(file_path, "w", encoding="utf-8", newline="") as csv_file:
+            for start in range(0, len(data), self.chunk_size):
+                chunk = data.iloc[start: start + self.chunk_size]
+                if int_columns:
+                    chunk = chunk.astype({df_col: "Int64" for df_col in int_columns})
+                chunk.to_csv(csv_file, header=False, index=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S.%f")
+
+    def load(self, data, column_mapping = None):
+        """
+        Bulk copy the DataFrame into the table
+        :param data: pandas DataFrame
+        :param column_mapping: dict like {'<df-column>': '<table-column>'}
+        :return: dict like {'rows': 5000000, 'seconds': 180.2, 'rows_per_sec': 27746.9}
+        """
+        import jpype
+        columns = self.map_columns(data, column_mapping)
+
+        file_descriptor, file_path = tempfile.mkstemp(suffix=".csv", prefix="bulk_copy_")
+        os.close(file_descriptor)
+        record = bulk_copy = None
+        try:
+            started_at = time.perf_counter()
+            if self.print_results:
+                print(f"Spooling {len(data)} rows for bulk copy into {self.table_name}...")
+            self.write_csv(data, file_path, columns)
+
+            record = jpype.JClass("com.microsoft.sqlserver.jdbc.SQLServerBulkCSVFileRecord")(
+                file_path, "UTF-8", ",", False
+            )
+            record.setEscapeColumnDelimitersCSV(True)
+            bulk_options = jpype.JClass("com.microsoft.sqlserver.jdbc.SQLServerBulkCopyOptions")()
+            bulk_options.setBatchSize(self.batch_size)
+            bulk_options.setBulkCopyTimeout(self.timeout)
+            bulk_options.setTableLock(self.table_lock)
+
+            bulk_copy = jpype.JClass("com.microsoft.sqlserver.jdbc.SQLServerBulkCopy")(self.conn.jconn)
+            bulk_copy.setBulkCopyOptions(bulk_options)
+            bulk_copy.setDestinationTableName(self.table_name)
+            for ordinal, (df_col, table_col, datatype) in enumerate(columns, start=1):
+                type_name, precision, scale = parse_sql_datatype(datatype)
+                record.addColumnMetadata(ordinal, table_col, JDBC_TYPES.get(type_name, 12), precision, scale)
+                bulk_copy.addColumnMapping(ordinal, table_col)
+
+            if self.print_results:
+                print(f"Bulk copying into {self.table_name} with batch size {self.batch_size}...")
+            bulk_copy.writeToServer(record)
+            seconds = time.perf_counter() - started_at
+            if self.print_results:
+                print(f"Bulk copied {len(data)} rows in {seconds:.2f} seconds")
+            return {
+                'rows'        : len(data),
+                'seconds'     : seconds,
+                'rows_per_sec': len(data) / seconds if seconds else 0.0
+            }
+        except Exception as err:
+            print(f"Error while bulk copying into {self.table_name}")
+            raise Exception(err.args[0] if err.args else err)
+        finally:
+            if bulk_copy is not None:
+                bulk_copy.close()
+            if record is not None:
+                record.close()
+            os.remove(file_path)
@@ -1,5 +1,6 @@
 from beartype import beartype
 from common.sql_utilities import *
+from .query_cache import is_cacheable
 
 
 class SQLCredentials:
@@ -18,26 +19,88 @@ class SQLCredentials:
         self.database_name = database_name
 
 
-def execute_raw_query(cursor, query, print_results = True, return_result = False):
+def execute_raw_query(cursor, query, print_results = True, return_result = False, params = None, query_cache = None):
     """
       Execute raw query on your db using the conn object
       :param cursor:
       :param return_result:
       :param query:
       :param print_results: Turn off printing of queries
+      :param params: list of values bound to the '?' placeholders of the query
+      :param query_cache: QueryCache object, the results of select queries are read from / kept in it
       :return:
     """
+    cacheable = query_cache is not None and return_result and is_cacheable(query)
+    if cacheable:
+        hit, result = query_cache.get(query, params)
+        if hit:
+            if print_results:
+                print(f"Query cache hit : {query}")
+            return result
 
     if print_results:
-        print(f"Executing query : {query}")
+        print(f"Executing query : {query}" + (f", params -> {params}" if params else ""))
 
-    cursor.execute(query)
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
 
     if return_result:
-        result = cursor.fetchall()
+        # rows of some drivers (eg. pyodbc) are not tuples, which pandas does not read as rows
+        result = [row if isinstance(row, tuple) else tuple(row) for row in cursor.fetchall()]
+        if cacheable:
+            query_cache.set(query, params, result)
         return result
 
 
+def set_fetch_size(cursor, fetch_size):
+    """
+    Set the number of rows fetched per round trip. fetchmany() reads 'arraysize' rows, and the JDBC result set of
+    jaydebeapi cursors also gets the hint, so the driver does not buffer more rows than that
+    :param cursor: cursor object, after execute()
+    :param fetch_size: number of rows
+    :return:
+    """
+    cursor.arraysize = fetch_size
+    result_set = getattr(cursor, '_rs', None)
+    if result_set is not None:
+        result_set.setFetchSize(fetch_size)
+
+
+def iterate_raw_query(cursor, query, fetch_size = 10000, print_results = True, params = None, close_cursor = True):
+    """
+    Execute the query and yield its result in chunks of at most fetch_size rows, using fetchmany(), so only one chunk
+    is held in memory at a time. The cursor is closed once the generator is exhausted or closed early, eg. on a
+    'break' out of the loop, which releases the result set still pending on the server, so pass a cursor dedicated
+    to this query
+    :param cursor: cursor object
+    :param query: select query
+    :param fetch_size: number of rows per chunk
+    :param print_results: Turn off printing of queries
+    :param params: list of values bound to the '?' placeholders of the query
+    :param close_cursor: close the cursor at the end, pass False to read its description afterwards
+    :return: generator of lists of tuples
+    """
+    assert isinstance(fetch_size, int) and fetch_size > 0, "fetch_size should be a positive integer"
+    if print_results:
+        print(f"Executing query : {query}, fetch size -> {fetch_size}" + (f", params -> {params}" if params else ""))
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        set_fetch_size(cursor, fetch_size)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield [row if isinstance(row, tuple) else tuple(row) for row in rows]
+    finally:
+        if close_cursor:
+            cursor.close()
+
+
 @beartype
 def get_jdbc_url(sql_credentials: SQLCredentials) -> str:
     """
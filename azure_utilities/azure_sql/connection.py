@@ -1,5 +1,9 @@
+import time
 from .common_utils import *
 from common.sql_utilities import create_jdbc_url, check_connection
+from .connection_pool import get_connection_pool
+from .health_check import HealthCheck
+from .schema_cache import get_schema_cache
 
 
 class Connection:
@@ -16,37 +20,121 @@ class Connection:
         self.jdbc_url        = options.get('jdbc_url') or get_jdbc_url(self.sql_credentials)
         self.table_name      = options.get('table_name') or None
         self.schema          = []
+        self.backend         = options.get('backend') or 'jaydebeapi'
+        self.odbc_driver     = options.get('odbc_driver')
+        self.use_pool        = options.get('use_pool', False)
+        self.pool            = None
+        self.pool_options    = {
+            'min_size'        : options.get('pool_min_size', 1),
+            'max_size'        : options.get('pool_max_size', 10),
+            'idle_timeout'    : options.get('pool_idle_timeout', 300),
+            'checkout_timeout': options.get('pool_checkout_timeout', 30),
+        }
+        self.health_check    = HealthCheck(
+            self,
+            liveness_window = options.get('liveness_window', 30),
+            max_retries     = options.get('reconnect_max_retries', 5),
+            backoff_base    = options.get('reconnect_backoff_base', 0.5),
+            backoff_max     = options.get('reconnect_backoff_max', 30)
+        )
+        self.schema_cache    = options.get('schema_cache') or get_schema_cache(
+            ttl          = options.get('schema_cache_ttl', 300),
+            persist_path = options.get('schema_cache_path')
+        ) if options.get('use_schema_cache', True) else None
+        # the cache is shared by the connections of the process, each of them keeps its own ttl
+        self.schema_cache_ttl = options.get('schema_cache_ttl')
+
+    @property
+    def user_cred(self):
+        return {'user': self.sql_credentials.db_username, 'password': self.sql_credentials.db_password}
+
+    @property
+    def backend_options(self):
+        """
+        Options of the backend passed on every connect, the odbc_driver only when one was given
+        :return: dict
+        """
+        backend_options = {'backend': self.backend}
+        if self.odbc_driver:
+            backend_options['odbc_driver'] = self.odbc_driver
+        return backend_options
+
+    def get_pool(self, **options):
+        """
+        Get the process wide connection pool for the jdbc url and user of this connection
+        :param options: jar_path / jar_version and validate_on_checkout, used when the pool is created
+        :return: ConnectionPool
+        """
+        assert self.jdbc_url, "JDBC URL is not set or not provided"
+        if not self.pool or self.pool._closed:
+            self.pool = get_connection_pool(self.jdbc_url, self.user_cred,
+                                            **{**self.backend_options, **self.pool_options, **options})
+        return self.pool
+
+    def checkout(self, **options):
+        """
+        Check out a pooled connection for the current thread, it goes back to the pool when the block exits
+
+        with connection.checkout() as (conn, cursor):
+            cursor.execute(...)
+        :return: context manager yielding (connection, cursor)
+        """
+        return self.get_pool(**options).checkout()
 
     def check_connection(self, **options):
         """
-        Check connection to your database
+        Check connection to your database. If the class was initialized with use_pool=True, a connection is checked
+        out of the process wide pool instead of opening a new one, give it back using close().
         :return:
         """
         print("Checking connection....")
         assert self.jdbc_url, "JDBC URL is not set or not provided"
         print(f"Using jdbc url -> {self.jdbc_url}")
-        self.conn, self.cursor = check_connection(
-            jdbc_url   = self.jdbc_url,
-            user_cred  = {'user': self.sql_credentials.db_username, 'password': self.sql_credentials.db_password},
-            **options)
+        started_at = time.perf_counter()
+        if self.use_pool:
+            if self.conn:
+                self.close()
+            self.conn   = self.get_pool(**options).acquire()
+            self.cursor = self.conn.cursor()
+        else:
+            self.conn, self.cursor = check_connection(
+                jdbc_url   = self.jdbc_url,
+                user_cred  = self.user_cred,
+                **{**self.backend_options, **options})
+        self.health_check.record_connect(time.perf_counter() - started_at)
         if self.conn:
             print(f"Successfully Connected :D, serverName -> {self.sql_credentials.server_name}")
         if options.get('return_result'):
             return self.conn, self.cursor
 
+    def ensure_connection(self, **options):
+        """
+        Make sure the connection is alive using a 'SELECT 1' ping, which is trusted for 'liveness_window' seconds.
+        Reconnects with exponential backoff if the connection is not alive.
+        :param options: passed on to check_connection()
+        :return: tuple of (connection, cursor)
+        """
+        return self.health_check.ensure_alive(**options)
+
     def connect_to_table(self,
                          table_name: str,
                          **options):
         """
         Connect to table instance if you already have a table. This function will read the schema of your table,
         and prepare the 'schema' of your defined table, and use it to execute 'commit_data()' function.
+        The schema is read from the schema cache when it has it, pass refresh_schema=True to read it from the database.
         :param table_name: name of the table
         :param options:
         :return:
         """
         self.table_name = table_name
-        if not (self.conn and self.cursor):
-            self.check_connection()
+        self.ensure_connection()
+        if self.schema_cache and not options.get('refresh_schema'):
+            cached = self.schema_cache.get(self.sql_credentials.server_name, self.sql_credentials.database_name,
+                                           self.table_name, ttl = self.schema_cache_ttl)
+            if cached:
+                self.schema = cached
+                return self.schema, self.cursor, self.conn
         result = execute_raw_query(
             self.cursor,
             f"select COLUMN_NAME, DATA_TYPE from INFORMATION_SCHEMA.COLUMNS where TABLE_NAME = '{self.table_name}'",
@@ -59,4 +147,34 @@ class Connection:
                     'col_name': val[0].lower(),
                     'datatype': val[1]
                 })
-        return self.schema, self.cursor, self.conn
\ No newline at end of file
+            if self.schema_cache:
+                self.schema_cache.set(self.sql_credentials.server_name, self.sql_credentials.database_name,
+                                      self.table_name, self.schema)
+        return self.schema, self.cursor, self.conn
+
+    def invalidate_schema_cache(self, table_name = None):
+        """
+        Remove the cached schema of the table, call it after the table is created or altered
+        :param table_name: name of the table, default the connected table
+        :return:
+        """
+        if self.schema_cache:
+            self.schema_cache.invalidate(self.sql_credentials.server_name, self.sql_credentials.database_name,
+                                         table_name or self.table_name)
+
+    def close(self):
+        """
+        Close the connection, or give it back to the pool if it was checked out of one
+        :return:
+        """
+        if self.conn is None:
+            return
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+        if self.use_pool and self.pool:
+            self.pool.release(self.conn)
+        else:
+            self.conn.close()
+        self.conn = self.cursor = None
@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from common.sql_backends import backend_name
+from common.sql_utilities import open_connection, ping_connection
+
+# process wide pools, keyed by (jdbc_url, user, backend, odbc driver)
+_POOLS      = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    A thread safe pool of connections to one database, for one user. Connections are validated with a 'SELECT 1'
+    when they are checked out, and connections which stay idle longer than idle_timeout are closed, as long as the
+    pool holds more than min_size connections.
+    """
+    def __init__(self,
+                 jdbc_url,
+                 user_cred,
+                 min_size         = 1,
+                 max_size         = 10,
+                 idle_timeout     = 300,
+                 checkout_timeout = 30,
+                 **options):
+        """
+        :param jdbc_url: JDBC URL for the DB
+        :param user_cred: It is dict in format {'user': username, 'password': password}
+        :param min_size: number of connections kept open even when they are idle
+        :param max_size: maximum number of connections open at a time
+        :param idle_timeout: seconds after which an idle connection is closed
+        :param checkout_timeout: seconds to wait for a free connection when max_size connections are in use
+        :param options:
+                validate_on_checkout : run 'SELECT 1' on a connection before handing it out, default True
+                backend, jar_path / jar_version : passed on while opening new connections
+        """
+        assert user_cred.get('user') and user_cred.get('password'), "Please provide a username and password"
+        assert 0 <= min_size <= max_size and max_size > 0, "Pool size should satisfy 0 <= min_size <= max_size"
+        self.jdbc_url             = jdbc_url
+        self.user_cred            = user_cred
+        self.min_size             = min_size
+        self.max_size             = max_size
+        self.idle_timeout         = idle_timeout
+        self.checkout_timeout     = checkout_timeout
+        self.validate_on_checkout = options.get('validate_on_checkout', True)
+        self.options_             = options
+        self._idle                = deque()
+        self._size                = 0
+        self._closed              = False
+        self._condition           = threading.Condition()
+        self._local               = threading.local()
+        self.stats                = {'opened': 0, 'closed': 0, 'checkouts': 0, 'failed_validations': 0}
+
+        for _ in range(self.min_size):
+            self._size += 1
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        """
+        Open a new connection, the caller has already counted it in the size of the pool
+        :return: connection object
+        """
+        try:
+            conn = open_connection(self.jdbc_url, self.user_cred, **self.options_)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        self.stats['opened'] += 1
+        return conn
+
+    def _close(self, conn):
+        """
+        Close the connection and remove it from the size of the pool
+        :return:
+        """
+        self._size -= 1
+        self.stats['closed'] += 1
+        try:
+            conn.close()
+        except Exception as err:
+            print(f"Error while closing pooled connection, info -> {err.args}")
+
+    def evict_idle(self):
+        """
+        Close the connections that have been idle for more than idle_timeout seconds, keeping at least min_size open
+        :return: number of connections closed
+        """
+        evicted = 0
+        with self._condition:
+            now = time.monotonic()
+            for conn, last_used in list(self._idle):
+                if self._size <= self.min_size:
+                    break
+                if now - last_used > self.idle_timeout:
+                    self._idle.remove((conn, last_used))
+                    self._close(conn)
+                    evicted += 1
+        return evicted
+
+    def acquire(self, timeout = None):
+        """
+        Get a connection from the pool. A new connection is opened if no idle connection is present and the pool has
+        less than max_size connections, otherwise waits for a connection to be released.
+        :param timeout: seconds to wait for a connection, default self.checkout_timeout
+        :return: connection object
+        """
+        timeout  = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self.evict_idle()
+        while True:
+            conn = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    assert not self._closed, "Connection pool is closed"
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No connection available in the pool after {timeout} seconds, "
+                                           f"all {self.max_size} connections are in use")
+                    self._condition.wait(remaining)
+                assert not self._closed, "Connection pool is closed"
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                else:
+                    # reserve the slot, the connection is opened outside the lock
+                    self._size += 1
+
+            if conn is None:
+                conn = self._open()
+            elif self.validate_on_checkout and not ping_connection(conn):
+                with self._condition:
+                    self.stats['failed_validations'] += 1
+                    self._close(conn)
+                    self._condition.notify()
+                continue
+            self.stats['checkouts'] += 1
+            return conn
+
+    def release(self, conn, discard = False):
+        """
+        Give the connection back to the pool
+        :param conn: connection object returned by acquire()
+        :param discard: close the connection instead of keeping it, eg. when it is broken
+        :return:
+        """
+        with self._condition:
+            if discard or self._closed:
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Check out a connection for the current thread. Nested checkouts on the same thread get the same connection and
+        cursor, the connection goes back to the pool when the outermost block exits.
+
+        with pool.checkout() as (conn, cursor):
+            cursor.execute(...)
+        :return: tuple of (connection, cursor)
+        """
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield self._local.conn, self._local.cursor
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn    = self.acquire()
+        discard = False
+        self._local.conn, self._local.cursor, self._local.depth = conn, conn.cursor(), 1
+        try:
+            yield self._local.conn, self._local.cursor
+        except Exception:
+            discard = not ping_connection(conn)
+            raise
+        finally:
+            try:
+                self._local.cursor.close()
+            except Exception:
+                pass
+            self._local.conn = self._local.cursor = None
+            self._local.depth = 0
+            self.release(conn, discard = discard)
+
+    def close(self):
+        """
+        Close all idle connections of the pool, connections in use are closed when they are released
+        :return:
+        """
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close(conn)
+            self._condition.notify_all()
+
+
+def get_connection_pool(jdbc_url, user_cred, **options):
+    """
+    Returns the process wide pool for the JDBC URL, user, backend and ODBC driver, creating it on the first call.
+    Options are used only when the pool is created, see ConnectionPool for them.
+    :param jdbc_url: JDBC URL for the DB
+    :param user_cred: It is dict in format {'user': username, 'password': password}
+    :return: ConnectionPool
+    """
+    key = (jdbc_url, user_cred.get('user'), backend_name(options.get('backend')), options.get('odbc_driver'))
+    with _POOLS_LOCK:
+        if key not in _POOLS or _POOLS[key]._closed:
+            _POOLS[key] = ConnectionPool(jdbc_url, user_cred, **options)
+        return _POOLS[key]
+
+
+def close_all_pools():
+    """
+    Close every pool created through get_connection_pool()
+    :return:
+    """
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
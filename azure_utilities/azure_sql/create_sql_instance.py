@@ -1,6 +1,4 @@
-from azure.mgmt.sql import SqlManagementClient
 from .common_utils import *
-from azure.mgmt.sql.models import Sku
 from azure_utilities.identity import Identity
 
 
@@ -14,6 +12,8 @@ class CreateSQLInstance:
                  sql_credentials : SQLCredentials ,
                  identity : Identity              ,
                  **options):
+        from azure.mgmt.sql import SqlManagementClient
+        from azure.mgmt.sql.models import Sku
         self.sql_credentials = sql_credentials
         self.default_RG      = options.get('resource_group_name') or "default_rg_python"
         self.region          = options.get('region') or "westus"
@@ -143,4 +143,5 @@ class CreateSQLInstance:
         :param capacity: Capacity of the SKU
         :return:
         """
+        from azure.mgmt.sql.models import Sku
         self.sku = Sku(name = name, tier = tier, size = size, family = family, capacity = capacity)
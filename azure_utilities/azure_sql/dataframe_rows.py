@@ -0,0 +1,61 @@
+import sys
+
+
+def is_dataframe(data):
+    """
+    Check if data is a pandas DataFrame, without importing pandas if nothing has imported it yet
+    :param data:
+    :return: Boolean
+    """
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(data, pandas.DataFrame)
+
+
+def column_to_values(series):
+    """
+    Convert a column of a DataFrame to a list of values that can be bound as query parameters.
+    NaN, NaT, None and pd.NA become None, numpy scalars become python scalars and datetimes become strings like
+    '2021-01-31 18:30:00.123', which SQL Server converts to datetime and datetime2 columns.
+    :param series: pandas Series
+    :return: list
+    """
+    import numpy as np
+    import pandas as pd
+
+    mask = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        values = [value.replace('T', ' ') for value in
+                  np.datetime_as_string(series.to_numpy(dtype='datetime64[ms]'), unit='ms').tolist()]
+    elif series.dtype.kind in 'iub' and not pd.api.types.is_extension_array_dtype(series.dtype):
+        # plain numpy ints and bools can not hold missing values
+        return series.tolist()
+    elif series.dtype.kind == 'f' and not pd.api.types.is_extension_array_dtype(series.dtype):
+        values = series.tolist()
+    else:
+        values = series.astype(object).tolist()
+        for index, value in enumerate(values):
+            if isinstance(value, pd.Timestamp) and value is not pd.NaT:
+                values[index] = value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            elif hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+                # numpy scalar hidden in an object column
+                values[index] = value.item()
+
+    if mask.any():
+        values = [None if missing else value for value, missing in zip(values, mask)]
+    return values
+
+
+def dataframe_to_rows(data, columns = None):
+    """
+    Convert a DataFrame to a list of tuples that can be bound to a parameterized INSERT, column by column,
+    without serializing the frame to JSON first.
+    :param data: pandas DataFrame
+    :param columns: the columns to convert, in order, default all the columns of the frame
+    :return: list of tuples, one per row
+    """
+    columns = list(data.columns) if columns is None else list(columns)
+    if not len(data):
+        return []
+    return list(zip(*[column_to_values(data[col]) for col in columns]))
@@ -0,0 +1,125 @@
+import random
+import time
+from collections import deque
+
+from common.sql_utilities import ping_connection
+
+
+class HealthCheck:
+    """
+    Health check of a Connection. Liveness is checked with a 'SELECT 1' ping and the result is trusted for
+    liveness_window seconds, so frequent checks do not cost a round trip each. A dead connection is replaced with a new
+    one, retrying with exponential backoff. The time taken by every connect is recorded.
+    """
+    def __init__(self,
+                 connection,
+                 liveness_window = 30,
+                 max_retries     = 5,
+                 backoff_base    = 0.5,
+                 backoff_max     = 30,
+                 **options):
+        """
+        :param connection: azure_utilities.azure_sql.connection.Connection object
+        :param liveness_window: seconds for which a successful ping is trusted
+        :param max_retries: number of reconnect attempts before giving up
+        :param backoff_base: seconds to wait after the first failed attempt, doubled after every attempt
+        :param backoff_max: maximum seconds to wait between two attempts
+        """
+        assert isinstance(max_retries, int) and max_retries >= 1, "max_retries should be an integer >= 1"
+        self.connection        = connection
+        self.liveness_window   = liveness_window
+        self.max_retries       = max_retries
+        self.backoff_base      = backoff_base
+        self.backoff_max       = backoff_max
+        self.last_alive_at     = None
+        self.connect_latencies = deque(maxlen=options.get('latency_history') or 100)
+        self.stats             = {'pings': 0, 'failed_pings': 0, 'reconnects': 0, 'failed_connects': 0}
+
+    def mark_alive(self):
+        """
+        Mark the connection as alive as of now, eg. after a connect or a successful query
+        :return:
+        """
+        self.last_alive_at = time.monotonic()
+
+    def record_connect(self, seconds):
+        """
+        Record the time taken to connect
+        :param seconds:
+        :return:
+        """
+        self.connect_latencies.append(seconds)
+        self.mark_alive()
+
+    def is_alive(self, force = False):
+        """
+        Check if the connection is alive. Returns without a round trip if the connection was seen alive in the last
+        liveness_window seconds.
+        :param force: ping even if the connection was seen alive recently
+        :return: Boolean
+        """
+        if self.connection.conn is None:
+            return False
+        if not force and self.last_alive_at is not None \
+                and time.monotonic() - self.last_alive_at < self.liveness_window:
+            return True
+        self.stats['pings'] += 1
+        if ping_connection(self.connection.conn):
+            self.mark_alive()
+            return True
+        self.stats['failed_pings'] += 1
+        self.last_alive_at = None
+        return False
+
+    def backoff_seconds(self, attempt):
+        """
+        Seconds to wait after the given failed attempt, exponential with jitter
+        :param attempt: 0 for the first attempt
+        :return: float
+        """
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1)
+
+    def ensure_alive(self, **options):
+        """
+        Make sure the connection is alive, reconnect with exponential backoff if it is not
+        :param options: passed on to Connection.check_connection()
+        :return: tuple of (connection, cursor)
+        """
+        if self.is_alive():
+            return self.connection.conn, self.connection.cursor
+
+        if self.connection.conn is not None:
+            print("Connection is not alive, reconnecting...")
+            self.stats['reconnects'] += 1
+            try:
+                self.connection.close()
+            except Exception:
+                self.connection.conn = self.connection.cursor = None
+
+        for attempt in range(self.max_retries):
+            try:
+                self.connection.check_connection(**options)
+                return self.connection.conn, self.connection.cursor
+            except Exception as err:
+                self.stats['failed_connects'] += 1
+                if attempt == self.max_retries - 1:
+                    raise Exception(f"Unable to connect after {self.max_retries} attempts, info -> {err.args}")
+                wait = self.backoff_seconds(attempt)
+                print(f"Connect attempt {attempt + 1} failed, retrying in {wait:.1f} seconds...")
+                time.sleep(wait)
+
+    def connect_latency_stats(self):
+        """
+        Stats of the recorded connect latencies
+        :return: dict like {'count': 3, 'last': 0.8, 'min': 0.7, 'max': 1.2, 'avg': 0.9}
+        """
+        latencies = list(self.connect_latencies)
+        if not latencies:
+            return {'count': 0}
+        return {
+            'count': len(latencies),
+            'last' : latencies[-1],
+            'min'  : min(latencies),
+            'max'  : max(latencies),
+            'avg'  : sum(latencies) / len(latencies)
+        }
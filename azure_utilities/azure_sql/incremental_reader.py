@@ -0,0 +1,146 @@
+import datetime
+
+from .common_utils import execute_raw_query, iterate_raw_query
+from .query_builder import IDENTIFIER, SelectQuery, to_sql_param
+
+# types which do not convert from strings with more than 3 fractional digits, the watermark goes through datetime2
+LOW_PRECISION_TYPES = ['datetime', 'smalldatetime']
+
+
+def watermark_placeholder(schema, column):
+    """
+    Placeholder a watermark of the column is bound to, converted through datetime2 for the low precision types
+    :param schema: schema of the table, list of dicts like [{'col_name': 'create_dttm', 'datatype': 'datetime'}]
+    :param column: name of the column
+    :return: String
+    """
+    datatypes = {val['col_name'].lower(): val['datatype'] for val in schema or []}
+    datatype  = (datatypes.get(column.lower()) or '').split(' ')[0].lower()
+    return f"CAST(CAST(? AS datetime2) AS {datatype})" if datatype in LOW_PRECISION_TYPES else "?"
+
+
+def watermark_param(value):
+    """
+    Convert a watermark value to a parameter without losing precision, datetimes keep their microseconds
+    :param value:
+    :return:
+    """
+    if hasattr(value, 'to_pydatetime'):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return to_sql_param(value)
+
+
+class IncrementalReader:
+    """
+    Reads the rows added to a table since the previous read, in pages ordered on a (differential column, unique key)
+    keyset. Every page is a 'SELECT TOP (page_size) ... WHERE (diff > ? OR (diff = ? AND key > ?)) ORDER BY diff, key'
+    which an index on (diff, key) answers with a seek, so a poll costs the same on a big table as on a small one,
+    rows sharing a timestamp are neither skipped nor read twice, and a burst of inserts arrives in bounded pages.
+    """
+    def __init__(self,
+                 sql_get_data,
+                 key_column,
+                 differential_column = None,
+                 page_size           = 10000,
+                 **options):
+        """
+        :param sql_get_data: SQLGetData object, connected to the table
+        :param key_column: column unique within a value of the differential column, eg. the identity column
+        :param differential_column: ever increasing column, eg. create_dttm, default that of sql_get_data
+        :param page_size: maximum number of rows per page
+        :param options:
+                columns       : list of column names to read, default all the columns
+                start_value   : rows with a differential value greater than this are read, default all the rows
+                position      : (differential value, key) of the last row already read, to resume from
+                return_as     : None for pandas dfs, 'tuples' for lists of tuples
+                print_results : Turn off printing of queries
+        """
+        assert isinstance(page_size, int) and page_size > 0, "page_size should be a positive integer"
+        self.sql_get_data        = sql_get_data
+        self.table_name          = sql_get_data.table_name
+        self.differential_column = differential_column or sql_get_data.differential_column
+        self.key_column          = key_column
+        self.page_size           = page_size
+        self.columns             = options.get('columns')
+        self.start_value         = options.get('start_value')
+        self.position            = tuple(options['position']) if options.get('position') else None
+        self.return_as           = options.get('return_as')
+        self.print_results       = options.get('print_results', True)
+
+        schema = sql_get_data.schema or []
+        self.select_query = SelectQuery(self.table_name, [val['col_name'] for val in schema] or None)
+        self.select_query.column(self.differential_column)
+        self.select_query.column(self.key_column)
+        self.diff_param = watermark_placeholder(schema, self.differential_column)
+
+    def build_page_query(self):
+        """
+        Query of the next page after self.position
+        :return: tuple of (query, list of params)
+        """
+        diff, key = self.differential_column, self.key_column
+        columns   = self.columns
+        if columns:
+            # the keyset columns are needed to move the position forward
+            columns = list(columns) + [col for col in (diff, key) if col.lower() not in map(str.lower, columns)]
+        predicates = []
+        if self.position:
+            last_value, last_key = (watermark_param(val) for val in self.position)
+            predicates.append((f"({diff} > {self.diff_param} OR ({diff} = {self.diff_param} AND {key} > ?))",
+                               [last_value, last_value, last_key]))
+        elif self.start_value is not None:
+            predicates.append((f"{diff} > {self.diff_param}", [watermark_param(self.start_value)]))
+        return self.select_query.build(columns, order_by=[diff, key], limit=self.page_size, predicates=predicates)
+
+    def read_page(self):
+        """
+        Read the next page and move the position to its last row
+        :return: pandas df / list of tuples, empty when there are no new rows
+        """
+        self.sql_get_data.ensure_connection()
+        query, params = self.build_page_query()
+        cursor = self.sql_get_data.conn.cursor()
+        rows, columns = [], []
+        for rows in iterate_raw_query(cursor, query, self.page_size, self.print_results, params):
+            columns = [description[0] for description in cursor.description]
+        if rows:
+            names = [column.lower() for column in columns]
+            last  = rows[-1]
+            self.position = (last[names.index(self.differential_column.lower())],
+                             last[names.index(self.key_column.lower())])
+        if self.return_as:
+            return rows
+        import pandas as pd
+        return pd.DataFrame(rows, columns=columns)
+
+    def read_new_pages(self):
+        """
+        Read pages until the rows added since the previous read are exhausted
+        :return: generator of pandas dfs / lists of tuples
+        """
+        while True:
+            page = self.read_page()
+            if len(page):
+                yield page
+            if len(page) < self.page_size:
+                return
+
+    def create_index(self, index_name = None):
+        """
+        Create the index on (differential column, key column) which the page queries seek on, if it does not exist
+        :param index_name: default ix_<table>_<diff>_<key>
+        :return:
+        """
+        diff, key  = self.differential_column, self.key_column
+        index_name = index_name or f"ix_{self.table_name}_{diff}_{key}"
+        assert IDENTIFIER.match(index_name), f"'{index_name}' is not a valid index name"
+        self.sql_get_data.ensure_connection()
+        execute_raw_query(
+            self.sql_get_data.cursor,
+            f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{index_name}' "
+            f"AND object_id = OBJECT_ID('{self.table_name}')) "
+            f"CREATE INDEX {index_name} ON {self.table_name} ({diff}, {key})",
+            print_results=self.print_results
+        )
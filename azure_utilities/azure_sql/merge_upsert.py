@@ -0,0 +1,97 @@
+import re
+import time
+import uuid
+
+
+def deduplicate_on_keys(columns, rows, key_columns):
+    """
+    Keep only the last row for every key, MERGE fails if two source rows match the same target row
+    :param columns: list of column names
+    :param rows: list of tuples
+    :param key_columns: list of the key column names
+    :return: list of tuples
+    """
+    key_positions = [columns.index(key) for key in key_columns]
+    latest = {}
+    for row in rows:
+        latest[tuple(row[position] for position in key_positions)] = row
+    return list(latest.values())
+
+
+def staging_table_name(table_name):
+    """
+    Name of a new global temp table to stage the rows of the table in, without its schema and brackets
+    eg. '[dbo].[customer]' -> '##customer_stage_1a2b3c4d'
+    :param table_name: name of the target table
+    :return: String
+    """
+    base_name = re.sub(r"\W", "_", table_name.split('.')[-1].strip('[]"'))
+    return f"##{base_name}_stage_{uuid.uuid4().hex[:8]}"
+
+
+def build_merge_query(table_name, staging_table, columns, key_columns):
+    """
+    Returns the MERGE statement applying the rows of the staging table to the table
+    :param table_name: name of the target table
+    :param staging_table: name of the staging table
+    :param columns: list of column names present in the staging table
+    :param key_columns: columns identifying a row
+    :return: String
+    """
+    on_clause     = " AND ".join([f"target.{key} = source.{key}" for key in key_columns])
+    update_cols   = [col for col in columns if col not in key_columns]
+    insert_cols   = ", ".join(columns)
+    insert_values = ", ".join([f"source.{col}" for col in columns])
+    query = f"MERGE INTO {table_name} WITH (HOLDLOCK) AS target USING {staging_table} AS source ON {on_clause} "
+    if update_cols:
+        query += "WHEN MATCHED THEN UPDATE SET " + \
+                 ", ".join([f"target.{col} = source.{col}" for col in update_cols]) + " "
+    query += f"WHEN NOT MATCHED BY TARGET THEN INSERT ({insert_cols}) VALUES ({insert_values});"
+    return query
+
+
+def merge_upsert(cursor, batch_insert, table_name, columns, rows, key_columns, **options):
+    """
+    Upsert rows into the table in O(1) round trips per batch: the rows are loaded in a staging table through the
+    batch insert path, and applied to the table with a single MERGE on the key columns.
+    :param cursor: cursor object of the connection
+    :param batch_insert: azure_utilities.azure_sql.batch_insert.BatchInsert object
+    :param table_name: name of the target table
+    :param columns: list of column names
+    :param rows: list of tuples
+    :param key_columns: columns identifying a row, rows with a matching key are updated, others inserted
+    :param options:
+            staging_table : name of the staging table, default a global temp table '##<table>_stage_<random>',
+                            which is created before and dropped after the MERGE
+            chunk_size    : rows per executemany() call while loading the staging table
+            print_results : print the queries, default True
+    :return: dict like {'rows': 1000, 'merged': 1000, 'seconds': 0.8}
+    """
+    missing = [key for key in key_columns if key not in columns]
+    assert key_columns and not missing, f"Key columns {missing or key_columns} should be present in the data"
+
+    started_at    = time.perf_counter()
+    staging_table = options.get('staging_table') or staging_table_name(table_name)
+    rows          = deduplicate_on_keys(columns, rows, key_columns)
+    print_results = options.get('print_results', True)
+
+    # The UNION ALL makes SELECT INTO create the staging table without the IDENTITY property of the table
+    create_query = f"SELECT TOP 0 {', '.join(columns)} INTO {staging_table} FROM {table_name} " \
+                   f"UNION ALL SELECT TOP 0 {', '.join(columns)} FROM {table_name}"
+    merge_query  = build_merge_query(table_name, staging_table, columns, key_columns)
+    if print_results:
+        print(f"Executing query : {create_query}")
+    cursor.execute(create_query)
+    try:
+        batch_insert.insert(cursor, staging_table, columns, rows, chunk_size = options.get('chunk_size'))
+        if print_results:
+            print(f"Executing query : {merge_query}")
+        cursor.execute(merge_query)
+        merged = cursor.rowcount
+    finally:
+        cursor.execute(f"DROP TABLE {staging_table}")
+    return {
+        'rows'   : len(rows),
+        'merged' : merged,
+        'seconds': time.perf_counter() - started_at
+    }
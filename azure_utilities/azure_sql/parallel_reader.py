@@ -0,0 +1,211 @@
+import datetime
+import decimal
+import os
+import time
+
+from .common_utils import execute_raw_query
+from .incremental_reader import watermark_param, watermark_placeholder
+from .query_builder import SelectQuery
+
+
+def to_boundary_value(value):
+    """
+    Value of a range boundary as returned by the driver, datetimes returned as strings (eg. by jaydebeapi) are parsed
+    :param value:
+    :return: int, float, Decimal or datetime
+    """
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value.strip())
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def split_range(low, high, partitions):
+    """
+    Split [low, high] in partitions ranges of equal width
+    :param low: minimum of the column, number or datetime
+    :param high: maximum of the column
+    :param partitions: number of ranges
+    :return: sorted list of the partitions - 1 inner boundaries, without duplicates
+    """
+    low, high = to_boundary_value(low), to_boundary_value(high)
+    if isinstance(low, datetime.datetime):
+        step = (high - low) / partitions
+    elif isinstance(low, int) and isinstance(high, int):
+        step = decimal.Decimal(high - low) / partitions
+    else:
+        step = (high - low) / partitions
+    boundaries = []
+    for index in range(1, partitions):
+        boundary = low + step * index
+        if isinstance(low, int) and isinstance(high, int):
+            boundary = int(boundary)
+        if low < boundary <= high and boundary not in boundaries:
+            boundaries.append(boundary)
+    return boundaries
+
+
+class ParallelSQLReader:
+    """
+    Read a table in ranges of a numeric or datetime column, each range fetched on its own pooled connection, and
+    merge them in one DataFrame or write every range to its own file. The boundaries of the ranges are either spread
+    evenly between the MIN() and MAX() of the column, or taken from its percentiles, which gives ranges of about the
+    same number of rows when the values are skewed. Rows with a NULL in the column are read with the first range.
+    """
+    def __init__(self,
+                 sql_get_data,
+                 partition_column,
+                 partitions = 4,
+                 workers    = None,
+                 **options):
+        """
+        :param sql_get_data: SQLGetData object, with a schema and a table name
+        :param partition_column: numeric or datetime column to split the table on, ideally indexed
+        :param partitions: number of ranges
+        :param workers: number of ranges read at the same time, each one on its own connection, default partitions
+        :param options:
+                boundaries     : 'minmax' (default) or 'percentile'
+                sample_percent : percent of the table sampled with TABLESAMPLE for the percentile probe, default all
+                print_results  : Turn off printing of queries
+        """
+        assert isinstance(partitions, int) and partitions > 0, "partitions should be a positive integer"
+        self.sql_get_data     = sql_get_data
+        self.table_name       = sql_get_data.table_name
+        self.partition_column = partition_column
+        self.partitions       = partitions
+        self.workers          = workers or partitions
+        self.boundary_method  = options.get('boundaries') or 'minmax'
+        self.sample_percent   = options.get('sample_percent')
+        self.print_results    = options.get('print_results', True)
+        assert self.boundary_method in ('minmax', 'percentile'), "boundaries should be 'minmax' or 'percentile'"
+
+        schema = sql_get_data.schema or []
+        self.select_query = SelectQuery(self.table_name, [val['col_name'] for val in schema] or None)
+        self.select_query.column(partition_column)
+        self.placeholder  = watermark_placeholder(schema, partition_column)
+        self.pool         = sql_get_data.connection.get_pool()
+        if self.pool.max_size < self.workers:
+            print(f"Connection pool allows {self.pool.max_size} connections, {self.workers} workers will wait for "
+                  f"connections, initialize with pool_max_size >= {self.workers}")
+
+    def probe_boundaries(self, filters = None):
+        """
+        Find the inner boundaries of the ranges with a single query
+        :param filters: filters of the read, see SelectQuery.build()
+        :return: sorted list of boundaries, empty if the column has no values
+        """
+        column = self.partition_column
+        where, params = self.select_query.where(filters)
+        if self.boundary_method == 'minmax':
+            query = f"SELECT MIN({column}), MAX({column}) FROM {self.table_name}{where}"
+        else:
+            sample = f" TABLESAMPLE ({float(self.sample_percent)} PERCENT)" if self.sample_percent else ""
+            percentiles = ", ".join(f"PERCENTILE_DISC({index / self.partitions}) WITHIN GROUP (ORDER BY {column}) "
+                                    f"OVER ()" for index in range(1, self.partitions))
+            query = f"SELECT TOP 1 {percentiles or 'NULL'} FROM {self.table_name}{sample}{where}"
+        self.sql_get_data.ensure_connection()
+        result = execute_raw_query(self.sql_get_data.cursor, query, self.print_results, True, params)
+        if not result or result[0][0] is None:
+            return []
+        if self.boundary_method == 'minmax':
+            return split_range(result[0][0], result[0][1], self.partitions)
+        boundaries = []
+        for value in result[0]:
+            value = to_boundary_value(value)
+            if value is not None and value not in boundaries:
+                boundaries.append(value)
+        return sorted(boundaries)
+
+    def range_predicates(self, boundaries):
+        """
+        Predicates of the ranges, which together cover every row exactly once
+        :param boundaries: sorted inner boundaries
+        :return: list of tuples of (sql, list of params)
+        """
+        column, placeholder = self.partition_column, self.placeholder
+        # Decimals are not bound by every driver, a float boundary still splits the rows in disjoint ranges
+        params = [float(boundary) if isinstance(boundary, decimal.Decimal) else watermark_param(boundary)
+                  for boundary in boundaries]
+        if not params:
+            return [("1 = 1", [])]
+        predicates = [(f"({column} IS NULL OR {column} < {placeholder})", [params[0]])]
+        for low, high in zip(params, params[1:]):
+            predicates.append((f"{column} >= {placeholder} AND {column} < {placeholder}", [low, high]))
+        predicates.append((f"{column} >= {placeholder}", [params[-1]]))
+        return predicates
+
+    def read_partition(self, index, predicate, columns = None, filters = None, output_path = None):
+        """
+        Read one range on a pooled connection
+        :param index: index of the range
+        :param predicate: tuple of (sql, list of params) of the range
+        :param columns: list of column names to read, default all the columns
+        :param filters: filters of the read
+        :param output_path: write the range to this file, .parquet or .csv, instead of returning it
+        :return: dict like {'partition': 0, 'rows': 1000, 'seconds': 0.4, 'data': df, 'path': None}
+        """
+        import pandas as pd
+        started_at    = time.perf_counter()
+        query, params = self.select_query.build(columns, filters, predicates=[predicate])
+        with self.pool.checkout() as (conn, cursor):
+            rows  = execute_raw_query(cursor, query, self.print_results, True, params)
+            names = [description[0] for description in cursor.description]
+        data = pd.DataFrame(rows, columns=names)
+        if output_path:
+            if output_path.endswith('.parquet'):
+                data.to_parquet(output_path, index=False)
+            else:
+                data.to_csv(output_path, index=False)
+        return {
+            'partition': index,
+            'rows'     : len(data),
+            'seconds'  : time.perf_counter() - started_at,
+            'data'     : None if output_path else data,
+            'path'     : output_path
+        }
+
+    def _run(self, columns, filters, output_paths = None):
+        from multiprocessing.pool import ThreadPool
+        started_at = time.perf_counter()
+        predicates = self.range_predicates(self.probe_boundaries(filters))
+        with ThreadPool(processes=min(self.workers, len(predicates))) as pool:
+            tasks = [pool.apply_async(self.read_partition,
+                                      (index, predicate, columns, filters,
+                                       output_paths[index] if output_paths else None))
+                     for index, predicate in enumerate(predicates)]
+            results = [task.get() for task in tasks]
+        seconds = time.perf_counter() - started_at
+        rows    = sum(result['rows'] for result in results)
+        print(f"Read {rows} rows in {len(results)} partitions in {seconds:.2f} seconds "
+              f"({rows / seconds if seconds else 0.0:.1f} rows/sec)")
+        return results
+
+    def read(self, columns = None, filters = None):
+        """
+        Read the ranges concurrently and merge them
+        :param columns: list of column names to read, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+        :return: pandas df, the rows of the ranges in the order of the ranges
+        """
+        import pandas as pd
+        results = self._run(columns, filters)
+        return pd.concat([result['data'] for result in results], ignore_index=True)
+
+    def export(self, output_dir, file_format = 'parquet', columns = None, filters = None):
+        """
+        Read the ranges concurrently and write every range to its own file, without merging them in memory
+        :param output_dir: directory of the files, named <table>_part_<index>.<file_format>
+        :param file_format: 'parquet' (needs pyarrow) or 'csv'
+        :param columns: list of column names to read, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+        :return: list of dicts like {'partition': 0, 'rows': 1000, 'seconds': 0.4, 'path': '...'}
+        """
+        assert file_format in ('parquet', 'csv'), "file_format should be 'parquet' or 'csv'"
+        os.makedirs(output_dir, exist_ok=True)
+        output_paths = [os.path.join(output_dir, f"{self.table_name}_part_{index}.{file_format}")
+                        for index in range(self.partitions)]
+        results = self._run(columns, filters, output_paths)
+        for result in results:
+            result.pop('data')
+        return results
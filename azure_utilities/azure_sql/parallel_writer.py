@@ -0,0 +1,131 @@
+import threading
+import time
+
+from .transaction import TransactionSession
+
+
+def split_dataframe(data, partitions):
+    """
+    Split a DataFrame in consecutive partitions of (almost) equal size
+    :param data: pandas DataFrame
+    :param partitions: number of partitions
+    :return: generator of DataFrames
+    """
+    size = -(-len(data) // partitions) if len(data) else 0
+    for start in range(0, len(data), size or 1):
+        yield data.iloc[start: start + size]
+
+
+class ParallelSQLWriter:
+    """
+    Write partitions of data concurrently over pooled connections, one partition per task of a thread pool.
+    Every partition is inserted in its own transaction, so a failed attempt is rolled back and the partition can be
+    retried without writing its rows twice. Results are returned in the order of the partitions.
+    """
+    def __init__(self,
+                 sql_send_data,
+                 workers       = 4,
+                 max_retries   = 3,
+                 retry_backoff = 1,
+                 **options):
+        """
+        :param sql_send_data: SQLSendData object, with a schema and a table name
+        :param workers: number of partitions written at the same time, each one on its own connection
+        :param max_retries: number of times a failed partition is retried
+        :param retry_backoff: seconds to wait before the first retry, doubled for every next one
+        :param options:
+                chunk_size       : rows per executemany() call, default the chunk size of sql_send_data
+                max_in_flight    : partitions read ahead of the writers, default 2 * workers
+                raise_on_failure : raise when a partition fails after all retries, default True
+        """
+        self.sql_send_data    = sql_send_data
+        self.workers          = workers
+        self.max_retries      = max_retries
+        self.retry_backoff    = retry_backoff
+        self.chunk_size       = options.get('chunk_size')
+        self.max_in_flight    = options.get('max_in_flight') or 2 * workers
+        self.raise_on_failure = options.get('raise_on_failure', True)
+        self.pool             = sql_send_data.connection.get_pool()
+        if self.pool.max_size < workers:
+            print(f"Connection pool allows {self.pool.max_size} connections, {workers} workers will wait for "
+                  f"connections, initialize with pool_max_size >= {workers}")
+
+    def write_partition(self, index, data):
+        """
+        Write one partition in a transaction, retrying with exponential backoff
+        :param index: index of the partition
+        :param data: list of dicts, list of tuples or DataFrame
+        :return: dict like {'partition': 0, 'rows': 1000, 'seconds': 0.4, 'attempts': 1, 'error': None}
+        """
+        columns, rows = self.sql_send_data.prepare_batch_data(data)
+        started_at = time.perf_counter()
+        error      = None
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                with self.pool.checkout() as (conn, cursor):
+                    with TransactionSession(conn, cursor) as session:
+                        session.insert(self.sql_send_data.batch_insert, self.sql_send_data.table_name,
+                                       columns, rows, chunk_size = self.chunk_size)
+                error = None
+                break
+            except Exception as err:
+                error = err
+                if attempt <= self.max_retries:
+                    wait = self.retry_backoff * 2 ** (attempt - 1)
+                    print(f"Partition {index} failed on attempt {attempt}, retrying in {wait} seconds, "
+                          f"info -> {err.args}")
+                    time.sleep(wait)
+        return {
+            'partition': index,
+            'rows'     : len(rows) if error is None else 0,
+            'seconds'  : time.perf_counter() - started_at,
+            'attempts' : attempt,
+            'error'    : error
+        }
+
+    def write(self, partitions):
+        """
+        Write the partitions concurrently
+        :param partitions: iterable of partitions, every partition being a list of dicts, a list of tuples or a
+                           DataFrame. It is consumed lazily, at most max_in_flight partitions are held in memory.
+        :return: dict like {'rows': 1000000, 'seconds': 60.1, 'rows_per_sec': 16638.9, 'partitions': [...],
+                            'failed_partitions': []}
+        """
+        from multiprocessing.pool import ThreadPool
+        started_at = time.perf_counter()
+        results    = {}
+        in_flight  = threading.BoundedSemaphore(self.max_in_flight)
+
+        def _done(result):
+            results[result['partition']] = result
+            in_flight.release()
+
+        with ThreadPool(processes=self.workers) as pool:
+            tasks = []
+            for index, partition in enumerate(partitions):
+                in_flight.acquire()
+                tasks.append(pool.apply_async(self.write_partition, (index, partition), callback=_done,
+                                              error_callback=lambda err: in_flight.release()))
+            for task in tasks:
+                task.wait()
+            for task in tasks:
+                # raises here if write_partition itself failed, eg. on bad data
+                task.get()
+
+        seconds    = time.perf_counter() - started_at
+        partitions = [results[index] for index in sorted(results)]
+        rows       = sum(result['rows'] for result in partitions)
+        failed     = [result['partition'] for result in partitions if result['error'] is not None]
+        summary    = {
+            'rows'             : rows,
+            'seconds'          : seconds,
+            'rows_per_sec'     : rows / seconds if seconds else 0.0,
+            'partitions'       : partitions,
+            'failed_partitions': failed,
+        }
+        print(f"Wrote {rows} rows in {len(partitions)} partitions in {seconds:.2f} seconds "
+              f"({summary['rows_per_sec']:.1f} rows/sec)")
+        if failed and self.raise_on_failure:
+            raise Exception(f"Partitions {failed} failed after {self.max_retries} retries, info -> "
+                            f"{[partitions[index]['error'] for index in failed]}")
+        return summary
@@ -0,0 +1,139 @@
+import datetime
+import re
+
+OPERATORS = ['=', '!=', '<>', '<', '<=', '>', '>=', 'like', 'not like', 'in', 'not in', 'between', 'is null',
+             'is not null']
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_@$#]*$")
+
+
+def to_sql_param(value):
+    """
+    Convert a value to one every driver can bind, datetimes are sent as 'YYYY-MM-DD HH:MM:SS.fff' strings and numpy
+    scalars as python scalars
+    :param value:
+    :return:
+    """
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        return value.item()
+    return value
+
+
+class SelectQuery:
+    """
+    Compiles selected columns, filters, ordering and a limit to one parameterized SELECT statement, so only the
+    columns and rows needed leave the server. Column names are checked against the columns of the table, values are
+    always bound as '?' parameters.
+    """
+    def __init__(self, table_name, valid_columns = None):
+        """
+        :param table_name: name of the table
+        :param valid_columns: list of the column names of the table, used to validate the input, eg. the 'col_name'
+                              of every column in the schema. Every valid identifier is accepted when not given
+        """
+        self.table_name    = table_name
+        self.valid_columns = {column.lower() for column in valid_columns} if valid_columns else None
+
+    def column(self, name):
+        """
+        Validate a column name
+        :param name: name of the column
+        :return: String
+        """
+        assert isinstance(name, str) and IDENTIFIER.match(name), f"'{name}' is not a valid column name"
+        if self.valid_columns is not None:
+            assert name.lower() in self.valid_columns, \
+                f"Column '{name}' is not present in the table {self.table_name}, columns -> {sorted(self.valid_columns)}"
+        return name
+
+    def predicate(self, column, operator, value = None):
+        """
+        Compile one filter
+        :param column: name of the column
+        :param operator: one of OPERATORS
+        :param value: value compared to, list of values for 'in' / 'not in', tuple of (low, high) for 'between'
+        :return: tuple of (sql, list of params)
+        """
+        column   = self.column(column)
+        operator = operator.lower().strip()
+        assert operator in OPERATORS, f"Operator should be one of {OPERATORS}, got '{operator}'"
+        if operator in ('is null', 'is not null'):
+            return f"{column} {operator.upper()}", []
+        if operator in ('in', 'not in'):
+            values = list(value)
+            assert values, f"Provide at least one value for '{operator}' on {column}"
+            return f"{column} {operator.upper()} ({', '.join(['?'] * len(values))})", \
+                   [to_sql_param(val) for val in values]
+        if operator == 'between':
+            low, high = value
+            return f"{column} BETWEEN ? AND ?", [to_sql_param(low), to_sql_param(high)]
+        return f"{column} {operator.upper()} ?", [to_sql_param(value)]
+
+    def where(self, filters = None, predicates = None):
+        """
+        Compile the filters to a WHERE clause
+        :param filters: dict of {column: value} compared with '=', or list of tuples (column, operator, value) and
+                        (column, 'is null'), all the filters are combined with AND
+        :param predicates: list of tuples of (sql, list of params) added as they are, for conditions built in the
+                           package, eg. the keyset of the incremental reader. Never pass user input here.
+        :return: tuple of (' WHERE ...' or '', list of params)
+        """
+        if isinstance(filters, dict):
+            filters = [(column, '=', value) for column, value in filters.items()]
+        sqls, params = [], []
+        for sql_filter in filters or []:
+            sql, values = self.predicate(*sql_filter)
+            sqls.append(sql)
+            params.extend(values)
+        for sql, values in predicates or []:
+            sqls.append(sql)
+            params.extend(values)
+        return (" WHERE " + " AND ".join(sqls) if sqls else ""), params
+
+    def build_stats(self, filters = None, max_column = None):
+        """
+        Query of the number of rows matching the filters, and of the maximum of max_column among them
+        :param filters: same as build()
+        :param max_column: name of the column, eg. the differential column
+        :return: tuple of (query, list of params), the query returns one row of (count, max)
+        """
+        where, params = self.where(filters)
+        maximum = f"MAX({self.column(max_column)})" if max_column else "NULL"
+        return f"SELECT COUNT_BIG(*), {maximum} FROM {self.table_name}{where}", params
+
+    def build(self, columns = None, filters = None, order_by = None, limit = None, predicates = None):
+        """
+        :param columns: list of column names to select, default all the columns
+        :param filters: dict of {column: value} compared with '=', or list of tuples (column, operator, value) and
+                        (column, 'is null'), all the filters are combined with AND
+                        eg. [('amount', '>', 100), ('country', 'in', ['IN', 'US']), ('deleted_at', 'is null')]
+        :param order_by: list of column names, or tuples of (column, 'asc' | 'desc')
+        :param limit: maximum number of rows
+        :param predicates: raw conditions built in the package, see where()
+        :return: tuple of (query, list of params)
+        """
+        params = []
+        query  = "SELECT "
+        if limit is not None:
+            assert isinstance(limit, int) and limit >= 0, "limit should be a non negative integer"
+            query += "TOP (?) "
+            params.append(limit)
+        query += ", ".join(self.column(column) for column in columns) if columns else "*"
+        query += f" FROM {self.table_name}"
+
+        where, values = self.where(filters, predicates)
+        query  += where
+        params += values
+
+        if order_by:
+            ordering = []
+            for column in order_by:
+                column, direction = (column, 'asc') if isinstance(column, str) else column
+                assert direction.lower() in ('asc', 'desc'), f"Order of {column} should be 'asc' or 'desc'"
+                ordering.append(f"{self.column(column)} {direction.upper()}")
+            query += " ORDER BY " + ", ".join(ordering)
+        return query, params
@@ -0,0 +1,182 @@
+import collections
+import json
+import re
+import sys
+import threading
+import time
+import weakref
+
+# process wide caches, keyed by (server name, database name), and every cache in use for each database
+_CACHES      = {}
+_REGISTERED  = collections.defaultdict(weakref.WeakSet)
+_CACHES_LOCK = threading.Lock()
+
+STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+TABLE_NAME     = re.compile(r"\b(?:from|join|into|update)\s+([\w.\[\]#@$]+)", re.IGNORECASE)
+
+
+def normalize_query(query):
+    """
+    Normalize the text of a query, so queries differing only in white space or in the case of keywords and names
+    share a cache entry. String literals are kept as they are.
+    eg. "SELECT *\n  FROM Customer where name = 'Bob'" -> "select * from customer where name = 'Bob'"
+    :param query: String
+    :return: String
+    """
+    parts = STRING_LITERAL.split(query.strip().rstrip(';'))
+    # the odd parts are the literals
+    return "".join(part if index % 2 else " ".join(part.split()).lower() for index, part in enumerate(parts))
+
+
+def tables_of(query):
+    """
+    Names of the tables a query reads, without schema and brackets, eg. 'from dbo.[Customer]' -> {'customer'}
+    :param query: String
+    :return: set of lower case table names
+    """
+    return {name.split('.')[-1].strip('[]').lower() for name in TABLE_NAME.findall(STRING_LITERAL.sub("''", query))}
+
+
+def is_cacheable(query):
+    """
+    Only reads are cached
+    :param query: String
+    :return: bool
+    """
+    return normalize_query(query).startswith(('select', 'with'))
+
+
+def estimate_bytes(result):
+    """
+    Rough size of a result, list of tuples
+    :param result:
+    :return: int
+    """
+    size = sys.getsizeof(result)
+    for row in result:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """
+    Memoizing cache of query results in front of execute_raw_query(), for lookup queries run again and again. Entries
+    are keyed by the normalized text of the query and its parameters, expire after ttl seconds, and the least
+    recently used are evicted over max_entries entries or max_bytes bytes. Entries reading a table are dropped when
+    this process writes to it through SQLSendData.
+    """
+    def __init__(self, ttl = 60, max_entries = 1000, max_bytes = 64 * 1024 ** 2):
+        """
+        :param ttl: seconds an entry is used for
+        :param max_entries: maximum number of entries
+        :param max_bytes: maximum estimated size of the entries together
+        """
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.stats       = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._entries    = collections.OrderedDict()
+        self._bytes      = 0
+        self._lock       = threading.Lock()
+
+    @staticmethod
+    def key(query, params = None):
+        return normalize_query(query), json.dumps(list(params or []), default=str)
+
+    def get(self, query, params = None):
+        """
+        :param query: String
+        :param params: list of values bound to the query
+        :return: tuple of (True, cached result) on a hit, (False, None) on a miss
+        """
+        key = self.key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry['cached_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return True, list(entry['result'])
+            if entry:
+                self._remove(key)
+            self.stats['misses'] += 1
+            return False, None
+
+    def set(self, query, params, result):
+        """
+        Cache the result of the query, results bigger than max_bytes are not cached
+        :param query: String
+        :param params: list of values bound to the query
+        :param result: list of tuples
+        :return:
+        """
+        key  = self.key(query, params)
+        size = estimate_bytes(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'result'   : list(result),
+                'tables'   : tables_of(query),
+                'bytes'    : size,
+                'cached_at': time.monotonic()
+            }
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)['bytes']
+
+    def invalidate(self, table_name = None):
+        """
+        Drop the entries reading the table, or all the entries
+        :param table_name: name of the table, with or without schema
+        :return: number of entries dropped
+        """
+        table_name = table_name.split('.')[-1].strip('[]').lower() if table_name else None
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if table_name is None or table_name in entry['tables']]
+            for key in keys:
+                self._remove(key)
+            self.stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_query_cache(server_name, database_name, **options):
+    """
+    Returns the process wide query cache of the database, creating it on the first call. The options (ttl,
+    max_entries, max_bytes) are used only when the cache is created.
+    :return: QueryCache
+    """
+    key = (server_name.lower(), database_name.lower())
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = QueryCache(**options)
+            _REGISTERED[key].add(_CACHES[key])
+        return _CACHES[key]
+
+
+def register_query_cache(server_name, database_name, query_cache):
+    """
+    Register a query cache created by the user as caching results of the database, so writes invalidate it too
+    :return:
+    """
+    with _CACHES_LOCK:
+        _REGISTERED[(server_name.lower(), database_name.lower())].add(query_cache)
+
+
+def invalidate_query_caches(server_name, database_name, table_name = None):
+    """
+    Drop the cached results reading the table from the query caches of the database
+    :return:
+    """
+    with _CACHES_LOCK:
+        caches = list(_REGISTERED.get((server_name.lower(), database_name.lower()), []))
+    for cache in caches:
+        cache.invalidate(table_name)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def json_value(value):
+    """
+    Value as it reads back from the JSON index, eg. Decimal('12.50') -> '12.50', so a value compared to a persisted
+    one is normalized the same way
+    :param value:
+    :return:
+    """
+    return json.loads(json.dumps(value, default=str))
+
+
+class ResultCache:
+    """
+    Read-through cache of query results, kept as Parquet files on the local disk and keyed by server, database, table
+    and query. An entry is checked with a cheap 'SELECT COUNT_BIG(*), MAX(<differential column>)' on the rows of the
+    query, and when only new rows were added, just the rows past the cached maximum are fetched and appended. Files
+    are evicted least recently used first when the cache grows over max_bytes. The index keeps when every result was
+    last used, written at most every save_interval seconds by reads.
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes = 1024 ** 3, save_interval = 60):
+        """
+        :param cache_dir: directory of the Parquet files and of their index
+        :param max_bytes: maximum size of the Parquet files together
+        :param save_interval: seconds between two writes of the index made only to keep the last use of the results
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("pyarrow not present, install it first using pip install pyarrow")
+        self.cache_dir       = cache_dir
+        self.max_bytes       = max_bytes
+        self.save_interval   = save_interval
+        self.stats           = {'hits': 0, 'incremental': 0, 'misses': 0, 'evictions': 0}
+        self._lock           = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._entries        = self._load_index()
+        self._index_saved_at = time.time()
+
+    @staticmethod
+    def key(server_name, database_name, table_name, query, params = None):
+        text = json.dumps([server_name, database_name, table_name, query, params], default=str).lower()
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), "r") as index_file:
+                entries = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        # drop the entries whose file is gone
+        return {key: entry for key, entry in entries.items() if os.path.exists(self._path(key))}
+
+    def _save_index(self):
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w") as index_file:
+                json.dump(self._entries, index_file, default=str)
+            os.replace(temp_path, os.path.join(self.cache_dir, self.INDEX_FILE))
+            self._index_saved_at = time.time()
+        except Exception as err:
+            print(f"Unable to save the result cache index to {self.cache_dir}, info -> {err.args}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get(self, key):
+        """
+        :param key: key of the result
+        :return: tuple of (pandas df, entry dict with 'count', 'max_value', 'rows'), or (None, None) if not cached
+        """
+        import pandas as pd
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            try:
+                data = pd.read_parquet(self._path(key))
+            except (OSError, ValueError) as err:
+                print(f"Unable to read the cached result {key}, info -> {err.args}")
+                self._remove(key)
+                self._save_index()
+                return None, None
+            entry['last_used'] = time.time()
+            if entry['last_used'] - self._index_saved_at >= self.save_interval:
+                # the last uses decide what is evicted, they are written lazily
+                self._save_index()
+            return data, dict(entry)
+
+    def flush(self):
+        """
+        Write the index, with the last use of every result
+        :return:
+        """
+        with self._lock:
+            self._save_index()
+
+    def put(self, key, data, count, max_value, **meta):
+        """
+        Cache the result, written through a temp file so a reader never sees a partial file
+        :param key: key of the result
+        :param data: pandas df
+        :param count: COUNT_BIG(*) of the rows of the query when the result was read
+        :param max_value: maximum of the differential column when the result was read, kept as json_value(max_value)
+        :param meta: kept in the index, eg. table_name, query
+        :return:
+        """
+        with self._lock:
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".parquet.tmp")
+            os.close(file_descriptor)
+            try:
+                data.to_parquet(temp_path, index=False)
+                os.replace(temp_path, self._path(key))
+            except Exception as err:
+                print(f"Unable to cache the result {key}, info -> {err.args}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+            self._entries[key] = dict(
+                meta,
+                count     = count,
+                max_value = json_value(max_value),
+                rows      = len(data),
+                bytes     = os.path.getsize(self._path(key)),
+                last_used = time.time()
+            )
+            self._evict(keep = key)
+            self._save_index()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def _evict(self, keep = None):
+        """
+        Remove the least recently used results until the cache fits in max_bytes, the result just cached is kept
+        :param keep: key of the result to keep
+        :return:
+        """
+        total = sum(entry['bytes'] for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries[key]['bytes']
+            self._remove(key)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, table_name = None):
+        """
+        Remove the cached results of the table, or all the results
+        :param table_name: name of the table
+        :return:
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.items()
+                        if table_name is None or str(entry.get('table_name', '')).lower() == table_name.lower()]:
+                self._remove(key)
+            self._save_index()
+
+    def size(self):
+        """
+        :return: bytes of the cached results
+        """
+        with self._lock:
+            return sum(entry['bytes'] for entry in self._entries.values())
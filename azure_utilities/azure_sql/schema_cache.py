@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# process wide caches, keyed by their persist_path
+_CACHES      = {}
+_CACHES_LOCK = threading.Lock()
+
+
+class SchemaCache:
+    """
+    Cache of table schemas, keyed by server, database and table name. Entries expire after ttl seconds and can be
+    invalidated explicitly, eg. after a table is created or altered. If persist_path is given, the cache is also kept
+    in that JSON file, so a new process can read the schemas without querying INFORMATION_SCHEMA.
+    """
+    def __init__(self, ttl = 300, persist_path = None):
+        """
+        :param ttl: seconds after which a cached schema is read again from the database
+        :param persist_path: path of a JSON file to keep the cache in, default memory only
+        """
+        self.ttl          = ttl
+        self.persist_path = persist_path
+        self.stats        = {'hits': 0, 'misses': 0}
+        self._entries     = {}
+        self._lock        = threading.Lock()
+        if self.persist_path:
+            self._load()
+
+    @staticmethod
+    def key(server_name, database_name, table_name):
+        return f"{server_name}|{database_name}|{table_name}".lower()
+
+    def _load(self):
+        """
+        Read the persisted entries, a missing or unreadable file means an empty cache
+        :return:
+        """
+        try:
+            with open(self.persist_path, "r") as cache_file:
+                self._entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _save(self):
+        """
+        Write the entries to persist_path, through a temp file so readers never see a partial file
+        :return:
+        """
+        if not self.persist_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w") as cache_file:
+                json.dump(self._entries, cache_file)
+            os.replace(temp_path, self.persist_path)
+        except Exception as err:
+            print(f"Unable to persist the schema cache to {self.persist_path}, info -> {err.args}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get(self, server_name, database_name, table_name, ttl = None):
+        """
+        Get the cached schema of the table
+        :param ttl: seconds after which the schema has expired for this caller, default self.ttl
+        :return: schema as a list of dicts, or None if it is not cached or has expired
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(self.key(server_name, database_name, table_name))
+            if entry and time.time() - entry['cached_at'] < ttl:
+                self.stats['hits'] += 1
+                return [dict(col) for col in entry['schema']]
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, server_name, database_name, table_name, schema):
+        """
+        Cache the schema of the table
+        :param schema: list of dicts like [{'col_name': 'cust_id', 'datatype': 'int'}]
+        :return:
+        """
+        with self._lock:
+            self._entries[self.key(server_name, database_name, table_name)] = {
+                'schema'   : [dict(col) for col in schema],
+                'cached_at': time.time()
+            }
+            self._save()
+
+    def invalidate(self, server_name = None, database_name = None, table_name = None):
+        """
+        Remove cached schemas. Without a table name, all the tables of the database are removed, without a database
+        name, all the entries are removed.
+        :return:
+        """
+        with self._lock:
+            if server_name and database_name and table_name:
+                self._entries.pop(self.key(server_name, database_name, table_name), None)
+            elif server_name and database_name:
+                prefix = self.key(server_name, database_name, "")
+                self._entries = {key: val for key, val in self._entries.items() if not key.startswith(prefix)}
+            else:
+                self._entries = {}
+            self._save()
+
+
+def get_schema_cache(ttl = 300, persist_path = None):
+    """
+    Returns the process wide schema cache for persist_path (None for the memory only cache), creating it on the first
+    call. The ttl given here is the default of the cache, callers needing another one pass it to SchemaCache.get().
+    :return: SchemaCache
+    """
+    with _CACHES_LOCK:
+        if persist_path not in _CACHES:
+            _CACHES[persist_path] = SchemaCache(ttl = ttl, persist_path = persist_path)
+        return _CACHES[persist_path]
@@ -1,9 +1,17 @@
+import os
 from abc import ABC
 from base_classes.get_data import GetFromSql
 from .connection import Connection
 from .common_utils import *
+from .incremental_reader import IncrementalReader, watermark_param, watermark_placeholder
+from .parallel_reader import ParallelSQLReader
+from .query_builder import SelectQuery
+from .query_cache import get_query_cache, register_query_cache
+from .result_cache import ResultCache, json_value
+from .table_export import TableExport
 from datetime import datetime as dt, timezone, timedelta
 from common.alert import Alert
+from common.checkpoint_store import Checkpoint, get_checkpoint_store
 
 
 class SQLGetData(GetFromSql, ABC):
@@ -39,6 +47,24 @@ class SQLGetData(GetFromSql, ABC):
         self.conn                = None
         self.cursor              = None
         self.previous_diff_val   = None
+        self.key_column          = options.get('key_column')
+        self.page_size           = options.get('page_size') or 10000
+        self.reader              = None
+        self.checkpoint_store    = get_checkpoint_store(options.get('checkpoint_store'))
+        self.checkpoint_id       = options.get('checkpoint_id')
+        self.checkpoint          = None
+        self.query_cache         = options.get('query_cache')
+        if self.query_cache is True:
+            self.query_cache = get_query_cache(server_name, database_name, **{
+                option: options[f"query_cache_{option}"] for option in ('ttl', 'max_entries', 'max_bytes')
+                if f"query_cache_{option}" in options
+            })
+        elif self.query_cache is not None:
+            register_query_cache(server_name, database_name, self.query_cache)
+        self.result_cache        = options.get('result_cache')
+        if self.result_cache is None and options.get('result_cache_dir'):
+            self.result_cache = ResultCache(options['result_cache_dir'],
+                                            options.get('result_cache_max_bytes') or 1024 ** 3)
 
     def check_connection(self, **options):
         """
@@ -47,6 +73,22 @@ class SQLGetData(GetFromSql, ABC):
         """
         self.conn, self.cursor = self.connection.check_connection(return_result=True, **options)
 
+    def close(self):
+        """
+        Close the connection to your database, pooled connections are given back to the pool
+        :return:
+        """
+        self.connection.close()
+        self.conn, self.cursor = None, None
+
+    def ensure_connection(self, **options):
+        """
+        Make sure the connection to your database is alive, reconnects if it is not. The check is a 'SELECT 1' which
+        is trusted for 'liveness_window' seconds
+        :return:
+        """
+        self.conn, self.cursor = self.connection.ensure_connection(**options)
+
     def connect_to_table(self, table_name, **options):
         """
         Connect to your table and get the schema of your table
@@ -59,10 +101,16 @@ class SQLGetData(GetFromSql, ABC):
 
     def execute_raw_query(self, query, **options):
         """
-        Execute Raw query
+        Execute Raw query. With a query cache, the results of select queries with return_result=True are memoized,
+        pass use_query_cache=False to skip it.
         :return:
         """
         assert self.conn and self.cursor, "Please set these object by using check_connection() method"
+        if self.query_cache is not None and options.pop('use_query_cache', True):
+            options.setdefault('query_cache', self.query_cache)
+        else:
+            options.pop('use_query_cache', None)
+        self.ensure_connection()
         return execute_raw_query(self.cursor, query, **options)
 
     @beartype
@@ -82,9 +130,13 @@ class SQLGetData(GetFromSql, ABC):
     def return_data(self, return_as = None, **options):
         """
         Get the whole data of the table and return data as pandas df
+        With a result cache, the data is read from the cache and only refreshed when the table has changed
         :param return_as : pandas_df
+        :param options: use_cache=False to skip the result cache
         :return:
         """
+        if self.result_cache and options.get('use_cache', True) and not return_as:
+            return self.cached_select(print_results=options.get('print_results', True))
         data = self.execute_raw_query(f"select * from {self.table_name}", return_result=True)
         if not return_as:
             import pandas as pd
@@ -96,6 +148,292 @@ class SQLGetData(GetFromSql, ABC):
         else:
             return data
 
+    def iterate_data(self, fetch_size = 10000, return_as = None, query = None, **options):
+        """
+        Stream the whole data of the table in chunks of at most fetch_size rows, holding one chunk in memory at a
+        time, instead of fetching everything like return_data(). The query runs on its own cursor, so breaking out of
+        the loop early stops the read and leaves self.cursor usable.
+
+            for df in get_data.iterate_data(fetch_size=50000):
+                process(df)
+
+        :param fetch_size: number of rows per chunk, also passed to the driver as the fetch size hint
+        :param return_as : None for pandas dfs, 'tuples' for lists of tuples
+        :param query: select query to stream, default 'select * from <table_name>'
+        :param options: print_results, params bound to the '?' placeholders of the query, or columns, filters,
+                        order_by and limit to build the query, like select_data()
+        :return: generator of pandas dfs / lists of tuples
+        """
+        assert self.conn and self.cursor, "Please set these object by using check_connection() method"
+        self.ensure_connection()
+        params = options.get('params')
+        if not query:
+            query, params = self.build_select_query(
+                options.get('columns'), options.get('filters'), options.get('order_by'), options.get('limit')
+            )
+        cursor = self.conn.cursor()
+        chunks = iterate_raw_query(cursor, query, fetch_size, options.get('print_results', True), params)
+        if return_as:
+            yield from chunks
+            return
+
+        import pandas as pd
+        columns = None
+        try:
+            for rows in chunks:
+                if columns is None:
+                    # names of the result columns, the query may not select the columns of the schema
+                    columns = [description[0] for description in cursor.description]
+                yield pd.DataFrame(rows, columns=columns)
+        finally:
+            chunks.close()
+
+    def build_select_query(self, columns = None, filters = None, order_by = None, limit = None, predicates = None):
+        """
+        Compile a select on the table to a parameterized query, column names are validated against the schema
+        :param columns: list of column names to select, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+                        eg. [('amount', '>', 100), ('country', 'in', ['IN', 'US']), ('deleted_at', 'is null')]
+        :param order_by: list of column names, or tuples of (column, 'asc' | 'desc')
+        :param limit: maximum number of rows
+        :param predicates: raw conditions built in the package, see SelectQuery.where()
+        :return: tuple of (query, list of params)
+        """
+        valid_columns = [val['col_name'] for val in self.schema] if self.schema else None
+        return SelectQuery(self.table_name, valid_columns).build(columns, filters, order_by, limit, predicates)
+
+    def cached_select(self, columns = None, filters = None, order_by = None, limit = None, **options):
+        """
+        Read through the result cache. The count of the rows matching the filters and the maximum of the differential
+        column are compared with those of the cached result, if they are the same the result is read from the local
+        disk. If rows were only added, the rows past the cached maximum are fetched and appended, otherwise the whole
+        result is fetched again.
+        :param columns: list of column names to select, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+        :param order_by: list of column names, or tuples of (column, 'asc' | 'desc')
+        :param limit: maximum number of rows
+        :param options: print_results
+        :return: pandas df
+        """
+        import pandas as pd
+        assert self.result_cache, "Initialize with a result_cache or a result_cache_dir to use the result cache"
+        assert self.schema, "Provide the schema of your table or use connect_to_table() method to get the " \
+                            "schema of your table."
+        print_results = options.get('print_results', True)
+        names         = columns or [val['col_name'] for val in self.schema]
+        diff          = self.differential_column
+        if diff.lower() not in [val['col_name'] for val in self.schema]:
+            diff = None
+
+        query, params = self.build_select_query(columns, filters, order_by, limit)
+        key = self.result_cache.key(self.sql_credentials.server_name, self.sql_credentials.database_name,
+                                    self.table_name, query, params)
+        stats_query, stats_params = SelectQuery(self.table_name, [val['col_name'] for val in self.schema])\
+            .build_stats(filters, diff)
+        # the freshness probe and the reads below must see the table as it is now, never a memoized result
+        count, max_value = self.execute_raw_query(stats_query, return_result=True, params=stats_params,
+                                                  print_results=print_results, use_query_cache=False)[0]
+        # compared to the max_value of the index, as it reads back from JSON
+        max_value = json_value(watermark_param(max_value))
+
+        cached, entry = self.result_cache.get(key)
+        if cached is not None and entry['count'] == count and entry['max_value'] == max_value:
+            self.result_cache.stats['hits'] += 1
+            return cached
+
+        if cached is not None and diff and not (order_by or limit) and entry['max_value'] is not None \
+                and max_value is not None and count > entry['count']:
+            tail_query, tail_params = self.build_select_query(
+                columns, filters, predicates=[(f"{diff} > {watermark_placeholder(self.schema, diff)}",
+                                               [entry['max_value']])]
+            )
+            tail = self.execute_raw_query(tail_query, return_result=True, params=tail_params,
+                                          print_results=print_results, use_query_cache=False)
+            # rows added below the cached maximum, or while the result was read, need a full read
+            if len(cached) + len(tail) == count:
+                data = pd.concat([cached, pd.DataFrame(tail, columns=names)], ignore_index=True)
+                self.result_cache.stats['incremental'] += 1
+                self.result_cache.put(key, data, count, max_value, table_name=self.table_name, query=query)
+                return data
+
+        self.result_cache.stats['misses'] += 1
+        data = pd.DataFrame(self.execute_raw_query(query, return_result=True, params=params,
+                                                   print_results=print_results, use_query_cache=False),
+                            columns=names)
+        self.result_cache.put(key, data, count, max_value, table_name=self.table_name, query=query)
+        return data
+
+    def select_data(self, columns = None, filters = None, order_by = None, limit = None, return_as = None, **options):
+        """
+        Get only the selected columns of the rows matching the filters, the filtering, ordering and limit are done
+        by the server
+
+            df = get_data.select_data(columns  = ['id', 'amount'],
+                                      filters  = [('amount', '>', 100), ('country', 'in', ['IN', 'US'])],
+                                      order_by = [('id', 'desc')],
+                                      limit    = 1000)
+
+        :param columns: list of column names to select, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+        :param order_by: list of column names, or tuples of (column, 'asc' | 'desc')
+        :param limit: maximum number of rows
+        :param return_as : None for pandas df, 'tuples' for list of tuples
+        :param options: print_results, use_cache=False to skip the result cache
+        :return:
+        """
+        if self.result_cache and options.get('use_cache', True) and not return_as:
+            return self.cached_select(columns, filters, order_by, limit,
+                                      print_results=options.get('print_results', True))
+        query, params = self.build_select_query(columns, filters, order_by, limit)
+        data = self.execute_raw_query(query, return_result=True, params=params,
+                                      print_results=options.get('print_results', True))
+        if return_as:
+            return data
+        import pandas as pd
+        if not columns:
+            assert self.schema, "Provide the schema of your table or use connect_to_table() method to get the " \
+                                "schema of your table."
+            columns = [val['col_name'] for val in self.schema]
+        return pd.DataFrame(data, columns=columns)
+
+    def parallel_read(self, partition_column, partitions = 4, columns = None, filters = None, **options):
+        """
+        Read the table in ranges of partition_column fetched concurrently, each on its own pooled connection, and
+        merge them in one pandas df. Initialize with pool_max_size >= partitions to read every range at the same time.
+
+            df = get_data.parallel_read('id', partitions = 8, boundaries = 'percentile')
+
+        :param partition_column: numeric or datetime column to split the table on, ideally indexed
+        :param partitions: number of ranges
+        :param columns: list of column names to read, default all the columns
+        :param filters: dict of {column: value}, or list of tuples (column, operator, value), combined with AND
+        :param options: workers, boundaries 'minmax' | 'percentile', sample_percent, print_results,
+                        see ParallelSQLReader
+        :return: pandas df
+        """
+        reader = ParallelSQLReader(self, partition_column, partitions, options.pop('workers', None), **options)
+        return reader.read(columns, filters)
+
+    def parallel_export(self, partition_column, output_dir, partitions = 4, file_format = 'parquet', **options):
+        """
+        Export the table in ranges of partition_column fetched concurrently, every range written to its own file
+        :param partition_column: numeric or datetime column to split the table on, ideally indexed
+        :param output_dir: directory of the files, named <table>_part_<index>.<file_format>
+        :param partitions: number of ranges
+        :param file_format: 'parquet' (needs pyarrow) or 'csv'
+        :param options: columns, filters, workers, boundaries, sample_percent, print_results
+        :return: list of dicts like {'partition': 0, 'rows': 1000, 'seconds': 0.4, 'path': '...'}
+        """
+        reader = ParallelSQLReader(self, partition_column, partitions, options.pop('workers', None), **options)
+        return reader.export(output_dir, file_format, options.get('columns'), options.get('filters'))
+
+    def export_data(self, path, file_format = None, fetch_size = 50000, **options):
+        """
+        Export the table to a Parquet or CSV file, streaming the rows chunk by chunk so the memory used does not
+        depend on the size of the table. Parquet columns are typed from the schema, every chunk is one row group.
+
+            get_data.export_data("exports/customer.parquet", blob = BlobSendData(connection_string = "..."))
+
+        :param path: path of the file
+        :param file_format: 'parquet' (needs pyarrow) or 'csv', default from the extension of the path
+        :param fetch_size: rows fetched per round trip, and per Parquet row group
+        :param options:
+                query / params                      : select query to export, default the whole table
+                columns, filters, order_by, limit   : build the query instead, like select_data()
+                compression                         : Parquet codec (default snappy), or 'gzip' for CSV files
+                                                      (default for paths ending in .gz)
+                blob, blob_name                     : BlobSendData object to upload the file to, with the name of the
+                                                      blob, default the file name, a failed upload raises
+                print_results                       : Turn off printing of queries
+        :return: dict like {'path': '...', 'rows': 1000000, 'bytes': 1048576, 'seconds': 12.1}, with
+                 'blob': {'name': '...', 'container': '...', 'status': 'uploaded', 'etag': '...'} when uploaded
+        """
+        assert self.conn and self.cursor, "Please set these object by using check_connection() method"
+        file_format = file_format or ('parquet' if path.endswith('.parquet') else 'csv')
+        assert file_format in ('parquet', 'csv'), "file_format should be 'parquet' or 'csv'"
+        query, params = options.get('query'), options.get('params')
+        if not query:
+            query, params = self.build_select_query(options.get('columns'), options.get('filters'),
+                                                    options.get('order_by'), options.get('limit'))
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.ensure_connection()
+        export = TableExport(self.conn.cursor(), self.schema, fetch_size, **options)
+        if file_format == 'parquet':
+            summary = export.to_parquet(query, path, params)
+        else:
+            summary = export.to_csv(query, path, params)
+
+        if options.get('blob'):
+            summary['blob'] = self.upload_export(path, options['blob'], options.get('blob_name'))
+        return summary
+
+    @staticmethod
+    def upload_export(path, blob, blob_name = None):
+        """
+        Upload an exported file to the blob, errors are raised, not printed like BlobSendData.upload_data() does
+        :param path: path of the file
+        :param blob: BlobSendData object
+        :param blob_name: name of the blob, default the file name
+        :return: dict like {'name': 'customer.parquet', 'container': '...', 'status': 'uploaded', 'etag': '...'}
+        """
+        blob_name   = blob_name or os.path.basename(path)
+        blob_client = blob.blob_service_client.get_blob_client(container=blob.container_name, blob=blob_name)
+        print(f"Uploading {path} to Azure Storage as blob {blob_name}")
+        with open(path, "rb") as data:
+            response = blob_client.upload_blob(data, overwrite=True) or {}
+        return {'name': blob_name, 'container': blob.container_name, 'status': 'uploaded',
+                'etag': response.get('etag')}
+
+    def get_checkpoint(self, key_column = None):
+        """
+        Checkpoint of the differential reads of the table, None without a checkpoint_store
+        :param key_column: key column of the keyset reads, which keep a (value, key) position instead of a value
+        :return: Checkpoint object
+        """
+        if not self.checkpoint_store:
+            return None
+        reader_id = self.checkpoint_id or "|".join(filter(None, [
+            'sql', self.sql_credentials.server_name, self.sql_credentials.database_name, self.table_name,
+            self.differential_column, key_column
+        ]))
+        if self.checkpoint is None or self.checkpoint.reader_id != reader_id:
+            self.checkpoint = Checkpoint(self.checkpoint_store, reader_id)
+        return self.checkpoint
+
+    def commit_checkpoint(self):
+        """
+        Commit the watermark of the last batch returned by return_differential_data(), call it once the batch is
+        processed. Otherwise it is committed when the next batch is asked for.
+        :return:
+        """
+        if self.checkpoint:
+            self.checkpoint.commit()
+
+    def incremental_reader(self, key_column, differential_column = None, page_size = None, **options):
+        """
+        Reader of the rows added to the table, paged on the (differential column, key column) keyset
+        :param key_column: column unique within a value of the differential column, eg. the identity column
+        :param differential_column: ever increasing column, default self.differential_column
+        :param page_size: maximum number of rows per page, default self.page_size
+        :param options: see IncrementalReader, eg. create_index=True to create the index the pages seek on
+        :return: IncrementalReader object
+        """
+        reader = IncrementalReader(self, key_column, differential_column or self.differential_column,
+                                   page_size or self.page_size, **options)
+        if options.get('create_index'):
+            reader.create_index(options.get('index_name'))
+        return reader
+
+    @staticmethod
+    def default_start_value():
+        """
+        Differential value the reads start from when no initial value or checkpoint is given, one minute ago
+        :return: String
+        """
+        return dt.strftime(dt.now(timezone.utc) - timedelta(minutes=1), "%Y-%m-%d %H:%M:%S")
+
     def return_differential_data(self,
                                  differential_column = None,
                                  initially_fetch_data_greater_than_this = None,
@@ -103,21 +441,50 @@ class SQLGetData(GetFromSql, ABC):
         """
         Get incremental data on the specified column. This function will fetch data which inserted after
         the self.previous_diff_val when the function was previously called.
+        With a key_column (here or when initializing) the rows are read with an IncrementalReader instead, one page
+        of at most page_size rows per call, without skipping or repeating rows which share a differential value.
+        With a checkpoint_store the watermark is loaded from it on the first call, and committed to it once the batch
+        is processed, see commit_checkpoint().
 
         :param differential_column: column on which the differential parameter will be implemented
-        :param initially_fetch_data_greater_than_this: initial value to be fetched
-        :param options:
+        :param initially_fetch_data_greater_than_this: initial value to be fetched, when there is no checkpoint,
+                                                       default the rows added in the last minute
+        :param options: key_column, page_size, create_index, from_beginning (read the whole table on the first call
+                        of the key_column reads instead of the last minute)
         :return:
         """
         self.differential_column = differential_column if differential_column else self.differential_column
+        key_column = options.get('key_column') or self.key_column
+        checkpoint = self.get_checkpoint(key_column)
+        if checkpoint:
+            # asking for the next batch means the previous one has been processed
+            checkpoint.commit()
+        if key_column:
+            if self.reader is None:
+                start_value = initially_fetch_data_greater_than_this
+                if start_value is None and not options.get('from_beginning'):
+                    # same start as the reads without a key_column
+                    start_value = self.default_start_value()
+                self.reader = self.incremental_reader(
+                    key_column, differential_column, options.get('page_size'),
+                    start_value  = start_value,
+                    position     = checkpoint.load() if checkpoint else None,
+                    create_index = options.get('create_index')
+                )
+            data = self.reader.read_page()
+            if checkpoint and len(data):
+                checkpoint.stage(self.reader.position)
+            return data if len(data) else []
+        if checkpoint and not self.previous_diff_val:
+            self.previous_diff_val = checkpoint.load()
         if initially_fetch_data_greater_than_this and (self.previous_diff_val != initially_fetch_data_greater_than_this)\
                 and (not self.previous_diff_val):
             self.previous_diff_val = initially_fetch_data_greater_than_this
         elif not self.previous_diff_val:
-            self.previous_diff_val = dt.strftime(dt.now(timezone.utc) - timedelta(minutes=1), "%Y-%m-%d %H:%M:%S")
-        data = self.execute_raw_query(f"select * from {self.table_name} where "
-                                      f"{self.differential_column} > '{self.previous_diff_val}'",
-                                      return_result=True)
+            self.previous_diff_val = self.default_start_value()
+        query, params = self.build_select_query(filters=[(self.differential_column, '>', self.previous_diff_val)])
+        # polls must see the rows written since the last one, an empty result is never replayed from the cache
+        data = self.execute_raw_query(query, return_result=True, params=params, use_query_cache=False)
         if len(data) == 0:
             return []
         import pandas as pd
@@ -126,6 +493,8 @@ class SQLGetData(GetFromSql, ABC):
         columns = [val['col_name'] for val in self.schema]
         df = pd.DataFrame(data, columns=columns)
         self.previous_diff_val = df[self.differential_column].iloc[-1]
+        if checkpoint:
+            checkpoint.stage(self.previous_diff_val)
         return df
 
     @beartype
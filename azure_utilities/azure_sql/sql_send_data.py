@@ -2,16 +2,18 @@ import os
 from base_classes.send_data import SendToSql
 from .create_sql_instance import CreateSQLInstance
 from .connection import Connection
+from .batch_insert import BatchInsert
+from .bulk_copy import BulkCopy
+from .buffered_writer import BufferedSQLWriter
+from .transaction import TransactionSession
+from .dataframe_rows import dataframe_to_rows, is_dataframe
+from .parallel_writer import ParallelSQLWriter, split_dataframe
+from .merge_upsert import merge_upsert
+from .query_cache import invalidate_query_caches
 from .common_utils import *
 from azure_utilities.identity import Identity
 
 try:
-    from azure.common.client_factory import get_client_from_cli_profile
-    from azure.common.credentials import ServicePrincipalCredentials
-    import pandas as pd
-    from azure.mgmt.resource import ResourceManagementClient
-    from azure.mgmt.sql import SqlManagementClient
-    from azure.mgmt.sql.models import Sku
     from beartype import beartype
 except ImportError as err:
     raise ImportError(err)
@@ -53,7 +55,9 @@ class SQLSendData(SendToSql):
         self.cursor               = None
         self.schema               = options.get('schema') or []
         self.table_name           = options.get('table_name') or 'default_table_python'
-        
+        self.batch_insert         = BatchInsert(chunk_size = options.get('chunk_size') or 1000)
+        self.transaction_session  = None
+
         validate_sp_login()
 
     def provide_sql_credentials(self,
@@ -84,6 +88,22 @@ class SQLSendData(SendToSql):
         """
         self.conn, self.cursor = self.connection.check_connection(return_result=True, **options)
 
+    def close(self):
+        """
+        Close the connection to your database, pooled connections are given back to the pool
+        :return:
+        """
+        self.connection.close()
+        self.conn, self.cursor = None, None
+
+    def ensure_connection(self, **options):
+        """
+        Make sure the connection to your database is alive, reconnects if it is not. The check is a 'SELECT 1' which
+        is trusted for 'liveness_window' seconds
+        :return:
+        """
+        self.conn, self.cursor = self.connection.ensure_connection(**options)
+
     @beartype
     def create_table_schema(self, schema_list: list, **options):
         """
@@ -121,6 +141,8 @@ class SQLSendData(SendToSql):
         create_table_query = create_table_query[0:-2] + ")"
         print(f"Create table query : {create_table_query}")
         self.cursor.execute(create_table_query)
+        self.connection.invalidate_schema_cache(table_name)
+        self.invalidate_query_cache(table_name)
         print("Table created.")
 
     def create_sql_db(self, **options):
@@ -159,7 +181,62 @@ class SQLSendData(SendToSql):
         :param options:
         :return:
         """
-        self.schema, _, _ = self.connection.connect_to_table(table_name=table_name, **options)
+        self.schema, self.cursor, self.conn = self.connection.connect_to_table(table_name=table_name, **options)
+
+    def invalidate_query_cache(self, table_name = None):
+        """
+        Drop the results of the queries on the table cached by the query caches of this database in this process,
+        called after every write through this class
+        :param table_name: name of the table, default self.table_name
+        :return:
+        """
+        invalidate_query_caches(self.sql_credentials.server_name, self.sql_credentials.database_name,
+                                table_name or self.table_name)
+
+    def _execute_write(self, query):
+        """
+        Execute a write query, inside the transaction session if one is open
+        :param query:
+        :return:
+        """
+        try:
+            if self.transaction_session:
+                print(f"Executing query : {query}")
+                self.transaction_session.execute(query)
+            else:
+                execute_raw_query(self.cursor, query)
+        finally:
+            self.invalidate_query_cache()
+
+    def transaction(self, commit_every_statements = None, commit_every_rows = None):
+        """
+        Open a transactional session. While it is open, commit_data() and commit_batch_data() run with autocommit
+        turned off and are committed every commit_every_statements statements and / or commit_every_rows rows, and
+        when the session ends. A failing statement rolls back everything since the last commit and raises.
+        The session has begun when it is returned, use it in a with block, or call session.end() when done.
+
+        with az_sql.transaction(commit_every_rows=10000) as session:
+            az_sql.commit_batch_data(data = df)
+        print(session.stats)  # statement_seconds and commit_seconds are reported separately
+        :param commit_every_statements: commit after these many statements
+        :param commit_every_rows: commit after these many rows
+        :return: TransactionSession
+        """
+        assert self.conn and self.cursor, "Use check_connection() method to set 'conn' and 'cursor' object"
+        assert not self.transaction_session, "A transaction session is already open"
+
+        def _on_close(session):
+            self.transaction_session = None
+            # results read while the transaction was open may have been cached before its commit
+            self.invalidate_query_cache()
+
+        self.transaction_session = TransactionSession(
+            self.conn, self.cursor,
+            commit_every_statements = commit_every_statements,
+            commit_every_rows       = commit_every_rows,
+            on_close                = _on_close
+        ).begin()
+        return self.transaction_session
 
     @beartype
     def commit_data(self, data: (list, dict), **options):
@@ -182,7 +259,7 @@ class SQLSendData(SendToSql):
             for values in data.values():
                 query += f"'{values}', "
             query = query[0:-2] + ")"
-            execute_raw_query(self.cursor, query)
+            self._execute_write(query)
 
         elif isinstance(data[0], dict):
             for col in data:
@@ -191,7 +268,7 @@ class SQLSendData(SendToSql):
             for col in data:
                 query += f"'{col['value']}', "
             query = query[0:-2] + ")"
-            execute_raw_query(self.cursor, query)
+            self._execute_write(query)
 
         else:
             assert len(self.schema) == len(data), "All columns values are not given, as number of elements in 'data'" \
@@ -202,43 +279,143 @@ class SQLSendData(SendToSql):
             for _data in data:
                 query += f"'{_data}', "
             query = query[0:-2] + ")"
-            execute_raw_query(self.cursor, query)
+            self._execute_write(query)
+
+    def prepare_batch_data(self, data):
+        """
+        Convert the data given to commit_batch_data() to the columns and the rows to bind to the INSERT statement
+        :param data: list of dicts, list of tuples / lists or a pandas DataFrame
+        :return: tuple of (list of column names, list of tuples)
+        """
+        if isinstance(data, list) and isinstance(data[0], dict):
+            columns = [col_name for col_name in data[0].keys() if col_name != 'create_dttm']
+            rows    = [tuple(data_.get(col_name) for col_name in columns) for data_ in data]
+
+        elif isinstance(data, list) and isinstance(data[0], (tuple, list)):
+            columns = [col['col_name'] for col in self.schema if col['col_name'] != 'create_dttm']
+            rows    = data
+
+        elif is_dataframe(data):
+            columns = [col_name for col_name in data.columns if col_name != 'create_dttm']
+            rows    = dataframe_to_rows(data, columns)
+
+        else:
+            raise TypeError(f"Data should be a list of dicts, a list of tuples or a pandas DataFrame, "
+                            f"not {type(data)}")
+        return columns, rows
 
     @beartype
-    def commit_batch_data(self, data: (list, pd.DataFrame), **options):
+    def commit_batch_data(self, data: (list, 'pandas.DataFrame'), **options):
         """
-        Commit data in batches
-        :param data:
+        Commit data in batches. One parameterized INSERT is prepared for the column set and the rows are bound to it
+        through cursor.executemany() in chunks of 'chunk_size' rows.
+        :param data: list of dicts, list of tuples / lists (values for all the columns of self.schema except
+                     create_dttm) or a pandas DataFrame
         :param options:
-        :return:
+                chunk_size : number of rows sent per executemany() call, default is the one given while
+                             initializing the class, or 1000
+        :return: list of dicts, one per chunk, like {'chunk': 0, 'rows': 1000, 'seconds': 0.21}
         """
-        import json
         assert self.schema, "Please provide a schema by using create_table_schema() method"
-        query = f"INSERT INTO {self.table_name} ("
+        columns, rows = self.prepare_batch_data(data)
 
-        if isinstance(data, list) and isinstance(data[0], dict):
-            for col_name in data[0].keys():
-                if col_name != 'create_dttm':
-                    query += f"{col_name}, "
-            query  = query[0:-2] + ") VALUES "
-            quotes = "'"
-            for data_ in data:
-                query += f"({', '.join([f'{quotes + str(val) + quotes}' for val in list(data_.values())])}), "
-            query = query[0:-2]
-            execute_raw_query(self.cursor, query)
+        try:
+            if self.transaction_session:
+                return self.transaction_session.insert(self.batch_insert, self.table_name, columns, rows,
+                                                       chunk_size = options.get('chunk_size'))
+            return self.batch_insert.insert(self.cursor, self.table_name, columns, rows,
+                                            chunk_size = options.get('chunk_size'))
+        finally:
+            self.invalidate_query_cache()
 
-        elif isinstance(data, list) and isinstance(data[0], (tuple, list)):
-            for col in self.schema:
-                if col['col_name'] != 'create_dttm':
-                    query += f"{col['col_name']}, "
-            query  = query[0:-2] + ") VALUES "
-            quotes = "'"
-            for data_ in data:
-                query += f"({', '.join([f'{quotes + str(val) + quotes}' for val in data_])}), "
-            query = query[0:-2]
-            execute_raw_query(self.cursor, query)
-
-        elif isinstance(data, pd.DataFrame):
-            data_json = data.to_json(orient="records")
-            parsed    = json.loads(data_json)
-            self.commit_batch_data(data = parsed)
\ No newline at end of file
+    @beartype
+    def upsert_batch_data(self, data: (list, 'pandas.DataFrame'), key_columns: (str, list), **options):
+        """
+        Insert or update rows, matching them on the key columns. The batch is loaded in a staging table and applied
+        with one MERGE into self.table_name, so re-sending corrected rows does not need a delete and insert per row.
+        If a key is present more than once in the batch, the last row for it wins.
+        :param data: list of dicts, list of tuples / lists or a pandas DataFrame, like commit_batch_data()
+        :param key_columns: column name, or list of column names identifying a row
+        :param options:
+                staging_table : name of the staging table, default a global temp table dropped after the MERGE
+                chunk_size    : rows per executemany() call while loading the staging table
+        :return: dict like {'rows': 1000, 'merged': 1000, 'seconds': 0.8}
+        """
+        assert self.conn and self.cursor, "Use check_connection() method to set 'conn' and 'cursor' object"
+        assert self.schema, "Please provide a schema by using create_table_schema() method"
+        key_columns   = [key_columns] if isinstance(key_columns, str) else key_columns
+        columns, rows = self.prepare_batch_data(data)
+        try:
+            return merge_upsert(self.cursor, self.batch_insert, self.table_name,
+                                [str(col).lower() for col in columns], rows,
+                                [key.lower() for key in key_columns], **options)
+        finally:
+            self.invalidate_query_cache()
+
+    def parallel_commit_batch_data(self, data, workers = 4, partitions = None, **options):
+        """
+        Commit data concurrently over 'workers' pooled connections. A DataFrame is split in 'partitions' consecutive
+        partitions (default 4 * workers), an iterator / list of batches is used as it is, one batch per partition.
+        Every partition is written in its own transaction and retried on failure, results are in partition order.
+        Initialize the class with pool_max_size >= workers so each worker gets its own connection.
+        :param data: pandas DataFrame, or an iterable of batches, each one accepted by commit_batch_data()
+        :param workers: number of partitions written at the same time
+        :param partitions: number of partitions a DataFrame is split in
+        :param options:
+                max_retries      : retries per partition, default 3
+                retry_backoff    : seconds before the first retry, doubled for every next one, default 1
+                chunk_size       : rows per executemany() call
+                raise_on_failure : raise if a partition fails after all retries, default True
+        :return: dict like {'rows': 1000000, 'seconds': 60.1, 'rows_per_sec': 16638.9, 'partitions': [...],
+                            'failed_partitions': []}
+        """
+        assert self.schema, "Please provide a schema by using create_table_schema() method"
+        if is_dataframe(data):
+            data = split_dataframe(data, partitions or 4 * workers)
+        writer = ParallelSQLWriter(self, workers = workers, **options)
+        try:
+            return writer.write(data)
+        finally:
+            self.invalidate_query_cache()
+
+    @beartype
+    def bulk_load_dataframe(self, data: 'pandas.DataFrame', batch_size: int = 10000, **options):
+        """
+        Load a DataFrame into the table using the bulk copy API of the JDBC driver (SQLServerBulkCopy). Use this
+        over commit_batch_data() for large frames, the rows are not sent as INSERT statements but as a bulk insert.
+        Columns of the DataFrame are mapped to the columns of self.schema by name (case insensitive).
+        :param data: pandas DataFrame to load
+        :param batch_size: number of rows sent to the server per batch
+        :param options:
+                column_mapping : dict like {'<df-column>': '<table-column>'} for columns named differently
+                chunk_size     : number of rows of the DataFrame spooled at a time, default 100000
+                timeout        : bulk copy timeout in seconds, default no timeout
+                table_lock     : lock the table while loading, default True
+        :return: dict like {'rows': 5000000, 'seconds': 180.2, 'rows_per_sec': 27746.9}
+        """
+        assert self.conn and self.cursor, "Use check_connection() method to set 'conn' and 'cursor' object"
+        assert self.schema, "Please provide a schema by using create_table_schema() method"
+        bulk_copy = BulkCopy(self.conn, self.table_name, self.schema, batch_size = batch_size, **options)
+        try:
+            return bulk_copy.load(data, column_mapping = options.get('column_mapping'))
+        finally:
+            self.invalidate_query_cache()
+
+    def buffered_writer(self, **options):
+        """
+        Get a write-behind writer for this table. Rows given to its commit_data() are buffered in memory and sent in
+        batches by a background thread, use it when data arrives one row at a time. The writer uses the cursor of this
+        object, so do not commit data through this object while the writer is open.
+
+        with az_sql.buffered_writer(max_rows=500, flush_interval=2) as writer:
+            writer.commit_data({'cust_id': 50, 'name': 'sajal'})
+        :param options:
+                max_rows          : flush when these many rows are buffered, default 1000
+                max_bytes         : flush when the buffered rows take these many bytes, default 1 MB
+                flush_interval    : flush at least every these many seconds, default 5
+                max_buffered_rows : commit_data() blocks when these many rows are waiting, default 100000
+                put_timeout       : seconds to block before raising TimeoutError, default waits forever
+        :return: BufferedSQLWriter
+        """
+        assert self.conn and self.cursor, "Use check_connection() method to set 'conn' and 'cursor' object"
+        return BufferedSQLWriter(self, **options)
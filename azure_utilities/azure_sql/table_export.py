@@ -0,0 +1,158 @@
+import csv
+import gzip
+import itertools
+import os
+import time
+
+from .bulk_copy import parse_sql_datatype
+from .common_utils import iterate_raw_query
+
+
+def arrow_type(datatype):
+    """
+    Arrow type of a column of the schema
+    :param datatype: datatype as stored in self.schema, eg. 'int', 'decimal(10, 2)', 'datetime'
+    :return: pyarrow DataType
+    """
+    import pyarrow as pa
+    name, precision, scale = parse_sql_datatype(datatype)
+    types = {
+        'bit'             : pa.bool_(),
+        'tinyint'         : pa.uint8(),
+        'smallint'        : pa.int16(),
+        'int'             : pa.int32(),
+        'integer'         : pa.int32(),
+        'bigint'          : pa.int64(),
+        'float'           : pa.float64(),
+        'real'            : pa.float32(),
+        'date'            : pa.date32(),
+        'datetime'        : pa.timestamp('ms'),
+        'smalldatetime'   : pa.timestamp('s'),
+        'datetime2'       : pa.timestamp('us'),
+        'binary'          : pa.binary(),
+        'varbinary'       : pa.binary(),
+        'image'           : pa.binary(),
+    }
+    if name in ('decimal', 'numeric', 'money', 'smallmoney'):
+        return pa.decimal128(precision, scale)
+    # character types, and the ones without an exact arrow type (time, datetimeoffset, uniqueidentifier, xml)
+    return types.get(name, pa.string())
+
+
+def arrow_schema(schema, columns):
+    """
+    Arrow schema of the exported columns, columns not in the schema are exported as strings
+    :param schema: schema of the table, list of dicts like [{'col_name': 'cust_id', 'datatype': 'int'}]
+    :param columns: names of the exported columns, in the order of the query
+    :return: pyarrow Schema
+    """
+    import pyarrow as pa
+    datatypes = {val['col_name'].lower(): val['datatype'] for val in schema or []}
+    return pa.schema([pa.field(column, arrow_type(datatypes.get(column.lower(), 'varchar'))) for column in columns])
+
+
+def to_arrow_array(values, data_type):
+    """
+    Convert the values of a column, values the driver returns in another type (eg. datetimes as strings with
+    jaydebeapi) are cast to the type of the column
+    :param values: list of values
+    :param data_type: pyarrow DataType
+    :return: pyarrow Array
+    """
+    import pyarrow as pa
+    try:
+        return pa.array(values, type=data_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values]).cast(data_type)
+
+
+class TableExport:
+    """
+    Stream the result of a query to a Parquet or CSV file, one fetched chunk at a time, so the memory used does not
+    depend on the size of the table. Every chunk becomes a row group of the Parquet file, typed from the schema of
+    the table, or is appended to the (optionally gzip compressed) CSV file.
+    """
+    def __init__(self, cursor, schema = None, fetch_size = 50000, **options):
+        """
+        :param cursor: cursor dedicated to the export, it is closed at the end
+        :param schema: schema of the table, used to type the Parquet columns
+        :param fetch_size: rows per chunk, ie. per Parquet row group
+        :param options:
+                compression   : Parquet codec, default 'snappy', or 'gzip' / None for CSV files,
+                                default 'gzip' for paths ending in .gz
+                print_results : Turn off printing of queries
+        """
+        self.cursor        = cursor
+        self.schema        = schema
+        self.fetch_size    = fetch_size
+        self.compression   = options.get('compression', 'default')
+        self.print_results = options.get('print_results', True)
+
+    def columns(self):
+        return [description[0] for description in self.cursor.description]
+
+    def chunks(self, query, params = None):
+        """
+        Execute the query and return its chunks, the columns of the result are known once this returns
+        :return: iterator of lists of tuples
+        """
+        chunks = iterate_raw_query(self.cursor, query, self.fetch_size, self.print_results, params, False)
+        first  = next(chunks, None)
+        return itertools.chain([first] if first else [], chunks)
+
+    def to_parquet(self, query, path, params = None):
+        """
+        :param query: select query
+        :param path: path of the Parquet file
+        :param params: values bound to the '?' placeholders of the query
+        :return: dict like {'path': '...', 'rows': 1000000, 'row_groups': 20, 'bytes': 1048576, 'seconds': 12.1}
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow not present, install it first using pip install pyarrow")
+        started_at  = time.perf_counter()
+        compression = 'snappy' if self.compression == 'default' else self.compression
+        rows, row_groups = 0, 0
+        try:
+            chunks = self.chunks(query, params)
+            schema = arrow_schema(self.schema, self.columns())
+            with pq.ParquetWriter(path, schema, compression=compression) as writer:
+                for chunk in chunks:
+                    arrays = [to_arrow_array(list(values), field.type) for values, field in zip(zip(*chunk), schema)]
+                    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                    rows       += len(chunk)
+                    row_groups += 1
+        finally:
+            self.cursor.close()
+        return self._summary(path, rows, started_at, row_groups=row_groups)
+
+    def to_csv(self, query, path, params = None):
+        """
+        :param query: select query
+        :param path: path of the CSV file, gzip compressed if it ends in .gz or compression is 'gzip'
+        :param params: values bound to the '?' placeholders of the query
+        :return: dict like {'path': '...', 'rows': 1000000, 'bytes': 1048576, 'seconds': 12.1}
+        """
+        started_at = time.perf_counter()
+        compress   = self.compression == 'gzip' or (self.compression == 'default' and path.endswith('.gz'))
+        rows       = 0
+        try:
+            chunks = self.chunks(query, params)
+            with (gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')) as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(self.columns())
+                for chunk in chunks:
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+        finally:
+            self.cursor.close()
+        return self._summary(path, rows, started_at)
+
+    @staticmethod
+    def _summary(path, rows, started_at, **stats):
+        seconds = time.perf_counter() - started_at
+        summary = dict(path=path, rows=rows, bytes=os.path.getsize(path), seconds=seconds, **stats)
+        print(f"Exported {rows} rows to {path} in {seconds:.2f} seconds ({summary['bytes']} bytes)")
+        return summary
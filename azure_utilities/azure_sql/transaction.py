@@ -0,0 +1,162 @@
+import time
+
+from common.sql_utilities import set_autocommit
+
+
+class TransactionSession:
+    """
+    Run statements with autocommit turned off and commit them in groups, every commit_every_statements statements
+    and / or every commit_every_rows rows, and once more when the session ends. If a statement fails, the statements
+    run since the last commit are rolled back and the error is raised, groups committed before stay committed.
+    Time spent executing statements and time spent committing are reported separately in self.stats.
+
+    with TransactionSession(conn, cursor, commit_every_rows=10000) as session:
+        session.execute("DELETE FROM customer WHERE cust_id = ?", (50, ))
+        session.executemany("INSERT INTO customer (cust_id, name) VALUES (?, ?)", rows)
+    """
+    def __init__(self,
+                 conn,
+                 cursor,
+                 commit_every_statements = None,
+                 commit_every_rows       = None,
+                 **options):
+        """
+        :param conn: connection object
+        :param cursor: cursor of the connection
+        :param commit_every_statements: commit after these many statements
+        :param commit_every_rows: commit after these many rows
+        :param options:
+                on_close : function called with the session when it ends
+        """
+        self.conn                    = conn
+        self.cursor                  = cursor
+        self.commit_every_statements = commit_every_statements
+        self.commit_every_rows       = commit_every_rows
+        self.on_close                = options.get('on_close')
+        self.pending_statements      = 0
+        self.pending_rows            = 0
+        self.previous_autocommit     = None
+        self.stats                   = {
+            'statements'       : 0,
+            'rows'             : 0,
+            'commits'          : 0,
+            'rollbacks'        : 0,
+            'statement_seconds': 0.0,
+            'commit_seconds'   : 0.0,
+        }
+
+    def begin(self):
+        """
+        Turn off autocommit for the connection, once, the session may already have begun when used in a with block
+        :return: self
+        """
+        if self.previous_autocommit is None:
+            self.previous_autocommit = set_autocommit(self.conn, False)
+        return self
+
+    def _run(self, func, rows):
+        """
+        Run a statement, record its time, commit if a limit is hit and roll back if it fails
+        :param func: function running the statement
+        :param rows: number of rows the statement sends
+        :return: whatever func returns
+        """
+        started_at = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            self.rollback()
+            raise
+        self.stats['statement_seconds'] += time.perf_counter() - started_at
+        self.stats['statements']        += 1
+        self.stats['rows']              += rows
+        self.pending_statements         += 1
+        self.pending_rows               += rows
+        if (self.commit_every_statements and self.pending_statements >= self.commit_every_statements) \
+                or (self.commit_every_rows and self.pending_rows >= self.commit_every_rows):
+            self.commit()
+        return result
+
+    def execute(self, query, params = None, rows = 1):
+        """
+        Execute a statement in the transaction
+        :param query: query to execute
+        :param params: parameters of the query, if any
+        :param rows: number of rows the statement counts for, default 1
+        :return:
+        """
+        if params is None:
+            return self._run(lambda: self.cursor.execute(query), rows)
+        return self._run(lambda: self.cursor.execute(query, params), rows)
+
+    def executemany(self, query, rows):
+        """
+        Execute a statement for each of the rows, in the transaction
+        :param query: parameterized query
+        :param rows: list of tuples
+        :return:
+        """
+        return self._run(lambda: self.cursor.executemany(query, rows), len(rows))
+
+    def insert(self, batch_insert, table_name, columns, rows, chunk_size = None):
+        """
+        Insert rows using a BatchInsert, chunk by chunk, so commits can happen in between chunks
+        :param batch_insert: azure_utilities.azure_sql.batch_insert.BatchInsert object
+        :param table_name: name of the table
+        :param columns: list of column names
+        :param rows: list of tuples
+        :param chunk_size: rows per executemany() call, default batch_insert.chunk_size
+        :return: list of dicts, one per chunk, like BatchInsert.insert()
+        """
+        chunk_size  = chunk_size or batch_insert.chunk_size
+        chunk_stats = []
+        for chunk_no, start in enumerate(range(0, len(rows), chunk_size)):
+            chunk = rows[start: start + chunk_size]
+            stats = self._run(lambda: batch_insert.insert(self.cursor, table_name, columns, chunk, chunk_size),
+                              len(chunk))
+            chunk_stats.append(dict(stats[0], chunk = chunk_no))
+        return chunk_stats
+
+    def commit(self):
+        """
+        Commit the statements run since the last commit
+        :return:
+        """
+        started_at = time.perf_counter()
+        self.conn.commit()
+        self.stats['commit_seconds'] += time.perf_counter() - started_at
+        self.stats['commits']        += 1
+        self.pending_statements = self.pending_rows = 0
+
+    def rollback(self):
+        """
+        Roll back the statements run since the last commit
+        :return:
+        """
+        try:
+            self.conn.rollback()
+        finally:
+            self.stats['rollbacks'] += 1
+            self.pending_statements = self.pending_rows = 0
+
+    def end(self, commit = True):
+        """
+        Commit (or roll back) what is pending and give the connection its autocommit mode back
+        :param commit: commit if True, else roll back
+        :return:
+        """
+        try:
+            if self.pending_statements:
+                self.commit() if commit else self.rollback()
+        finally:
+            if self.previous_autocommit is not None:
+                set_autocommit(self.conn, self.previous_autocommit)
+                self.previous_autocommit = None
+            if self.on_close:
+                self.on_close(self)
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end(commit = exc_type is None)
@@ -1,9 +1,5 @@
 import os
 
-import names
-from azure.common.credentials import ServicePrincipalCredentials
-from azure.mgmt.resource import ResourceManagementClient
-
 from azure_utilities import logger
 
 
@@ -88,6 +84,9 @@ class Identity:
             except AttributeError as err:
                 raise Exception(f"SP_credentials not created, or not provided, error: {err}")
 
+            from azure.common.credentials import ServicePrincipalCredentials
+            from azure.mgmt.resource import ResourceManagementClient
+
             # assert name of the app is in form "http://<app-name>"
             assert SP_credentials['name'].find("http://") != -1, "Give name of app in format 'http://<app-name>'"
 
@@ -141,6 +140,7 @@ class Identity:
                                               access to the subscription, if set to true, no role will be assigned to SP.
                           return_result     : If set to true, result will be returned
         """
+        import names
         logger.debug(f"Inside create_service_principal function, options -> {options}")
         print("Creating new service principal...")
         name_of_app = options.get('name_of_app') or f"{names.get_first_name()}-Python-App"
@@ -0,0 +1,89 @@
+"""
+Microbenchmark of the DataFrame to SQL conversion used by SQLSendData.commit_batch_data().
+
+Compares the earlier path (to_json -> json.loads -> list of dicts -> quoted VALUES string) with dataframe_to_rows(),
+which converts the frame column by column to bind parameter tuples. No database is needed.
+
+    python benchmarks/bench_dataframe_to_rows.py --rows 200000 --columns 40
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure_utilities.azure_sql.dataframe_rows import dataframe_to_rows
+
+
+def make_frame(rows, columns):
+    """
+    Wide frame with int, float (with NaN), string and datetime (with NaT) columns
+    """
+    import numpy as np
+    import pandas as pd
+    data = {}
+    for col in range(columns):
+        kind = col % 4
+        if kind == 0:
+            data[f'int_{col}'] = np.arange(rows)
+        elif kind == 1:
+            values = np.random.rand(rows)
+            values[::10] = np.nan
+            data[f'float_{col}'] = values
+        elif kind == 2:
+            data[f'str_{col}'] = [f'value-{i}' for i in range(rows)]
+        else:
+            values = pd.Series(pd.date_range('2021-01-01', periods=rows, freq='s'))
+            values[::10] = pd.NaT
+            data[f'dttm_{col}'] = values
+    return pd.DataFrame(data)
+
+
+def json_path(data):
+    """
+    The conversion commit_batch_data() did before dataframe_to_rows()
+    """
+    parsed = json.loads(data.to_json(orient="records"))
+    query  = f"INSERT INTO bench ({', '.join(parsed[0].keys())}) VALUES "
+    quotes = "'"
+    for data_ in parsed:
+        query += f"({', '.join([f'{quotes + str(val) + quotes}' for val in list(data_.values())])}), "
+    return query[0:-2]
+
+
+def columnar_path(data):
+    return dataframe_to_rows(data)
+
+
+def measure(func, data, repeat):
+    best_seconds = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(data)
+        seconds = time.perf_counter() - started_at
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_seconds, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows, args.columns)
+    print(f"Frame: {args.rows} rows x {args.columns} columns")
+    results = {}
+    for name, func in [('json round trip', json_path), ('columnar', columnar_path)]:
+        seconds, peak = measure(func, frame, args.repeat)
+        results[name] = seconds
+        print(f"{name:<16} best of {args.repeat}: {seconds:8.3f} s   peak memory: {peak / 2 ** 20:8.1f} MB")
+    print(f"speed up: {results['json round trip'] / results['columnar']:.1f}x")
@@ -0,0 +1,119 @@
+"""
+Benchmark of the import time of the package entry points.
+
+Imports every entry point in a fresh interpreter with 'python -X importtime', from an empty scratch directory so the
+log directory of the package is not created next to the repo, and reports the cumulative import time along with the
+slowest modules it pulled in. The best of --repeat runs is kept.
+
+    python benchmarks/bench_import_time.py --repeat 5 --output import_times.json
+    python benchmarks/bench_import_time.py --baseline import_times.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = [
+    'azure_utilities',
+    'azure_utilities.Utils',
+    'azure_utilities.identity',
+    'azure_utilities.azure_sql.sql_send_data',
+    'azure_utilities.azure_sql.sql_get_data',
+    'azure_utilities.azure_file_storage.blob',
+    'azure_utilities.azure_nosql.cosmosdb',
+    'azure_utilities.azure_nosql.table_storage',
+    'common.sql_utilities',
+    'common.alert',
+]
+
+
+def import_time(module, cwd):
+    """
+    Import the module in a fresh interpreter
+    :param module: dotted name of the module
+    :param cwd: working directory of the interpreter
+    :return: tuple of (cumulative micro seconds of the module, dict of cumulative micro seconds per imported module),
+             or (None, error message) when the import fails
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+
+    # lines look like 'import time:       self [us] |  cumulative | imported package'
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times.get(module), times
+
+
+def run(modules, repeat, top):
+    """
+    :return: dict like {'azure_utilities': {'us': 2100, 'top': [['logging', 1500], ...]}, ...}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for module in modules:
+            best, best_times = None, None
+            for _ in range(repeat):
+                total, times = import_time(module, scratch_dir)
+                if total is None:
+                    results[module] = {'us': None, 'error': times}
+                    break
+                if best is None or total < best:
+                    best, best_times = total, times
+            else:
+                slowest = sorted(((name, us) for name, us in best_times.items() if name != module),
+                                 key=lambda item: item[1], reverse=True)[:top]
+                results[module] = {'us': best, 'top': slowest}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=ENTRY_POINTS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=5, help="slowest imported modules shown per entry point")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file written by --output, to compare the results against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="relative slow down over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    results  = run(args.modules, args.repeat, args.top)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    regressions = []
+    for module, result in results.items():
+        if result['us'] is None:
+            print(f"{module:<45} failed -> {result['error']}")
+            continue
+        line = f"{module:<45} {result['us'] / 1000:9.1f} ms"
+        previous = baseline.get(module, {}).get('us')
+        if previous:
+            change = (result['us'] - previous) / previous
+            line  += f"   baseline {previous / 1000:9.1f} ms ({change:+.0%})"
+            if change > args.tolerance:
+                regressions.append(module)
+        print(line)
+        for name, us in result['top']:
+            print(f"    {name:<41} {us / 1000:9.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if regressions:
+        print(f"Import time regressed by more than {args.tolerance:.0%} for {regressions}")
+        sys.exit(1)
@@ -0,0 +1,66 @@
+"""
+Benchmark of the SQL driver backends (jaydebeapi over JDBC, pyodbc over ODBC) on insert and fetch throughput.
+
+Creates a scratch table, inserts --rows rows through BatchInsert (the batch path of SQLSendData), fetches them back
+with a 'SELECT' and fetchall() and drops the table, once per backend. Needs a reachable Azure SQL database.
+
+    python benchmarks/bench_sql_backends.py --server <server-name> --database <db-name> \
+        --username <username> --password <password> --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure_utilities.azure_sql.batch_insert import BatchInsert
+from azure_utilities.azure_sql.common_utils import SQLCredentials
+from azure_utilities.azure_sql.connection import Connection
+
+TABLE_NAME = "bench_sql_backends"
+
+
+def run(backend, credentials, rows, chunk_size):
+    connection = Connection(credentials, backend = backend, use_schema_cache = False)
+    connection.check_connection()
+    cursor = connection.cursor
+    cursor.execute(f"IF OBJECT_ID('dbo.{TABLE_NAME}', 'U') IS NOT NULL DROP TABLE dbo.{TABLE_NAME}")
+    cursor.execute(f"CREATE TABLE {TABLE_NAME} (id INT, name VARCHAR(50), amount FLOAT, created DATETIME)")
+    data = [(i, f"name-{i}", i * 1.5, "2021-01-01 10:00:00.000") for i in range(rows)]
+    try:
+        batch_insert = BatchInsert(chunk_size = chunk_size, print_results = False)
+        started_at   = time.perf_counter()
+        batch_insert.insert(cursor, TABLE_NAME, ['id', 'name', 'amount', 'created'], data)
+        insert_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        cursor.execute(f"SELECT id, name, amount, created FROM {TABLE_NAME}")
+        fetched = len(cursor.fetchall())
+        fetch_seconds = time.perf_counter() - started_at
+    finally:
+        cursor.execute(f"DROP TABLE {TABLE_NAME}")
+        connection.close()
+    return rows / insert_seconds, fetched / fetch_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', required=True)
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--backends', nargs='+', default=['jaydebeapi', 'pyodbc'])
+    args = parser.parse_args()
+
+    sql_credentials = SQLCredentials(
+        server_name   = args.server,
+        database_name = args.database,
+        db_username   = args.username,
+        db_password   = args.password
+    )
+    for backend_name in args.backends:
+        insert_rate, fetch_rate = run(backend_name, sql_credentials, args.rows, args.chunk_size)
+        print(f"{backend_name:<12} insert: {insert_rate:12.1f} rows/sec   fetch: {fetch_rate:12.1f} rows/sec")
@@ -0,0 +1,10 @@
+import importlib
+
+# modules imported on first access, eg. common.sql_utilities
+SUBMODULES = ['alert', 'checkpoint_store', 'plot_live_data', 'sql_backends', 'sql_utilities']
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__} has no attribute {name}")
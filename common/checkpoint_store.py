@@ -0,0 +1,279 @@
+"""
+Checkpoint stores keep the high-watermark of the differential readers (SQLGetData, GetTableData, GetCosmosData)
+outside the process, so a restarted reader resumes where it stopped with a single lookup. Every store saves a
+checkpoint atomically, a reader sees either the previous or the new value, never a partial one.
+"""
+import abc
+import datetime
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+def encode_value(value):
+    """
+    Encode a watermark to JSON, datetimes keep their type and precision, numpy scalars become python scalars
+    :param value: watermark, eg. '2021-01-01 10:00:00', 1610000000, datetime, or a tuple of those
+    :return: String
+    """
+    def _default(val):
+        if hasattr(val, 'to_pydatetime'):
+            # pandas Timestamp, its nanoseconds are not read back by fromisoformat()
+            val = val.to_pydatetime()
+        if isinstance(val, datetime.datetime):
+            return {'__datetime__': val.isoformat()}
+        if hasattr(val, 'item'):
+            return val.item()
+        raise TypeError(f"Checkpoint value {val!r} of type {type(val).__name__} is not JSON serializable")
+    return json.dumps(value, default=_default)
+
+
+def decode_value(text):
+    """
+    Decode a watermark encoded by encode_value()
+    :param text: String
+    :return: watermark, tuples are returned as lists
+    """
+    def _object_hook(obj):
+        if set(obj) == {'__datetime__'}:
+            return datetime.datetime.fromisoformat(obj['__datetime__'])
+        return obj
+    return json.loads(text, object_hook=_object_hook)
+
+
+class CheckpointStore(abc.ABC):
+    """
+    Interface of the checkpoint stores, a checkpoint is a JSON serializable watermark saved under a reader id
+    """
+    @abc.abstractmethod
+    def load(self, reader_id, default = None):
+        """
+        :param reader_id: id of the reader, eg. 'sql|server|db|table|create_dttm'
+        :param default: returned when the reader has no checkpoint
+        :return: watermark
+        """
+        pass
+
+    @abc.abstractmethod
+    def commit(self, reader_id, value):
+        """
+        Save the watermark of the reader, replacing the previous one atomically
+        :param reader_id: id of the reader
+        :param value: watermark
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete(self, reader_id):
+        """
+        Remove the checkpoint of the reader, it reads from its initial value again
+        :param reader_id: id of the reader
+        :return:
+        """
+        pass
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Checkpoints of all the readers kept in one JSON file, rewritten through a temp file and os.replace(). Use it for
+    readers of a single process, the SQLite store is safe for readers of several processes.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the JSON file
+        """
+        self.path  = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return {}
+
+    def load(self, reader_id, default = None):
+        with self._lock:
+            entry = self._read().get(reader_id)
+        return decode_value(entry['value']) if entry else default
+
+    def commit(self, reader_id, value):
+        with self._lock:
+            entries = self._read()
+            entries[reader_id] = {'value': encode_value(value), 'committed_at': time.time()}
+            self._write(entries)
+
+    def delete(self, reader_id):
+        with self._lock:
+            entries = self._read()
+            if entries.pop(reader_id, None) is not None:
+                self._write(entries)
+
+    def _write(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w") as checkpoint_file:
+                json.dump(entries, checkpoint_file)
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    Checkpoints kept in a SQLite database, one row per reader, every commit is its own transaction
+    """
+    def __init__(self, path, table_name = "checkpoints"):
+        """
+        :param path: path of the SQLite database file
+        :param table_name: name of the table of checkpoints, created if it does not exist
+        """
+        self.path       = path
+        self.table_name = table_name
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table_name} "
+                         f"(reader_id TEXT PRIMARY KEY, value TEXT NOT NULL, committed_at REAL NOT NULL)")
+
+    def _connect(self):
+        # a connection per call, so the store can be shared by threads and processes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, reader_id, default = None):
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT value FROM {self.table_name} WHERE reader_id = ?", (reader_id,)).fetchone()
+        finally:
+            conn.close()
+        return decode_value(row[0]) if row else default
+
+    def commit(self, reader_id, value):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"INSERT OR REPLACE INTO {self.table_name} (reader_id, value, committed_at) "
+                             f"VALUES (?, ?, ?)", (reader_id, encode_value(value), time.time()))
+        finally:
+            conn.close()
+
+    def delete(self, reader_id):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"DELETE FROM {self.table_name} WHERE reader_id = ?", (reader_id,))
+        finally:
+            conn.close()
+
+
+class BlobCheckpointStore(CheckpointStore):
+    """
+    Checkpoints kept in an Azure blob container, one blob per reader, which an upload replaces atomically. Use it
+    when the readers run on machines without a shared disk.
+    """
+    def __init__(self, connection_string, container_name = "checkpoints", prefix = ""):
+        """
+        :param connection_string: connection string of the storage account
+        :param container_name: name of the container, created if it does not exist
+        :param prefix: prefix of the blob names, eg. 'prod/'
+        """
+        try:
+            from azure.storage.blob import ContainerClient
+            from azure.core.exceptions import ResourceExistsError
+        except ImportError:
+            raise ImportError("azure-storage-blob not present, install it first using pip install azure-storage-blob")
+        self.prefix           = prefix
+        self.container_client = ContainerClient.from_connection_string(connection_string, container_name)
+        try:
+            self.container_client.create_container()
+        except ResourceExistsError:
+            pass
+
+    def blob_name(self, reader_id):
+        # every part of the reader id is a 'directory', eg. sql/server/db/table/create_dttm.json
+        return self.prefix + re.sub(r"[^A-Za-z0-9_.|-]", "_", reader_id).replace("|", "/") + ".json"
+
+    def load(self, reader_id, default = None):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            text = self.container_client.download_blob(self.blob_name(reader_id)).readall()
+        except ResourceNotFoundError:
+            return default
+        return decode_value(json.loads(text)['value'])
+
+    def commit(self, reader_id, value):
+        entry = {'value': encode_value(value), 'committed_at': time.time()}
+        self.container_client.upload_blob(self.blob_name(reader_id), json.dumps(entry), overwrite=True)
+
+    def delete(self, reader_id):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self.container_client.delete_blob(self.blob_name(reader_id))
+        except ResourceNotFoundError:
+            pass
+
+
+def get_checkpoint_store(store):
+    """
+    Returns the checkpoint store
+    :param store: CheckpointStore object, or a path, '.db' / '.sqlite' / '.sqlite3' files use the SQLite store and any
+                  other the JSON file store
+    :return: CheckpointStore object
+    """
+    if store is None or isinstance(store, CheckpointStore):
+        return store
+    assert isinstance(store, (str, os.PathLike)), "checkpoint_store should be a CheckpointStore object or a path"
+    if os.fspath(store).endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteCheckpointStore(store)
+    return FileCheckpointStore(store)
+
+
+class Checkpoint:
+    """
+    Checkpoint of one reader. The watermark of a batch is staged when the batch is returned, and committed once the
+    batch has been processed, either explicitly with commit() or when the reader asks for the next batch, so a
+    restarted reader gets the last unprocessed batch again instead of losing it.
+    """
+    def __init__(self, store, reader_id):
+        """
+        :param store: CheckpointStore object or path, see get_checkpoint_store()
+        :param reader_id: id of the reader
+        """
+        self.store     = get_checkpoint_store(store)
+        self.reader_id = reader_id
+        self.pending   = None
+        self.staged    = False
+
+    def load(self, default = None):
+        return self.store.load(self.reader_id, default)
+
+    def stage(self, value):
+        self.pending, self.staged = value, True
+
+    def commit(self):
+        """
+        Commit the staged watermark, if any
+        :return:
+        """
+        if self.staged:
+            self.store.commit(self.reader_id, self.pending)
+            self.staged = False
+
+    def reset(self):
+        """
+        Drop the staged watermark and the committed checkpoint
+        :return:
+        """
+        self.staged = False
+        self.store.delete(self.reader_id)
@@ -0,0 +1,130 @@
+"""
+Driver backends used to open connections to SQL Server. Every backend takes the same JDBC URL and user credentials,
+and returns a DB-API 2.0 connection using '?' parameters, in autocommit mode, so the rest of the package works the
+same on any of them.
+"""
+
+
+def parse_jdbc_url(jdbc_url):
+    """
+    Split a SQL Server JDBC URL in its host, port and properties
+    eg. 'jdbc:sqlserver://host:1433;database=db;encrypt=true' -> ('host', 1433, {'database': 'db', 'encrypt': 'true'})
+    :param jdbc_url: JDBC URL for the DB
+    :return: tuple of (host, port, dict of properties, with lower case names)
+    """
+    prefix = "jdbc:sqlserver://"
+    assert jdbc_url.startswith(prefix), f"JDBC URL should start with {prefix}"
+    address, *properties = jdbc_url[len(prefix):].split(";")
+    host, _, port = address.partition(":")
+    parsed = {}
+    for prop in properties:
+        if "=" in prop:
+            name, _, value = prop.partition("=")
+            parsed[name.strip().lower()] = value.strip()
+    return host, int(port or 1433), parsed
+
+
+class JayDeBeApiBackend:
+    """
+    Connect through the Microsoft JDBC driver, running in a JVM through jaydebeapi
+    """
+    name = 'jaydebeapi'
+
+    def connect(self, jdbc_url, user_cred, **options):
+        """
+        :param jdbc_url: JDBC URL for the DB
+        :param user_cred: It is dict in format {'user': username, 'password': password}
+        :param options: jar_path, or jar_version 8 | 11 | 14 of the bundled driver
+        :return: connection object
+        """
+        import jaydebeapi
+        from common.sql_utilities import get_jar_path
+        return jaydebeapi.connect(
+            "com.microsoft.sqlserver.jdbc.SQLServerDriver",
+            jdbc_url,
+            user_cred,
+            options.get('jar_path') or get_jar_path(options.get('jar_version', 8))
+        )
+
+
+class PyodbcBackend:
+    """
+    Connect through the native Microsoft ODBC driver using pyodbc, without a JVM. Batch inserts use
+    fast_executemany, which sends all the rows of an executemany() call in one round trip.
+    """
+    name = 'pyodbc'
+
+    def __init__(self, odbc_driver = "ODBC Driver 18 for SQL Server"):
+        self.odbc_driver = odbc_driver
+
+    def connection_string(self, jdbc_url, user_cred):
+        """
+        Build the ODBC connection string equivalent to the JDBC URL
+        :param jdbc_url: JDBC URL for the DB
+        :param user_cred: It is dict in format {'user': username, 'password': password}
+        :return: String
+        """
+        host, port, properties = parse_jdbc_url(jdbc_url)
+        yes_no   = {'true': 'yes', 'false': 'no'}
+        password = user_cred['password'].replace('}', '}}')
+        conn_str = f"DRIVER={{{self.odbc_driver}}};SERVER=tcp:{host},{port};" \
+                   f"UID={user_cred['user']};PWD={{{password}}};"
+        if properties.get('database'):
+            conn_str += f"DATABASE={properties['database']};"
+        if properties.get('encrypt'):
+            conn_str += f"Encrypt={yes_no.get(properties['encrypt'].lower(), properties['encrypt'])};"
+        if properties.get('trustservercertificate'):
+            conn_str += f"TrustServerCertificate=" \
+                        f"{yes_no.get(properties['trustservercertificate'].lower(), 'no')};"
+        if properties.get('hostnameincertificate'):
+            conn_str += f"HostNameInCertificate={properties['hostnameincertificate']};"
+        if properties.get('logintimeout'):
+            conn_str += f"Connection Timeout={properties['logintimeout']};"
+        return conn_str
+
+    def connect(self, jdbc_url, user_cred, **options):
+        """
+        :param jdbc_url: JDBC URL for the DB
+        :param user_cred: It is dict in format {'user': username, 'password': password}
+        :param options: odbc_driver, name of the installed ODBC driver
+        :return: connection object
+        """
+        try:
+            import pyodbc
+        except ImportError:
+            raise ImportError("pyodbc not present, install it first using pip install pyodbc")
+        if options.get('odbc_driver'):
+            self.odbc_driver = options['odbc_driver']
+        return pyodbc.connect(self.connection_string(jdbc_url, user_cred), autocommit=True)
+
+
+BACKENDS = {
+    JayDeBeApiBackend.name: JayDeBeApiBackend,
+    PyodbcBackend.name    : PyodbcBackend,
+}
+
+
+def get_backend(backend = None):
+    """
+    Returns the backend object
+    :param backend: name of the backend, 'jaydebeapi' (default) or 'pyodbc', or a backend object
+    :return: backend object
+    """
+    if backend is None:
+        backend = JayDeBeApiBackend.name
+    if isinstance(backend, str):
+        assert backend in BACKENDS, f"Backend should be one of {list(BACKENDS)}"
+        return BACKENDS[backend]()
+    assert hasattr(backend, 'connect'), "Backend object should have a connect(jdbc_url, user_cred) method"
+    return backend
+
+
+def backend_name(backend = None):
+    """
+    Name of the backend, used to keep pools of different backends apart
+    :param backend: name of the backend or a backend object
+    :return: String
+    """
+    if backend is None or isinstance(backend, str):
+        return backend or JayDeBeApiBackend.name
+    return getattr(backend, 'name', type(backend).__name__)
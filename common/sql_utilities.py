@@ -1,5 +1,5 @@
-import jaydebeapi
 from package_utils import ROOT_DIR
+from common.sql_backends import get_backend
 
 
 def create_jdbc_url(host_name, database_name, username = None, password = None ):
@@ -23,21 +23,25 @@ def check_connection(jdbc_url, user_cred, **options):
     Check the connection to your DB
     :param jdbc_url: JDBC URL for the DB
     :param user_cred: It is dict in format {'user': username, 'password': password}
+    :param options:
+            probe : 'ping' (default) runs a 'SELECT 1' on the new connection, 'ddl' creates, fills and drops a
+                    temp table CUSTOMER_Test_Python to check write access as well
+            skip_table_creation : do not run any probe
     :return: Boolean
     """
     assert user_cred.get('user') and user_cred.get('password'), "Please provide a username and password"
 
     try:
         print("Trying to connect...")
-        conn = jaydebeapi.connect(
-            "com.microsoft.sqlserver.jdbc.SQLServerDriver",
-            jdbc_url,
-            user_cred,
-            options.get('jar_path') or get_jar_path(options.get('jar_version', 8))
-        )
+        conn = open_connection(jdbc_url, user_cred, **options)
         curs = conn.cursor()
+        probe = None if options.get('skip_table_creation') else options.get('probe', 'ping')
+        assert probe in [None, 'ping', 'ddl'], "probe should be 'ping' or 'ddl'"
 
-        if not options.get('skip_table_creation'):
+        if probe == 'ping':
+            curs.execute("SELECT 1")
+            curs.fetchall()
+        elif probe == 'ddl':
             print("Trying to create a temp table...")
             curs.execute("IF OBJECT_ID('dbo.CUSTOMER_Test_Python', 'U') IS NOT NULL "
                          "DROP TABLE dbo.CUSTOMER_Test_Python; ")
@@ -59,6 +63,56 @@ def check_connection(jdbc_url, user_cred, **options):
         raise Exception(err.args[0])
 
 
+def open_connection(jdbc_url, user_cred, **options):
+    """
+    Open a new connection to your DB, without any checks
+    :param jdbc_url: JDBC URL for the DB
+    :param user_cred: It is dict in format {'user': username, 'password': password}
+    :param options:
+            backend : 'jaydebeapi' (default) or 'pyodbc', see common.sql_backends
+    :return: connection object
+    """
+    return get_backend(options.get('backend')).connect(jdbc_url, user_cred, **options)
+
+
+def ping_connection(conn):
+    """
+    Check if the connection is still usable by running a 'SELECT 1' on it
+    :param conn: connection object
+    :return: Boolean
+    """
+    curs = None
+    try:
+        curs = conn.cursor()
+        curs.execute("SELECT 1")
+        curs.fetchall()
+        return True
+    except Exception:
+        return False
+    finally:
+        try:
+            if curs is not None:
+                curs.close()
+        except Exception:
+            pass
+
+
+def set_autocommit(conn, autocommit):
+    """
+    Turn the autocommit mode of the connection on or off
+    :param conn: connection object
+    :param autocommit: Boolean
+    :return: previous autocommit mode
+    """
+    if hasattr(conn, 'jconn'):
+        previous = bool(conn.jconn.getAutoCommit())
+        conn.jconn.setAutoCommit(autocommit)
+    else:
+        previous = bool(conn.autocommit)
+        conn.autocommit = autocommit
+    return previous
+
+
 def get_jar_path(version=8):
     """
     Returns the path of the jar file by taking the version number according to the user
@@ -0,0 +1,87 @@
+import sys
+import types
+
+import pytest
+
+
+class CosmosHttpResponseError(Exception):
+    def __init__(self, status_code = None, message = None, headers = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers     = headers or {}
+
+
+class CosmosBatchOperationError(CosmosHttpResponseError):
+    pass
+
+
+class PartitionKey:
+    def __init__(self, path):
+        self.path = path
+
+
+class FakeDatabase:
+    def __init__(self, containers):
+        self.containers = containers
+
+    def create_container_if_not_exists(self, id, partition_key, **options):
+        return self.containers[id]
+
+
+class FakeCosmosClient:
+    """
+    CosmosClient of the fake SDK, its containers are the ones the tests register in cosmos_sdk.containers
+    """
+    containers = {}
+
+    def __init__(self, url, credential = None, **options):
+        self.url = url
+
+    def create_database_if_not_exists(self, id, **options):
+        return FakeDatabase(self.containers)
+
+
+class FakeAsyncDatabase(FakeDatabase):
+    async def create_container_if_not_exists(self, id, partition_key, **options):
+        return self.containers[id]
+
+
+class FakeAsyncCosmosClient(FakeCosmosClient):
+    async def create_database_if_not_exists(self, id, **options):
+        return FakeAsyncDatabase(self.containers)
+
+    async def close(self):
+        pass
+
+
+def fake_cosmos_modules():
+    azure            = types.ModuleType('azure')
+    azure.__path__   = []
+    cosmos           = types.ModuleType('azure.cosmos')
+    cosmos.__path__  = []
+    exceptions       = types.ModuleType('azure.cosmos.exceptions')
+    aio              = types.ModuleType('azure.cosmos.aio')
+    cosmos.CosmosClient, cosmos.PartitionKey, cosmos.exceptions = FakeCosmosClient, PartitionKey, exceptions
+    exceptions.CosmosHttpResponseError   = CosmosHttpResponseError
+    exceptions.CosmosBatchOperationError = CosmosBatchOperationError
+    aio.CosmosClient                     = FakeAsyncCosmosClient
+    return {'azure': azure, 'azure.cosmos': cosmos, 'azure.cosmos.exceptions': exceptions, 'azure.cosmos.aio': aio}
+
+
+FAKE_COSMOS_MODULES = fake_cosmos_modules()
+
+
+@pytest.fixture
+def cosmos_sdk(monkeypatch):
+    """
+    Replace azure-cosmos by a fake SDK for the duration of the test, register the containers of the test in
+    cosmos_sdk.containers by their name
+    """
+    for name, module in FAKE_COSMOS_MODULES.items():
+        if name == 'azure' and 'azure' in sys.modules:
+            continue
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.setattr(FakeCosmosClient, 'containers', {})
+    return types.SimpleNamespace(containers=FakeCosmosClient.containers,
+                                 CosmosHttpResponseError=CosmosHttpResponseError,
+                                 CosmosBatchOperationError=CosmosBatchOperationError)
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from common.checkpoint_store import CheckpointStore
+
+
+class FakeAsyncPages:
+    def __init__(self, documents):
+        self.documents, self.continuation_token = documents, None
+
+    async def __aiter__(self):
+        yield self._page(self.documents)
+
+    @staticmethod
+    async def _page(documents):
+        for document in documents:
+            yield document
+
+
+class FakeAsyncPaged:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def by_page(self, continuation_token = None):
+        return FakeAsyncPages(self.documents)
+
+
+class FakeAsyncContainer:
+    """
+    azure.cosmos.aio container, the first 'throttle' requests are throttled and documents whose id is in 'too_large'
+    are rejected, alone or in a batch
+    """
+    def __init__(self, sdk, documents = (), throttle = 0, too_large = ()):
+        self.sdk, self.documents, self.throttle, self.too_large = sdk, list(documents), throttle, set(too_large)
+        self.items, self.requests, self.queries = {}, [], []
+
+    async def read(self):
+        raise AssertionError("the partition key path should not be read from the container")
+
+    def query_items(self, query, max_item_count = None, **options):
+        self.queries.append(query)
+        return FakeAsyncPaged(self.documents)
+
+    def _check(self, request, documents):
+        self.requests.append((request, [document['id'] for document in documents]))
+        if self.throttle:
+            self.throttle -= 1
+            raise self.sdk.CosmosHttpResponseError(429, "throttled", {'x-ms-retry-after-ms': '250',
+                                                                      'x-ms-request-charge': '0.5'})
+        if any(document['id'] in self.too_large for document in documents):
+            error = self.sdk.CosmosBatchOperationError if request == 'batch' else self.sdk.CosmosHttpResponseError
+            raise error(413, "request entity too large", {'x-ms-request-charge': '1'})
+
+    async def upsert_item(self, document, response_hook = None):
+        self._check('upsert', [document])
+        self.items[document['id']] = document
+        response_hook({'x-ms-request-charge': '2'}, document)
+        return document
+
+    async def execute_item_batch(self, batch_operations, partition_key, response_hook = None):
+        documents = [args[0] for _, args in batch_operations]
+        self._check('batch', documents)
+        self.items.update((document['id'], document) for document in documents)
+        response_hook({'x-ms-request-charge': str(3 * len(documents))}, None)
+        return [{'statusCode': 200} for _ in documents]
+
+
+class RecordingStore(CheckpointStore):
+    def __init__(self, value = None):
+        self.value, self.load_threads, self.commits = value, [], []
+
+    def load(self, reader_id, default = None):
+        self.load_threads.append(threading.get_ident())
+        return default if self.value is None else self.value
+
+    def commit(self, reader_id, value):
+        self.commits.append(value)
+
+    def delete(self, reader_id):
+        self.value = None
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+
+    async def _sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(asyncio, 'sleep', _sleep)
+    return sleeps
+
+
+def bulk_writer(container, **options):
+    from azure_utilities.azure_nosql.cosmosdb.bulk_upsert import AsyncCosmosBulkWriter
+    return AsyncCosmosBulkWriter(container, '/city', **options)
+
+
+def test_async_writer_retries_throttled_requests_after_the_time_asked(cosmos_sdk, sleeps):
+    container = FakeAsyncContainer(cosmos_sdk, throttle=2)
+    summary   = asyncio.run(bulk_writer(container).upsert([{'id': '1', 'city': 'Pune'}]))
+    assert sleeps == [0.25, 0.25]
+    assert summary['results'][0]['attempts'] == 3
+    assert summary['request_charge'] == 0.5 + 0.5 + 2
+
+
+def test_async_writer_falls_back_to_single_upserts(cosmos_sdk, sleeps):
+    container = FakeAsyncContainer(cosmos_sdk, too_large={'2'})
+    documents = [{'id': str(index), 'city': 'Pune'} for index in range(3)]
+    summary   = asyncio.run(bulk_writer(container, raise_on_failure=False).upsert(documents))
+    assert [request for request, _ in container.requests] == ['batch', 'upsert', 'upsert', 'upsert']
+    assert [result['index'] for result in summary['results']] == [0, 1, 2]
+    assert [result['status_code'] for result in summary['results']] == [200, 200, 413]
+    assert (summary['succeeded'], summary['failed']) == (2, 1)
+    assert sorted(container.items) == ['0', '1']
+
+
+def test_async_get_loads_the_checkpoint_off_the_event_loop(cosmos_sdk):
+    from azure_utilities.azure_nosql.cosmosdb.async_get_cosmos_data import AsyncGetCosmosData
+    container = FakeAsyncContainer(cosmos_sdk, documents=[{'id': '1', '_ts': 20}])
+    cosmos_sdk.containers['orders'] = container
+    store    = RecordingStore(value=10)
+    get_data = AsyncGetCosmosData("https://account", "key", container_name="orders", checkpoint_store=store)
+    assert store.load_threads == []
+
+    data = asyncio.run(get_data.return_differential_data())
+    assert store.load_threads and store.load_threads[0] != threading.get_ident()
+    assert container.queries[0].startswith("select * from orders where orders._ts > 10")
+    assert list(data['_ts']) == [20]
+    asyncio.run(get_data.return_differential_data())
+    assert len(store.load_threads) == 1
+    assert store.commits == [20]
+
+
+def test_async_send_uses_the_configured_partition_key_path(cosmos_sdk, sleeps):
+    from azure_utilities.azure_nosql.cosmosdb.async_send_cosmos_data import AsyncSendCosmosData
+    container = FakeAsyncContainer(cosmos_sdk)
+    cosmos_sdk.containers['orders'] = container
+    send_data = AsyncSendCosmosData("https://account", "key", container_name="orders", partition_key_path="city")
+    summary   = asyncio.run(send_data.commit_batch_data([{'id': '1', 'city': 'Pune'}, {'id': '2', 'city': 'Pune'}]))
+    assert asyncio.run(send_data.partition_key_path()) == '/city'
+    # both documents share the partition key, so they went in one batch
+    assert container.requests == [('batch', ['1', '2'])]
+    assert summary['succeeded'] == 2
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from azure_utilities.azure_sql.bulk_copy import BulkCopy, parse_sql_datatype
+
+
+class FakeJDBCConnection:
+    jconn = object()
+
+
+def bulk_copy(**options):
+    schema = [{'col_name': 'cust_id', 'datatype': 'int'}, {'col_name': 'amount', 'datatype': 'decimal(10, 2)'},
+              {'col_name': 'name', 'datatype': 'varchar(30)'}]
+    return BulkCopy(FakeJDBCConnection(), "customer", schema, **options)
+
+
+def test_parse_sql_datatype():
+    assert parse_sql_datatype('VARCHAR(50)') == ('varchar', 50, 0)
+    assert parse_sql_datatype('nvarchar(max)') == ('nvarchar', 4000, 0)
+    assert parse_sql_datatype('decimal(10, 2)') == ('decimal', 10, 2)
+    assert parse_sql_datatype('int') == ('int', 0, 0)
+
+
+def test_int_columns_with_nan_are_written_as_integers(tmp_path):
+    path = tmp_path / "spool.csv"
+    data = pd.DataFrame({'cust_id': [1, None, 3], 'amount': [1.5, 2.0, None], 'name': ['a', 'b', None]})
+    assert data['cust_id'].dtype.kind == 'f'
+    bulk_copy(chunk_size=2).write_csv(data, str(path))
+    assert path.read_text().splitlines() == ["1,1.5,a", ",2.0,b", "3,,"]
@@ -0,0 +1,143 @@
+import threading
+
+import pytest
+
+from azure_utilities.azure_nosql.cosmosdb import bulk_upsert
+from azure_utilities.azure_nosql.cosmosdb.bulk_upsert import CosmosBulkWriter, get_partition_key, retry_after_seconds
+
+
+class FakeContainer:
+    """
+    Container whose first 'throttle' requests are throttled and which rejects documents whose id is in 'too_large',
+    alone or in a batch
+    """
+    def __init__(self, sdk, throttle = 0, too_large = (), retry_after_ms = '250', partition_key_path = '/city'):
+        self.sdk, self.throttle, self.too_large = sdk, throttle, set(too_large)
+        self.retry_after_ms, self.partition_key_path = retry_after_ms, partition_key_path
+        self.items, self.requests, self.reads = {}, [], 0
+        self._lock = threading.Lock()
+
+    def read(self):
+        self.reads += 1
+        return {'partitionKey': {'paths': [self.partition_key_path]}}
+
+    def _check(self, request, documents):
+        with self._lock:
+            self.requests.append((request, [document['id'] for document in documents]))
+            throttled = self.throttle > 0
+            self.throttle -= throttled
+        if throttled:
+            headers = {'x-ms-request-charge': '0.5'}
+            if self.retry_after_ms:
+                headers['x-ms-retry-after-ms'] = self.retry_after_ms
+            raise self.sdk.CosmosHttpResponseError(429, "throttled", headers)
+        if any(document['id'] in self.too_large for document in documents):
+            error = self.sdk.CosmosBatchOperationError if request == 'batch' else self.sdk.CosmosHttpResponseError
+            raise error(413, "request entity too large", {'x-ms-request-charge': '1'})
+
+    def upsert_item(self, document, response_hook = None):
+        self._check('upsert', [document])
+        self.items[document['id']] = document
+        response_hook({'x-ms-request-charge': '2'}, document)
+        return document
+
+    def execute_item_batch(self, batch_operations, partition_key, response_hook = None):
+        documents = [args[0] for _, args in batch_operations]
+        self._check('batch', documents)
+        self.items.update((document['id'], document) for document in documents)
+        response_hook({'x-ms-request-charge': str(3 * len(documents))}, None)
+        return [{'statusCode': 200} for _ in documents]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(bulk_upsert.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_get_partition_key():
+    assert get_partition_key({'address': {'city': 'Pune'}}, '/address/city') == 'Pune'
+    assert get_partition_key({'address': 'Pune'}, '/address/city') is None
+    assert get_partition_key({'name': 'sajal'}, 'name') == 'sajal'
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(type('Err', (), {'headers': {'x-ms-retry-after-ms': '1500'}})(), 1) == 1.5
+    assert retry_after_seconds(type('Err', (), {'headers': {'Retry-After': '2'}})(), 1) == 2.0
+    assert retry_after_seconds(Exception(), 4) == 4
+
+
+def test_throttled_requests_are_retried_after_the_time_asked(cosmos_sdk, sleeps):
+    container = FakeContainer(cosmos_sdk, throttle=2)
+    summary   = CosmosBulkWriter(container, '/city').upsert([{'id': '1', 'city': 'Pune'}])
+    assert sleeps == [0.25, 0.25]
+    assert summary['results'][0]['attempts'] == 3
+    assert summary['request_charge'] == 0.5 + 0.5 + 2
+
+
+def test_throttled_requests_back_off_exponentially_without_retry_after(cosmos_sdk, sleeps):
+    container = FakeContainer(cosmos_sdk, throttle=3, retry_after_ms=None)
+    CosmosBulkWriter(container, '/city', retry_backoff=1, max_retry_backoff=3).upsert([{'id': '1', 'city': 'Pune'}])
+    assert sleeps == [1, 2, 3]
+
+
+def test_requests_throttled_after_all_retries_fail(cosmos_sdk, sleeps):
+    container = FakeContainer(cosmos_sdk, throttle=10)
+    documents = [{'id': '1', 'city': 'Pune'}, {'id': '2', 'city': 'Pune'}]
+    with pytest.raises(Exception, match="2 documents failed after 2 retries"):
+        CosmosBulkWriter(container, '/city', max_retries=2).upsert(documents)
+
+    container = FakeContainer(cosmos_sdk, throttle=10)
+    summary   = CosmosBulkWriter(container, '/city', max_retries=2, raise_on_failure=False).upsert(documents)
+    assert [result['status_code'] for result in summary['results']] == [429, 429]
+    # the charge of the three throttled attempts of the batch is shared by its documents
+    assert [result['request_charge'] for result in summary['results']] == [0.75, 0.75]
+    assert summary['request_charge'] == 1.5
+
+
+def test_failed_batch_falls_back_to_single_upserts(cosmos_sdk, sleeps):
+    container = FakeContainer(cosmos_sdk, too_large={'2'})
+    documents = [{'id': str(index), 'city': 'Pune'} for index in range(3)]
+    summary   = CosmosBulkWriter(container, '/city', raise_on_failure=False).upsert(documents)
+    assert [request for request, _ in container.requests] == ['batch', 'upsert', 'upsert', 'upsert']
+    assert [result['status_code'] for result in summary['results']] == [200, 200, 413]
+    assert (summary['succeeded'], summary['failed']) == (2, 1)
+    assert sorted(container.items) == ['0', '1']
+
+
+def test_results_follow_the_order_of_the_documents(cosmos_sdk, sleeps):
+    container = FakeContainer(cosmos_sdk)
+    cities    = ['Pune', 'Delhi', 'Pune', 'Goa', 'Delhi', 'Pune']
+    documents = [{'id': str(index), 'city': city} for index, city in enumerate(cities)]
+    summary   = CosmosBulkWriter(container, '/city', workers=4, batch_size=2).upsert(documents)
+    assert [result['index'] for result in summary['results']] == list(range(6))
+    assert [result['id'] for result in summary['results']] == [document['id'] for document in documents]
+    # Pune: batches of 2 and 1, Delhi: a batch of 2, Goa: a single upsert
+    assert sorted(container.requests) == sorted([('batch', ['0', '2']), ('batch', ['5']), ('batch', ['1', '4']),
+                                                 ('upsert', ['3'])])
+    # 3 RUs per document in a batch, 2 per single upsert
+    assert [result['request_charge'] for result in summary['results']] == [3, 3, 3, 2, 3, 3]
+    assert summary['request_charge'] == 17
+    assert summary['documents'] == summary['succeeded'] == 6
+
+
+def test_send_data_reads_the_partition_key_path_once(cosmos_sdk, sleeps):
+    from azure_utilities.azure_nosql.cosmosdb.send_cosmos_data import SendCosmosData
+    container = FakeContainer(cosmos_sdk)
+    cosmos_sdk.containers['orders'] = container
+    send_data = SendCosmosData("https://account", "key", container_name="orders")
+    send_data.commit_batch_data({'id': '1', 'city': 'Pune'})
+    send_data.commit_batch_data({'id': '2', 'city': 'Goa'})
+    assert container.reads == 1
+    assert send_data.partition_key_path() == '/city'
+
+
+def test_send_data_uses_the_configured_partition_key_path(cosmos_sdk, sleeps):
+    from azure_utilities.azure_nosql.cosmosdb.send_cosmos_data import SendCosmosData
+    container = FakeContainer(cosmos_sdk)
+    cosmos_sdk.containers['orders'] = container
+    send_data = SendCosmosData("https://account", "key", container_name="orders", partition_key_path="city")
+    send_data.commit_batch_data({'id': '1', 'city': 'Pune'})
+    assert container.reads == 0
+    assert send_data.partition_key_path() == '/city'
@@ -0,0 +1,138 @@
+import datetime
+import json
+
+from azure_utilities.azure_nosql.cosmosdb.change_feed_reader import CosmosChangeFeedReader
+
+
+class FakeFeed:
+    def __init__(self, documents, offset, max_item_count, response_hook, name):
+        self.documents, self.offset, self.max_item_count = documents, offset, max_item_count
+        self.response_hook, self.name                    = response_hook, name
+
+    def by_page(self):
+        while self.offset < len(self.documents):
+            page         = self.documents[self.offset: self.offset + self.max_item_count]
+            self.offset += len(page)
+            self.response_hook({'etag': f"{self.name}:{self.offset}"}, page)
+            yield iter(page)
+
+
+class FakeContainer:
+    """
+    Change feed of a container whose ranges hold the given documents, the token of a range is '<range>:<offset>'
+    """
+    def __init__(self, ranges, public_api = True):
+        self.ranges, self.calls = ranges, []
+        if public_api:
+            self.read_feed_ranges = lambda: [{'Range': {'min': name, 'max': name + 'FF'}} for name in self.ranges]
+        else:
+            self.client_connection = self
+            self.container_link    = "dbs/db/colls/container"
+
+    def _ReadPartitionKeyRanges(self, container_link):
+        return [{'id': name} for name in self.ranges]
+
+    def query_items_change_feed(self, max_item_count = None, response_hook = None, **options):
+        self.calls.append(options)
+        if 'continuation' in options:
+            name, offset = options['continuation'].split(':')
+            offset       = int(offset)
+        else:
+            name   = options['feed_range']['Range']['min'] if 'feed_range' in options \
+                else options['partition_key_range_id']
+            offset = 0
+            if not options.get('is_start_from_beginning'):
+                start  = options['start_time'].timestamp()
+                offset = len([document for document in self.ranges[name] if document['_ts'] <= start])
+        # the SDK calls the hook on creation with the last headers of the shared connection
+        response_hook({'etag': "another-range:99"}, None)
+        return FakeFeed(self.ranges[name], offset, max_item_count, response_hook, name)
+
+
+class FakeCheckpoint:
+    def __init__(self, state = None):
+        self.state, self.staged, self.commits = state, None, 0
+
+    def load(self, default = None):
+        return self.state if self.state is not None else default
+
+    def stage(self, state):
+        self.staged = state
+
+    def commit(self):
+        self.commits += 1
+        if self.staged is not None:
+            self.state = self.staged
+
+
+def documents(name, *timestamps):
+    return [{'id': f"{name}-{ts}", '_ts': ts} for ts in timestamps]
+
+
+def test_feed_ranges_are_read_from_their_continuation():
+    container = FakeContainer({'A': documents('A', 1, 3), 'B': documents('B', 2)})
+    reader    = CosmosChangeFeedReader(container, start_from_beginning=True, max_item_count=10)
+    assert [document['_ts'] for document in reader.read_changes()] == [1, 2, 3]
+    assert all('feed_range' in call and call['is_start_from_beginning'] for call in container.calls)
+    # the creation time call of the hook is ignored
+    assert sorted(reader.tokens.values()) == ['A:2', 'B:1']
+
+    container.ranges['A'].extend(documents('A', 4))
+    container.calls.clear()
+    assert [document['id'] for document in reader.read_changes()] == ['A-4']
+    assert sorted(call['continuation'] for call in container.calls) == ['A:2', 'B:1']
+    assert all('feed_range' not in call for call in container.calls)
+
+
+def test_partition_key_range_ids_without_read_feed_ranges():
+    container = FakeContainer({'0': documents('0', 1, 2)}, public_api=False)
+    reader    = CosmosChangeFeedReader(container, start_from_beginning=True)
+    assert len(reader.read_changes()) == 2
+    container.ranges['0'].extend(documents('0', 3))
+    assert [document['_ts'] for document in reader.read_changes()] == [3]
+    assert container.calls[-1] == {'partition_key_range_id': '0', 'continuation': '0:2'}
+
+
+def test_pages_read_per_poll_are_capped():
+    container = FakeContainer({'A': documents('A', 1, 2, 3, 4, 5)})
+    reader    = CosmosChangeFeedReader(container, start_from_beginning=True, max_item_count=2, max_pages_per_poll=2)
+    assert [document['_ts'] for document in reader.read_changes()] == [1, 2, 3, 4]
+    assert [document['_ts'] for document in reader.read_changes()] == [5]
+    assert reader.read_changes() == []
+
+
+def test_ranges_after_a_split_are_read_from_the_last_ts():
+    container = FakeContainer({'A': documents('A', 1, 2)})
+    reader    = CosmosChangeFeedReader(container, start_from_beginning=True)
+    reader.read_changes()
+    assert reader.last_ts == 2
+
+    container.ranges = {'A1': documents('A1', 1, 3), 'A2': documents('A2', 2, 4)}
+    container.calls.clear()
+    assert [document['_ts'] for document in reader.read_changes()] == [3, 4]
+    start_time = datetime.datetime.fromtimestamp(2, tz=datetime.timezone.utc)
+    assert all(call['start_time'] == start_time for call in container.calls)
+    # the token of the range gone after the split is dropped
+    assert sorted(reader.tokens.values()) == ['A1:2', 'A2:2']
+
+
+def test_split_of_a_capped_range_does_not_skip_its_unread_pages():
+    container = FakeContainer({'A': documents('A', 1, 2, 3), 'B': documents('B', 10)})
+    reader    = CosmosChangeFeedReader(container, start_from_beginning=True, max_item_count=1, max_pages_per_poll=1)
+    reader.read_changes()
+    assert reader.last_ts == 1
+
+    container.ranges = {'A1': documents('A1', 2), 'A2': documents('A2', 3), 'B': container.ranges['B']}
+    assert [document['_ts'] for document in reader.read_changes()] == [2, 3]
+
+
+def test_tokens_are_staged_and_committed_on_the_next_poll():
+    container  = FakeContainer({'A': documents('A', 1)})
+    range_id   = json.dumps({'Range': {'min': 'A', 'max': 'AFF'}}, sort_keys=True)
+    checkpoint = FakeCheckpoint({'tokens': {range_id: 'A:0'}, 'last_ts': None})
+    reader     = CosmosChangeFeedReader(container, checkpoint=checkpoint)
+    assert [document['_ts'] for document in reader.read_changes()] == [1]
+    assert checkpoint.staged == {'tokens': {range_id: 'A:1'}, 'last_ts': 1}
+    assert checkpoint.state['tokens'] == {range_id: 'A:0'}
+    reader.read_changes()
+    assert checkpoint.state['tokens'] == {range_id: 'A:1'}
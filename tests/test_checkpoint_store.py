@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+
+from common.checkpoint_store import Checkpoint, CheckpointStore, FileCheckpointStore, SQLiteCheckpointStore, \
+    decode_value, encode_value, get_checkpoint_store
+
+
+@pytest.fixture(params=['checkpoints.json', 'checkpoints.db'])
+def store(request, tmp_path):
+    return get_checkpoint_store(str(tmp_path / request.param))
+
+
+def test_checkpoint_store_is_an_abstract_interface():
+    with pytest.raises(TypeError):
+        CheckpointStore()
+
+    class LoadOnly(CheckpointStore):
+        def load(self, reader_id, default = None):
+            return default
+
+    with pytest.raises(TypeError):
+        LoadOnly()
+
+
+def test_get_checkpoint_store(tmp_path):
+    assert isinstance(get_checkpoint_store(str(tmp_path / "c.json")), FileCheckpointStore)
+    assert isinstance(get_checkpoint_store(tmp_path / "c.sqlite3"), SQLiteCheckpointStore)
+    assert get_checkpoint_store(None) is None
+
+
+def test_values_keep_their_type():
+    value = [datetime.datetime(2021, 1, 1, 10, 0, 0, 123456), 42, 'a']
+    assert decode_value(encode_value(value)) == value
+
+
+def test_store_commits_loads_and_deletes(store):
+    assert store.load('reader', 'initial') == 'initial'
+    store.commit('reader', datetime.datetime(2021, 1, 1, 10))
+    store.commit('other', 1)
+    assert store.load('reader') == datetime.datetime(2021, 1, 1, 10)
+    store.delete('reader')
+    assert store.load('reader') is None
+    assert store.load('other') == 1
+
+
+def test_staged_watermark_is_committed_when_the_batch_is_processed(store):
+    checkpoint = Checkpoint(store, 'reader')
+    checkpoint.stage(10)
+    assert checkpoint.load() is None
+    checkpoint.commit()
+    assert Checkpoint(store, 'reader').load() == 10
+    checkpoint.commit()
+    checkpoint.reset()
+    assert checkpoint.load() is None
@@ -0,0 +1,60 @@
+import pytest
+
+from azure_utilities.azure_sql import connection as connection_module
+from azure_utilities.azure_sql import connection_pool
+from azure_utilities.azure_sql.common_utils import SQLCredentials
+from azure_utilities.azure_sql.connection import Connection
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def execute(self, query, params = None):
+        pass
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def credentials():
+    return SQLCredentials(server_name="server", database_name="db", db_username="user", db_password="password")
+
+
+@pytest.fixture(autouse=True)
+def close_pools():
+    yield
+    connection_pool.close_all_pools()
+
+
+def test_odbc_driver_reaches_check_connection(credentials, monkeypatch):
+    calls = []
+    monkeypatch.setattr(connection_module, 'check_connection',
+                        lambda **options: calls.append(options) or (FakeConnection(), FakeCursor()))
+    connection = Connection(credentials, backend='pyodbc', odbc_driver='ODBC Driver 17 for SQL Server',
+                            use_schema_cache=False)
+    connection.check_connection()
+    assert calls[0]['backend'] == 'pyodbc'
+    assert calls[0]['odbc_driver'] == 'ODBC Driver 17 for SQL Server'
+
+
+def test_odbc_driver_reaches_pool_and_keeps_pools_apart(credentials, monkeypatch):
+    calls = []
+    monkeypatch.setattr(connection_pool, 'open_connection',
+                        lambda jdbc_url, user_cred, **options: calls.append(options) or FakeConnection())
+    driver_17 = Connection(credentials, backend='pyodbc', odbc_driver='ODBC Driver 17 for SQL Server',
+                           use_schema_cache=False).get_pool()
+    driver_18 = Connection(credentials, backend='pyodbc', odbc_driver='ODBC Driver 18 for SQL Server',
+                           use_schema_cache=False).get_pool()
+    assert driver_17 is not driver_18
+    assert [options['odbc_driver'] for options in calls] == ['ODBC Driver 17 for SQL Server',
+                                                            'ODBC Driver 18 for SQL Server']
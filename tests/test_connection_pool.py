@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+from azure_utilities.azure_sql import connection_pool
+from azure_utilities.azure_sql.connection_pool import ConnectionPool, get_connection_pool
+
+USER_CRED = {'user': 'user', 'password': 'password'}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params = None):
+        if not self.conn.alive:
+            raise ConnectionError("connection is broken")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number, self.alive, self.closed = number, True, False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self):
+        self.opened = []
+
+    def connect(self, jdbc_url, user_cred, **options):
+        self.opened.append(FakeConnection(len(self.opened)))
+        return self.opened[-1]
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture(autouse=True)
+def close_pools():
+    yield
+    connection_pool.close_all_pools()
+
+
+def pool(backend, **options):
+    return ConnectionPool("jdbc:sqlserver://server", USER_CRED, backend=backend, **options)
+
+
+def test_min_size_connections_are_opened_and_reused(backend):
+    connections = pool(backend, min_size=2, max_size=4)
+    assert len(backend.opened) == 2
+    conn = connections.acquire()
+    connections.release(conn)
+    assert connections.acquire() is conn
+    assert connections.stats == {'opened': 2, 'closed': 0, 'checkouts': 2, 'failed_validations': 0}
+
+
+def test_acquire_times_out_when_every_connection_is_in_use(backend):
+    connections = pool(backend, min_size=0, max_size=1)
+    connections.acquire()
+    with pytest.raises(TimeoutError):
+        connections.acquire(timeout=0.05)
+
+
+def test_released_connection_wakes_up_a_waiting_acquire(backend):
+    connections = pool(backend, min_size=0, max_size=1)
+    conn        = connections.acquire()
+    acquired    = []
+    waiter      = threading.Thread(target=lambda: acquired.append(connections.acquire(timeout=5)))
+    waiter.start()
+    connections.release(conn)
+    waiter.join(5)
+    assert acquired == [conn]
+
+
+def test_broken_connection_is_replaced_on_checkout(backend):
+    connections = pool(backend, min_size=1, max_size=1)
+    backend.opened[0].alive = False
+    conn = connections.acquire()
+    assert conn is backend.opened[1]
+    assert backend.opened[0].closed
+    assert connections.stats['failed_validations'] == 1
+
+
+def test_idle_connections_are_evicted_down_to_min_size(backend):
+    connections = pool(backend, min_size=1, max_size=3, idle_timeout=0)
+    conns       = [connections.acquire() for _ in range(3)]
+    for conn in conns:
+        connections.release(conn)
+    assert connections.evict_idle() == 2
+    assert sum(conn.closed for conn in backend.opened) == 2
+
+
+def test_nested_checkouts_share_the_connection(backend):
+    connections = pool(backend, min_size=0, max_size=2)
+    with connections.checkout() as (conn, cursor):
+        with connections.checkout() as (inner_conn, inner_cursor):
+            assert (inner_conn, inner_cursor) == (conn, cursor)
+    assert connections.acquire() is conn
+
+
+def test_connection_broken_in_a_checkout_is_discarded(backend):
+    connections = pool(backend, min_size=0, max_size=2)
+    with pytest.raises(ConnectionError):
+        with connections.checkout() as (conn, cursor):
+            conn.alive = False
+            cursor.execute("select 1")
+    assert conn.closed
+    assert connections.acquire() is not conn
+
+
+def test_closed_pool_closes_released_connections(backend):
+    connections = pool(backend, min_size=1, max_size=2)
+    conn        = connections.acquire()
+    connections.close()
+    connections.release(conn)
+    assert conn.closed
+    with pytest.raises(AssertionError):
+        connections.acquire()
+
+
+def test_process_wide_pools_are_shared_per_key(backend):
+    first = get_connection_pool("jdbc:sqlserver://server", USER_CRED, backend=backend, min_size=0)
+    assert get_connection_pool("jdbc:sqlserver://server", USER_CRED, backend=backend) is first
+    assert get_connection_pool("jdbc:sqlserver://other", USER_CRED, backend=backend) is not first
+    first.close()
+    assert get_connection_pool("jdbc:sqlserver://server", USER_CRED, backend=backend) is not first
@@ -0,0 +1,94 @@
+import pytest
+
+
+class FakePages:
+    def __init__(self, documents, page_size, token):
+        self.documents, self.page_size, self.offset = documents, page_size, int(token or 0)
+        self.continuation_token = None
+
+    def __iter__(self):
+        while self.offset < len(self.documents):
+            page         = self.documents[self.offset: self.offset + self.page_size]
+            self.offset += len(page)
+            self.continuation_token = str(self.offset) if self.offset < len(self.documents) else None
+            yield iter(page)
+
+
+class FakePaged:
+    def __init__(self, documents, page_size):
+        self.documents, self.page_size = documents, page_size
+
+    def by_page(self, continuation_token = None):
+        return FakePages(self.documents, self.page_size, continuation_token)
+
+
+class FakeContainer:
+    """
+    Container whose partitions hold the given documents, ordered on _ts when the query is, like the server does
+    """
+    def __init__(self, partitions):
+        self.partitions, self.queries = partitions, []
+
+    def query_items(self, query, max_item_count = None, **options):
+        self.queries.append((query, options))
+        if 'partition_key' in options:
+            documents = list(self.partitions[options['partition_key']])
+        else:
+            documents = [document for documents in self.partitions.values() for document in documents]
+        if query.endswith("._ts"):
+            documents.sort(key=lambda document: document.get('_ts', 0))
+        return FakePaged(documents, max_item_count)
+
+
+@pytest.fixture
+def get_data(cosmos_sdk):
+    from azure_utilities.azure_nosql.cosmosdb.get_cosmos_data import GetCosmosData
+    cosmos_sdk.containers['orders'] = FakeContainer({
+        'device-1': [{'id': 'a', '_ts': 3}, {'id': 'b', '_ts': 1}, {'id': 'c', '_ts': 6}],
+        'device-2': [{'id': 'd', '_ts': 5}, {'id': 'e', '_ts': 2}],
+        'device-3': [{'id': 'f', '_ts': 4}],
+    })
+    return GetCosmosData("https://account", "key", container_name="orders", page_size=2)
+
+
+def container(get_data):
+    return get_data.create_db_instance.container_client
+
+
+def test_partitions_are_merged_in_ts_order(get_data):
+    data = get_data.query_partitions("select * from c", ['device-1', 'device-2', 'device-3'], workers=2)
+    assert [document['_ts'] for document in data] == [1, 2, 3, 4, 5, 6]
+    assert sorted(options['partition_key'] for _, options in container(get_data).queries) == \
+        ['device-1', 'device-2', 'device-3']
+    assert all(options['enable_cross_partition_query'] is False for _, options in container(get_data).queries)
+
+
+def test_partitions_are_concatenated_without_ts(get_data):
+    container(get_data).partitions = {'device-1': [{'id': 'a'}, {'id': 'b'}], 'device-2': [{'id': 'c'}]}
+    data = get_data.query_partitions("select c.id from c", ['device-1', 'device-2'])
+    assert [document['id'] for document in data] == ['a', 'b', 'c']
+
+
+def test_partitions_of_an_ordered_query_are_concatenated(get_data):
+    data = get_data.query_partitions("select * from c order by c.id", ['device-2', 'device-1'])
+    assert [document['id'] for document in data] == ['d', 'e', 'a', 'b', 'c']
+
+
+def test_single_partition_and_no_partition(get_data):
+    assert [document['id'] for document in get_data.query_partitions("select * from c", 'device-2')] == ['e', 'd']
+    assert get_data.query_partitions("select * from c", []) == []
+
+
+def test_partition_keys_given_while_initializing_route_every_query(get_data):
+    get_data.partition_keys = ['device-3']
+    assert [document['id'] for document in get_data.get_data_with_query("select * from c")] == ['f']
+    assert [document['id'] for document in get_data.get_data_with_query("select * from c", partition_key='device-2')] \
+        == ['e', 'd']
+
+
+def test_pages_resume_from_their_continuation_token(get_data):
+    pages = list(get_data.iterate_pages("select * from c", partition_key='device-1'))
+    assert [([document['id'] for document in page], token) for page, token in pages] == \
+        [(['b', 'a'], '2'), (['c'], None)]
+    resumed = list(get_data.iterate_pages("select * from c", continuation_token='2', partition_key='device-1'))
+    assert [[document['id'] for document in page] for page, _ in resumed] == [['c']]
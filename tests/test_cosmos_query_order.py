@@ -0,0 +1,48 @@
+import pytest
+
+
+@pytest.fixture
+def with_ts_order(cosmos_sdk):
+    from azure_utilities.azure_nosql.cosmosdb.get_cosmos_data import with_ts_order
+    return with_ts_order
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("select * from c where c.val > 2", "select * from c where c.val > 2 ORDER BY c._ts"),
+    ("SELECT * FROM orders o WHERE o.qty > 1;", "SELECT * FROM orders o WHERE o.qty > 1 ORDER BY o._ts"),
+    ("select * from orders as o", "select * from orders as o ORDER BY o._ts"),
+    ("select * from orders where orders._ts > 10", "select * from orders where orders._ts > 10 ORDER BY orders._ts"),
+    ("select * from c join t in c.tags", "select * from c join t in c.tags ORDER BY c._ts"),
+])
+def test_queries_are_ordered_on_ts(with_ts_order, query, expected):
+    assert with_ts_order(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "select * from c order by c.name",
+    "select c.city, count(1) as n from c group by c.city",
+    "select value count(1) from c",
+    "select distinct c.city from c",
+    "select max(c._ts) from c",
+    "select * from c offset 10 limit 10",
+    "SELECT TOP 10 * FROM c",
+    "select top 5 c.id from c where c.val > 2",
+    "select 1",
+])
+def test_queries_rejecting_an_order_are_left_alone(with_ts_order, query):
+    assert with_ts_order(query) == query
+
+
+def test_string_literals_are_not_read_as_sql(with_ts_order):
+    query = "select * from c where c.label = 'min (x)' or c.note = \"top 5, order by, group by\""
+    assert with_ts_order(query) == query + " ORDER BY c._ts"
+
+
+def test_comments_do_not_swallow_the_order(with_ts_order):
+    ordered = with_ts_order("select * from c -- every document\nwhere c.val > 2 -- recent ones")
+    assert ordered.endswith(" ORDER BY c._ts")
+    assert "--" not in ordered and "where c.val > 2" in ordered
+
+
+def test_commented_out_clauses_are_ignored(with_ts_order):
+    assert with_ts_order("select * from c -- order by c.name").endswith("ORDER BY c._ts")
@@ -0,0 +1,114 @@
+import pytest
+
+from azure_utilities.azure_sql import connection as connection_module
+from azure_utilities.azure_sql import health_check as health_check_module
+from azure_utilities.azure_sql.common_utils import SQLCredentials
+from azure_utilities.azure_sql.connection import Connection
+from azure_utilities.azure_sql.health_check import HealthCheck
+from azure_utilities.azure_sql.sql_send_data import SQLSendData
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn, self.queries = conn, []
+
+    def execute(self, query, params = None):
+        if not self.conn.alive:
+            raise ConnectionError("connection is broken")
+        self.queries.append(query)
+
+    def fetchall(self):
+        return [('CUST_ID', 'int')]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+class Server:
+    """
+    check_connection() of common.sql_utilities, failing the first 'failures' times
+    """
+    def __init__(self, failures = 0):
+        self.failures, self.connections = failures, []
+
+    def check_connection(self, **options):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("server unavailable")
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn, conn.cursor()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(health_check_module.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def connection(monkeypatch, server, **options):
+    monkeypatch.setattr(connection_module, 'check_connection', server.check_connection)
+    credentials = SQLCredentials(server_name="server", database_name="db", db_username="user", db_password="password")
+    return Connection(credentials, use_schema_cache=False, **options)
+
+
+def test_max_retries_should_be_at_least_one():
+    with pytest.raises(AssertionError):
+        HealthCheck(connection=None, max_retries=0)
+
+
+def test_alive_connection_is_trusted_within_the_liveness_window(monkeypatch):
+    server = Server()
+    conn   = connection(monkeypatch, server, liveness_window=30)
+    conn.check_connection()
+    assert conn.ensure_connection() == (conn.conn, conn.cursor)
+    assert conn.health_check.stats['pings'] == 0
+    conn.conn.alive = False
+    assert conn.health_check.is_alive() is True
+    assert conn.health_check.is_alive(force=True) is False
+
+
+def test_dead_connection_is_replaced_with_backoff(monkeypatch, sleeps):
+    server = Server()
+    conn   = connection(monkeypatch, server, liveness_window=0, reconnect_backoff_base=1)
+    conn.check_connection()
+    server.connections[0].alive, server.failures = False, 2
+    new_conn, new_cursor = conn.ensure_connection()
+    assert new_conn is server.connections[1]
+    assert len(sleeps) == 2 and 0.5 <= sleeps[0] <= 1 and 1 <= sleeps[1] <= 2
+    assert conn.health_check.stats == {'pings': 1, 'failed_pings': 1, 'reconnects': 1, 'failed_connects': 2}
+
+
+def test_reconnect_gives_up_after_max_retries(monkeypatch, sleeps):
+    server = Server(failures=5)
+    conn   = connection(monkeypatch, server, reconnect_max_retries=3)
+    with pytest.raises(Exception, match="Unable to connect after 3 attempts"):
+        conn.ensure_connection()
+    assert len(sleeps) == 2
+
+
+def test_connect_to_table_keeps_the_reconnected_cursor(monkeypatch, sleeps):
+    server = Server()
+    conn   = connection(monkeypatch, server, liveness_window=0)
+    conn.check_connection()
+    # skips the login of SQLSendData.__init__
+    send_data = SQLSendData.__new__(SQLSendData)
+    send_data.connection, send_data.conn, send_data.cursor = conn, conn.conn, conn.cursor
+    server.connections[0].alive = False
+
+    send_data.connect_to_table("customer")
+    assert send_data.conn is server.connections[1]
+    assert send_data.cursor is conn.cursor and send_data.cursor.queries
+    assert send_data.schema == [{'col_name': 'cust_id', 'datatype': 'int'}]
@@ -0,0 +1,69 @@
+import datetime
+
+import pytest
+
+from azure_utilities.azure_sql.incremental_reader import IncrementalReader
+from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows, self.description, self.queries = rows, [('id',), ('create_dttm',)], []
+
+    def execute(self, query, params = None):
+        self.queries.append((query, params))
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursors, self.rows = [], rows
+
+    def cursor(self):
+        self.cursors.append(FakeCursor(self.rows))
+        self.rows = []
+        return self.cursors[-1]
+
+
+@pytest.fixture
+def get_data():
+    sql_get_data = SQLGetData("server", "db", "user", "password", table_name="customer", key_column="id",
+                              schema=[{'col_name': 'id', 'datatype': 'int'},
+                                      {'col_name': 'create_dttm', 'datatype': 'datetime'}])
+    sql_get_data.conn, sql_get_data.cursor = FakeConnection([]), object()
+    sql_get_data.ensure_connection = lambda **options: None
+    return sql_get_data
+
+
+def last_params(get_data):
+    return get_data.conn.cursors[-1].queries[-1][1]
+
+
+def test_key_column_reads_start_one_minute_ago_by_default(get_data):
+    before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1, seconds=5)
+    assert get_data.return_differential_data() == []
+    start = datetime.datetime.strptime(get_data.reader.start_value, "%Y-%m-%d %H:%M:%S")
+    assert start >= before.replace(tzinfo=None, microsecond=0)
+    assert len(last_params(get_data)) == 2
+
+
+def test_key_column_reads_can_start_from_the_beginning(get_data):
+    assert get_data.return_differential_data(from_beginning=True) == []
+    assert get_data.reader.start_value is None
+    # only the TOP parameter, no predicate on the differential column
+    assert last_params(get_data) == [get_data.page_size]
+
+
+def test_pages_resume_after_the_last_row(get_data):
+    get_data.conn.rows = [(1, '2021-01-01 10:00:00'), (2, '2021-01-01 10:00:00')]
+    reader = IncrementalReader(get_data, 'id', page_size=2, start_value='2021-01-01')
+    assert list(reader.read_page()['id']) == [1, 2]
+    assert reader.position == ('2021-01-01 10:00:00', 2)
+    query, params = reader.build_page_query()
+    assert "create_dttm = " in query and params[1:] == ['2021-01-01 10:00:00', '2021-01-01 10:00:00', 2]
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from azure_utilities.azure_sql.merge_upsert import build_merge_query, deduplicate_on_keys, merge_upsert, \
+    staging_table_name
+
+
+class FakeCursor:
+    def __init__(self, fail_on = None):
+        self.queries, self.fail_on, self.rowcount = [], fail_on, 2
+
+    def execute(self, query, params = None):
+        self.queries.append(query)
+        if self.fail_on and query.startswith(self.fail_on):
+            raise RuntimeError("statement failed")
+
+
+class FakeBatchInsert:
+    def __init__(self):
+        self.inserts = []
+
+    def insert(self, cursor, table_name, columns, rows, chunk_size = None):
+        self.inserts.append((table_name, rows))
+
+
+@pytest.mark.parametrize("table_name", ["customer", "dbo.customer", "[dbo].[customer]", "db.dbo.customer",
+                                        '"customer"'])
+def test_staging_table_name_drops_schema_and_brackets(table_name):
+    assert re.fullmatch(r"##customer_stage_[0-9a-f]{8}", staging_table_name(table_name))
+
+
+def test_staging_table_name_replaces_other_characters():
+    assert re.fullmatch(r"##order_lines_stage_[0-9a-f]{8}", staging_table_name("[dbo].[order lines]"))
+    assert staging_table_name("customer") != staging_table_name("customer")
+
+
+def test_deduplicate_on_keys_keeps_the_last_row():
+    rows = [(1, 'a'), (2, 'b'), (1, 'c')]
+    assert deduplicate_on_keys(['id', 'name'], rows, ['id']) == [(1, 'c'), (2, 'b')]
+
+
+def test_build_merge_query():
+    query = build_merge_query("customer", "##stage", ['id', 'name'], ['id'])
+    assert query == "MERGE INTO customer WITH (HOLDLOCK) AS target USING ##stage AS source ON target.id = source.id " \
+                    "WHEN MATCHED THEN UPDATE SET target.name = source.name " \
+                    "WHEN NOT MATCHED BY TARGET THEN INSERT (id, name) VALUES (source.id, source.name);"
+    assert "WHEN MATCHED" not in build_merge_query("customer", "##stage", ['id'], ['id'])
+
+
+def test_merge_upsert_stages_merges_and_drops():
+    cursor, batch_insert = FakeCursor(), FakeBatchInsert()
+    stats = merge_upsert(cursor, batch_insert, "dbo.customer", ['id', 'name'], [(1, 'a'), (1, 'b')], ['id'],
+                         print_results=False)
+    staging_table = batch_insert.inserts[0][0]
+    assert staging_table.startswith("##customer_stage_")
+    assert batch_insert.inserts[0][1] == [(1, 'b')]
+    assert cursor.queries[0].startswith(f"SELECT TOP 0 id, name INTO {staging_table} FROM dbo.customer")
+    assert cursor.queries[1].startswith("MERGE INTO dbo.customer")
+    assert cursor.queries[2] == f"DROP TABLE {staging_table}"
+    assert (stats['rows'], stats['merged']) == (1, 2)
+
+
+def test_staging_table_is_dropped_when_the_merge_fails():
+    cursor = FakeCursor(fail_on="MERGE")
+    with pytest.raises(RuntimeError):
+        merge_upsert(cursor, FakeBatchInsert(), "customer", ['id'], [(1,)], ['id'], staging_table="##stage",
+                     print_results=False)
+    assert cursor.queries[-1] == "DROP TABLE ##stage"
+
+
+def test_key_columns_must_be_in_the_data():
+    with pytest.raises(AssertionError):
+        merge_upsert(FakeCursor(), FakeBatchInsert(), "customer", ['name'], [('a',)], ['id'])
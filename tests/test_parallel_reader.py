@@ -0,0 +1,49 @@
+import datetime
+import decimal
+
+import pytest
+
+from azure_utilities.azure_sql.parallel_reader import ParallelSQLReader, split_range, to_boundary_value
+from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
+
+def test_split_range_of_integers():
+    assert split_range(0, 100, 4) == [25, 50, 75]
+    assert split_range(1, 10, 3) == [4, 7]
+
+
+def test_split_range_does_not_repeat_boundaries():
+    assert split_range(0, 2, 8) == [1]
+    assert split_range(5, 5, 4) == []
+
+
+def test_split_range_of_floats_and_decimals():
+    assert split_range(0.0, 1.0, 4) == [0.25, 0.5, 0.75]
+    assert split_range(decimal.Decimal('0'), decimal.Decimal('3'), 3) == [decimal.Decimal('1'), decimal.Decimal('2')]
+
+
+def test_split_range_of_datetimes():
+    assert split_range("2021-01-01 00:00:00", datetime.date(2021, 1, 3), 2) == [datetime.datetime(2021, 1, 2)]
+
+
+def test_to_boundary_value():
+    assert to_boundary_value(" 2021-01-01 10:00:00.123 ") == datetime.datetime(2021, 1, 1, 10, 0, 0, 123000)
+    assert to_boundary_value(datetime.date(2021, 1, 1)) == datetime.datetime(2021, 1, 1)
+    assert to_boundary_value(5) == 5
+
+
+@pytest.fixture
+def reader():
+    get_data = SQLGetData("server", "db", "user", "password", table_name="orders",
+                          schema=[{'col_name': 'id', 'datatype': 'int'}, {'col_name': 'amount', 'datatype': 'decimal'}])
+    get_data.connection.get_pool = lambda: type('Pool', (), {'max_size': 10})()
+    return ParallelSQLReader(get_data, 'id', partitions=3)
+
+
+def test_range_predicates_cover_every_row_once(reader):
+    assert reader.range_predicates([10, 20]) == [
+        ("(id IS NULL OR id < ?)", [10]),
+        ("id >= ? AND id < ?", [10, 20]),
+        ("id >= ?", [20]),
+    ]
+    assert reader.range_predicates([]) == [("1 = 1", [])]
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from azure_utilities.azure_sql.query_cache import QueryCache
+from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
+
+class RecordingResultCache:
+    """
+    Result cache keeping nothing, records the count and max of every put()
+    """
+    def __init__(self):
+        self.stats = {'hits': 0, 'incremental': 0, 'misses': 0}
+        self.puts  = []
+
+    @staticmethod
+    def key(*args):
+        return repr(args)
+
+    def get(self, key):
+        return None, None
+
+    def put(self, key, data, count, max_value, **options):
+        self.puts.append((count, max_value))
+
+
+@pytest.fixture
+def get_data():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("create table customer (id integer, create_dttm text)")
+    conn.execute("insert into customer values (1, '2021-01-01 10:00:00')")
+    sql_get_data = SQLGetData("server", "db", "user", "password", table_name="customer",
+                              query_cache=QueryCache(ttl=3600),
+                              schema=[{'col_name': 'id', 'datatype': 'int'},
+                                      {'col_name': 'create_dttm', 'datatype': 'varchar(30)'}])
+    sql_get_data.conn, sql_get_data.cursor = conn, conn.cursor()
+    sql_get_data.ensure_connection = lambda **options: None
+    return sql_get_data
+
+
+def test_freshness_probe_skips_query_cache(get_data):
+    get_data.result_cache = RecordingResultCache()
+    # sqlite has no COUNT_BIG
+    get_data.conn.create_aggregate("COUNT_BIG", 0, CountBig)
+
+    get_data.cached_select(print_results=False)
+    get_data.conn.execute("insert into customer values (2, '2021-01-02 10:00:00')")
+    get_data.cached_select(print_results=False)
+
+    assert [count for count, _ in get_data.result_cache.puts] == [1, 2]
+    assert len(get_data.query_cache) == 0
+
+
+def test_differential_poll_skips_query_cache(get_data):
+    assert get_data.return_differential_data(initially_fetch_data_greater_than_this='2021-01-01 10:00:00') == []
+    get_data.conn.execute("insert into customer values (2, '2021-01-02 10:00:00')")
+    data = get_data.return_differential_data()
+    assert list(data['id']) == [2]
+    assert len(get_data.query_cache) == 0
+
+
+class CountBig:
+    def __init__(self):
+        self.count = 0
+
+    def step(self):
+        self.count += 1
+
+    def finalize(self):
+        return self.count
@@ -0,0 +1,64 @@
+import decimal
+import json
+
+import pandas as pd
+import pytest
+
+from azure_utilities.azure_sql.result_cache import ResultCache, json_value
+from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
+
+class ReloadedResultCache:
+    """
+    Result cache whose entries go through JSON like the index of ResultCache, as if every get() followed a restart
+    """
+    def __init__(self):
+        self.stats   = {'hits': 0, 'incremental': 0, 'misses': 0}
+        self.entries = {}
+
+    key = staticmethod(ResultCache.key)
+
+    def get(self, key):
+        if key not in self.entries:
+            return None, None
+        data, index = self.entries[key]
+        return data, json.loads(index)
+
+    def put(self, key, data, count, max_value, **meta):
+        self.entries[key] = (data, json.dumps(dict(meta, count=count, max_value=max_value), default=str))
+
+
+def test_json_value():
+    assert json_value(decimal.Decimal('12.50')) == '12.50'
+    assert json_value(5) == 5
+    assert json_value(None) is None
+    assert json_value('2021-01-01 10:00:00.000000') == '2021-01-01 10:00:00.000000'
+
+
+def test_decimal_max_value_hits_after_the_index_is_reloaded():
+    get_data = SQLGetData("server", "db", "user", "password", table_name="orders", differential_column="amount",
+                          result_cache=ReloadedResultCache(),
+                          schema=[{'col_name': 'id', 'datatype': 'int'},
+                                  {'col_name': 'amount', 'datatype': 'decimal(10, 2)'}])
+    queries = []
+
+    def _execute_raw_query(query, **options):
+        queries.append(query)
+        # (count, max) of the freshness probe, and the single row of the table
+        return [(1, decimal.Decimal('12.50'))]
+
+    get_data.execute_raw_query = _execute_raw_query
+    get_data.cached_select(print_results=False)
+    get_data.cached_select(print_results=False)
+    assert get_data.result_cache.stats == {'hits': 1, 'incremental': 0, 'misses': 1}
+    assert len(queries) == 3
+
+
+def test_last_use_is_persisted(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = ResultCache(str(tmp_path), save_interval=0)
+    cache.put("key", pd.DataFrame({'id': [1]}), 1, decimal.Decimal('1.5'), table_name="orders")
+    saved_at = ResultCache(str(tmp_path))._entries["key"]['last_used']
+    data, entry = cache.get("key")
+    assert entry['max_value'] == '1.5'
+    assert ResultCache(str(tmp_path))._entries["key"]['last_used'] == entry['last_used'] >= saved_at
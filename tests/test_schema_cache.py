@@ -0,0 +1,78 @@
+import pytest
+
+from azure_utilities.azure_sql import schema_cache as schema_cache_module
+from azure_utilities.azure_sql.common_utils import SQLCredentials
+from azure_utilities.azure_sql.connection import Connection
+from azure_utilities.azure_sql.schema_cache import SchemaCache, get_schema_cache
+
+SCHEMA = [{'col_name': 'cust_id', 'datatype': 'int'}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(schema_cache_module.time, 'time', clock.time)
+    return clock
+
+
+class FakeCursor:
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, params = None):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return [('CUST_ID', 'int')]
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SchemaCache(ttl=60)
+    cache.set("server", "db", "customer", SCHEMA)
+    clock.now += 59
+    assert cache.get("SERVER", "db", "Customer") == SCHEMA
+    clock.now += 1
+    assert cache.get("server", "db", "customer") is None
+    assert cache.stats == {'hits': 1, 'misses': 1}
+
+
+def test_ttl_of_the_caller_overrides_the_cache_ttl(clock):
+    cache = SchemaCache(ttl=60)
+    cache.set("server", "db", "customer", SCHEMA)
+    clock.now += 30
+    assert cache.get("server", "db", "customer", ttl=10) is None
+    assert cache.get("server", "db", "customer", ttl=3600) == SCHEMA
+
+
+def test_persisted_entries_are_read_by_a_new_cache(clock, tmp_path):
+    path = str(tmp_path / "schemas.json")
+    SchemaCache(persist_path=path).set("server", "db", "customer", SCHEMA)
+    assert SchemaCache(persist_path=path).get("server", "db", "customer") == SCHEMA
+
+
+def test_connections_sharing_the_cache_keep_their_own_ttl(clock, tmp_path):
+    path        = str(tmp_path / "schemas.json")
+    credentials = SQLCredentials(server_name="server", database_name="db", db_username="user", db_password="password")
+    connections = []
+    for ttl in (3600, 10):
+        connection = Connection(credentials, schema_cache_ttl=ttl, schema_cache_path=path)
+        connection.cursor            = FakeCursor()
+        connection.ensure_connection = lambda **options: None
+        connections.append(connection)
+    long_ttl, short_ttl = connections
+    assert long_ttl.schema_cache is short_ttl.schema_cache is get_schema_cache(persist_path=path)
+
+    long_ttl.connect_to_table("customer")
+    clock.now += 60
+    short_ttl.connect_to_table("customer")
+    long_ttl.connect_to_table("customer")
+    assert len(long_ttl.cursor.queries) == 1
+    assert len(short_ttl.cursor.queries) == 1
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from azure_utilities.azure_sql.sql_get_data import SQLGetData
+
+
+class FakeBlobClient:
+    def __init__(self, uploads, name, fail):
+        self.uploads, self.name, self.fail = uploads, name, fail
+
+    def upload_blob(self, data, overwrite = False):
+        if self.fail:
+            raise IOError("upload refused")
+        self.uploads[self.name] = data.read()
+        return {'etag': '"0x1"'}
+
+
+class FakeBlobServiceClient:
+    def __init__(self, fail = False):
+        self.uploads, self.fail = {}, fail
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self.uploads, blob, self.fail)
+
+
+class FakeBlob:
+    container_name = "exports"
+
+    def __init__(self, fail = False):
+        self.blob_service_client = FakeBlobServiceClient(fail)
+
+
+@pytest.fixture
+def get_data():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("create table customer (id integer, name text)")
+    conn.execute("insert into customer values (1, 'a')")
+    sql_get_data = SQLGetData("server", "db", "user", "password", table_name="customer",
+                              schema=[{'col_name': 'id', 'datatype': 'int'},
+                                      {'col_name': 'name', 'datatype': 'varchar(30)'}])
+    sql_get_data.conn, sql_get_data.cursor = conn, conn.cursor()
+    sql_get_data.ensure_connection = lambda **options: None
+    return sql_get_data
+
+
+def test_export_records_the_uploaded_blob(get_data, tmp_path):
+    blob    = FakeBlob()
+    summary = get_data.export_data(str(tmp_path / "customer.csv"), blob=blob, print_results=False)
+    assert summary['rows'] == 1
+    assert summary['blob'] == {'name': 'customer.csv', 'container': 'exports', 'status': 'uploaded',
+                               'etag': '"0x1"'}
+    assert blob.blob_service_client.uploads['customer.csv'].splitlines()[1] == b"1,a"
+
+
+def test_failed_export_upload_raises(get_data, tmp_path):
+    with pytest.raises(IOError):
+        get_data.export_data(str(tmp_path / "customer.csv"), blob=FakeBlob(fail=True), blob_name="c.csv",
+                             print_results=False)
@@ -0,0 +1,57 @@
+from azure_utilities.azure_sql.sql_send_data import SQLSendData
+from azure_utilities.azure_sql.transaction import TransactionSession
+
+
+class FakeConnection:
+    def __init__(self):
+        self.autocommit = True
+        self.commits    = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def execute(self, query, params = None):
+        pass
+
+
+def send_data(conn):
+    # skips the login of SQLSendData.__init__
+    sql_send_data = SQLSendData.__new__(SQLSendData)
+    sql_send_data.conn, sql_send_data.cursor = conn, FakeCursor()
+    sql_send_data.transaction_session       = None
+    sql_send_data.invalidate_query_cache    = lambda: None
+    return sql_send_data
+
+
+def test_transaction_begins_without_with_block():
+    conn          = FakeConnection()
+    sql_send_data = send_data(conn)
+    session       = sql_send_data.transaction(commit_every_statements=2)
+    assert conn.autocommit is False
+    session.execute("DELETE FROM customer")
+    session.end()
+    assert conn.autocommit is True
+    assert conn.commits == 1
+    assert sql_send_data.transaction_session is None
+
+
+def test_transaction_in_with_block_restores_autocommit():
+    conn = FakeConnection()
+    with send_data(conn).transaction() as session:
+        assert conn.autocommit is False
+        session.execute("DELETE FROM customer")
+    assert conn.autocommit is True
+    assert session.stats['commits'] == 1
+
+
+def test_begin_twice_keeps_the_first_autocommit_mode():
+    conn    = FakeConnection()
+    session = TransactionSession(conn, FakeCursor()).begin()
+    with session:
+        pass
+    assert conn.autocommit is True